@@ -1,10 +1,15 @@
 # ai_model.py
 # Kevin Model
 
+import hashlib
+import math
 import os
 import pickle
-from typing import List, Dict, Any, Tuple
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass, replace
 
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
@@ -13,31 +18,129 @@ from sklearn.metrics import accuracy_score, classification_report
 from sklearn.model_selection import train_test_split
 
 from base_Service import BaseService
+from database_Access import ROLLUP_METRICS, DatabaseAccess
+from feature_State import FeatureState
+from forest_Engine import CompiledForest
+from inference_Pool import InferencePool
+from model_Artifact import ARTIFACT_FORMATS, is_forest_artifact, load_forest_artifact, save_forest_artifact
+from prediction_Cache import DEFAULT_RESOLUTION, UNCACHEABLE, PredictionCache
+
+
+# Metrics read by the reason rules (column order of the reason matrix);
+# the slopes are feature_State rolling features, only read for a model
+# trained on them (feature_params set)
+REASON_KEYS = ["used_memory", "used_storage", "cpuusage", "temperature", "used_memory_slope", "used_storage_slope"]
+
+# Sustained rise (MB per hour over the rolling window) reported as a trend.
+# Tuned for the FeatureState defaults: 60 messages, one per minute
+MEMORY_TREND_MB_PER_HOUR = 50.0
+STORAGE_TREND_MB_PER_HOUR = 25.0
+
+NORMAL_REASON = "Within normal operating range"
 
 
 @dataclass
 class TrainedArtifacts:
     scaler: MinMaxScaler
-    model: RandomForestClassifier
+    model: Optional[RandomForestClassifier]   # None when loaded from a forest artifact
     feature_names: List[str]           # order of features at train time
     label_names: Dict[int, str]        # e.g. {0:"Healthy",1:"Warning",2:"Critical"}
+    compiled: Optional[CompiledForest] = None  # flattened forest, rebuilt on load (not pickled)
+    feature_params: Optional[Dict[str, Any]] = None  # FeatureState.params() when trained on rolling features
 
 
 class AIModel(BaseService):
     """
     AIModel service
     - Train on simulated/historical telemetry-like rows
-    - Save scaler+model into model.pkl
+    - Save scaler+model into model.pkl, or with artifact_format="forest"
+      as a pickle-free file of flat arrays (model_Artifact) that is
+      memory-mapped on load. Loading detects the format from the file.
+      A forest artifact has no sklearn model: every call uses the compiled
+      engine
     - Load model on start
+    - Hot reload (reload(), or watch_interval to poll model_path): the new
+      model is loaded, validated and warmed up on the calling/watcher
+      thread, then swapped in with a single assignment of self.artifacts.
+      Predictions read self.artifacts once per call, so they never wait
+      and never see a half-loaded model; a bad file leaves the current
+      model active. model_info() reports the active version
+    - inference_workers > 0: batches of at least pool_min_rows rows are
+      scored in an InferencePool of worker processes (shared memory in,
+      class ids out), so forest traversal runs outside this process's
+      GIL. predict_batch_async returns a Future for pipelined callers.
+      Single-row predict_status stays in-process
+    - prediction_cache > 0: predict_status keeps an LRU of that many
+      class ids keyed by the feature vector quantized to cache_resolution
+      (step per feature, default prediction_Cache.DEFAULT_RESOLUTION).
+      A cell is only cached when no split on the forest paths of the
+      vector that filled it lies inside the cell, so a hit is exactly the
+      label the forest would return; the reason is always computed from
+      the exact values. Every model swap starts a new cache once cached
+      and uncached labels agree on a check set near the forest's splits
+      (the cache stays off for that model otherwise).
+      check_prediction_cache runs the same check on caller rows
+    - Rolling features: a model may be trained on feature_State's
+      per-device statistics (ROLLING_FEATURE_KEYS, e.g. used_memory_slope)
+      next to the instantaneous metrics. They are read from the rows by
+      name like any metric (IngestPipeline adds them before scoring), and
+      the FeatureState settings are stored with the model
+      (feature_params) so serving can check it computes the same features
     - Predict label + reason
+    - Optionally compile the forest into flat numpy arrays (forest_Engine)
+      for low-latency inference with identical labels. The compiled engine
+      wins for small calls; batches above compiled_max_rows go to sklearn,
+      whose C traversal is faster per row at that size.
 
     Labels: Healthy / Warning / Critical
     """
 
-    def __init__(self, model_path: str = "model.pkl"):
+    def __init__(
+        self,
+        model_path: str = "model.pkl",
+        use_compiled_forest: bool = True,
+        compiled_max_rows: int = 128,
+        artifact_format: str = "pickle",
+        mmap_artifacts: bool = True,
+        watch_interval: Optional[float] = None,
+        inference_workers: int = 0,
+        pool_min_rows: int = 64,
+        prediction_cache: int = 0,
+        cache_resolution: Optional[Dict[str, float]] = None
+    ):
         super().__init__("AIModel")
+        if artifact_format not in ARTIFACT_FORMATS:
+            raise ValueError(f"artifact_format must be one of {ARTIFACT_FORMATS}")
+        if cache_resolution is not None and any(s < 0 for s in cache_resolution.values()):
+            raise ValueError("cache_resolution steps must be >= 0")
         self.model_path = model_path
+        self.use_compiled_forest = use_compiled_forest
+        self.compiled_max_rows = compiled_max_rows
+        self.artifact_format = artifact_format
+        self.mmap_artifacts = mmap_artifacts
+        self.watch_interval = watch_interval
+        self.inference_workers = inference_workers
+        self.pool_min_rows = pool_min_rows
         self.artifacts: TrainedArtifacts | None = None
+        self._pool: Optional[InferencePool] = None
+        self.pool_fallbacks = 0
+
+        self.prediction_cache = prediction_cache
+        self.cache_resolution = dict(DEFAULT_RESOLUTION if cache_resolution is None else cache_resolution)
+        # (artifacts it belongs to, cache): swapped as one pair with the model
+        self._pred_cache: Optional[Tuple[TrainedArtifacts, PredictionCache]] = None
+        self.cache_check: Optional[Dict[str, Any]] = None
+
+        # active model metadata (replaced as a whole on every swap)
+        self._model_meta: Dict[str, Any] = {"version": 0}
+        self._file_stat: Optional[Tuple[int, int, int]] = None
+        self._reload_lock = threading.Lock()       # one load at a time; predictions never take it
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_reload_error: Optional[str] = None
+
+        self._stop_event = threading.Event()
+        self._watch_thread: Optional[threading.Thread] = None
 
     # ----------------------------
     # Lifecycle (keep original)
@@ -45,14 +148,192 @@ class AIModel(BaseService):
     def start(self) -> None:
         super().start()
         if os.path.exists(self.model_path):
-            self.artifacts = self._load_artifacts(self.model_path)
-            print(f"[AIModel] Loaded model from {self.model_path}")
+            self.reload()
         else:
             print("[AIModel] No existing model found yet. Train first.")
+        if self.inference_workers > 0:
+            self._pool = InferencePool(
+                self.model_path, workers=self.inference_workers, mmap_artifacts=self.mmap_artifacts
+            )
+            self._pool.start()
+        if self.watch_interval:
+            self._stop_event.clear()
+            self._watch_thread = threading.Thread(target=self._watch_loop, name="model-watch", daemon=True)
+            self._watch_thread.start()
 
     def stop(self) -> None:
+        self._stop_event.set()
+        if self._watch_thread:
+            self._watch_thread.join()
+            self._watch_thread = None
+        if self._pool is not None:
+            self._pool.stop()
+            self._pool = None
         super().stop()
 
+    # ----------------------------
+    # Hot reload
+    # ----------------------------
+    def reload(self) -> Dict[str, Any]:
+        """
+        Load model_path, validate + warm it up, then swap it in.
+        Runs on the calling thread; ingest keeps scoring with the current
+        model meanwhile. Raises (and keeps the current model) if the file
+        can't be loaded or fails validation. Returns model_info().
+        """
+        path = self.model_path
+        with self._reload_lock:
+            t0 = time.perf_counter()
+            stat = _file_stat(path)
+            try:
+                digest = _file_sha256(path)
+                art = self._load_artifacts(path)
+                if self.use_compiled_forest and art.compiled is None:
+                    art.compiled = CompiledForest.from_sklearn(art.model, art.scaler)
+                self._validate(art)
+            except Exception as e:
+                self.reload_errors += 1
+                self.last_reload_error = f"{type(e).__name__}: {e}"
+                raise
+            fmt = "forest" if art.model is None else "pickle"
+            self._activate(art, fmt, digest, stat, time.perf_counter() - t0)
+            self.reloads += 1
+            self._notify_pool()
+        meta = self._model_meta
+        print(
+            f"[AIModel] Loaded model v{meta['version']} from {path} "
+            f"({meta['format']}, sha256 {meta['sha256'][:12]}, {meta['load_seconds'] * 1000:.0f} ms)"
+        )
+        return self.model_info()
+
+    def model_info(self) -> Dict[str, Any]:
+        art = self.artifacts
+        info = dict(self._model_meta)
+        info.update({
+            "loaded": art is not None,
+            "path": self.model_path,
+            "watching": self._watch_thread is not None,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_reload_error": self.last_reload_error,
+        })
+        if self._pool is not None:
+            info["inference_pool"] = {**self._pool.stats(), "fallbacks": self.pool_fallbacks}
+        if self.prediction_cache > 0:
+            entry = self._pred_cache
+            info["prediction_cache"] = {
+                "enabled": entry is not None and entry[0] is art,
+                "resolution": self.cache_resolution,
+                "check": self.cache_check,
+                **(entry[1].stats() if entry is not None else {}),
+            }
+        if art is not None:
+            info["feature_names"] = list(art.feature_names)
+            info["feature_params"] = art.feature_params
+            info["labels"] = [art.label_names[k] for k in sorted(art.label_names)]
+            info["engine"] = "compiled" if art.model is None else (
+                "sklearn+compiled" if art.compiled is not None else "sklearn"
+            )
+            if art.compiled is not None:
+                info["trees"] = art.compiled.n_trees
+                info["nodes"] = art.compiled.n_nodes
+        return info
+
+    def _activate(
+        self,
+        art: TrainedArtifacts,
+        fmt: str,
+        digest: Optional[str],
+        stat: Optional[Tuple[int, int, int]],
+        load_seconds: float
+    ) -> None:
+        cache = self._new_cache(art) if self.prediction_cache > 0 else None
+        if cache is not None:
+            # guard: cached vs uncached labels, see _cache_check_rows
+            rows = self._cache_check_rows(art, cache.compiled)
+            self.cache_check = self._check_cache(art, self._new_cache(art), rows)
+            if self.cache_check["disagreements"]:
+                print(f"[AIModel] Prediction cache disabled for this model: {self.cache_check}")
+                cache = None
+        # the swap: one attribute assignment, readers see old or new
+        self.artifacts = art
+        self._pred_cache = (art, cache) if cache is not None else None
+        self._file_stat = stat
+        self._model_meta = {
+            "version": self._model_meta["version"] + 1,
+            "sha256": digest,
+            "format": fmt,
+            "loaded_at": time.time(),
+            "load_seconds": load_seconds,
+        }
+
+    def _notify_pool(self) -> None:
+        """
+        Make the workers reload after a completed swap. A pool problem
+        (e.g. a dead worker) only gets logged: the new model is already
+        live here, and results of a worker still on the old one are
+        detected by their sha256 and rescored in-process.
+        """
+        if self._pool is None or not self._pool.running:
+            return
+        try:
+            self._pool.reload()
+        except Exception as e:
+            print(f"[AIModel] Inference pool reload failed: {type(e).__name__}: {e}")
+
+    def _validate(self, art: TrainedArtifacts) -> None:
+        """
+        Sanity checks + warm-up on a fixed batch spread over the training
+        range: every engine present must run, return known labels and
+        (sklearn vs compiled) agree. Also pages in memory-mapped arrays.
+        """
+        if not art.feature_names or not art.label_names:
+            raise ValueError("Model has no feature or label names")
+        n_features = len(art.feature_names)
+        if art.scaler.min_.shape[0] != n_features:
+            raise ValueError(f"Scaler has {art.scaler.min_.shape[0]} features, model {n_features}")
+
+        X = self._warmup_rows(art)
+
+        results = []
+        if art.compiled is not None:
+            results.append(art.compiled.predict_ids(X))
+        if art.model is not None:
+            results.append(art.model.predict(art.scaler.transform(X)))
+        if not results:
+            raise ValueError("Model has neither a forest nor a compiled forest")
+        unknown = set(np.unique(results[0]).tolist()) - set(art.label_names)
+        if unknown:
+            raise ValueError(f"Model predicts class ids without a label: {sorted(unknown)}")
+        if len(results) == 2 and not np.array_equal(results[0], results[1]):
+            raise ValueError("Compiled forest disagrees with the sklearn model")
+
+    def _warmup_rows(self, art: TrainedArtifacts, n: int = 256) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        lo, hi = np.asarray(art.scaler.data_min_, dtype=float), np.asarray(art.scaler.data_max_, dtype=float)
+        return rng.uniform(lo, hi, size=(n, len(art.feature_names)))
+
+    def _watch_loop(self) -> None:
+        """
+        Poll model_path; reload once a changed file has stayed the same for
+        one interval (a writer may still be busy with it).
+        """
+        pending = None
+        while not self._stop_event.wait(self.watch_interval):
+            stat = _file_stat(self.model_path)
+            if stat is None or stat == self._file_stat:
+                pending = None
+                continue
+            if stat != pending:
+                pending = stat
+                continue
+            pending = None
+            try:
+                self.reload()
+            except Exception as e:
+                self._file_stat = stat      # don't retry the same file every poll
+                print(f"[AIModel] Reload failed, keeping v{self._model_meta['version']}: {e}")
+
     # ----------------------------
     # TRAINING
     # ----------------------------
@@ -80,32 +361,196 @@ class AIModel(BaseService):
           }
         """
 
-        X_list: List[List[float]] = []
-        y_list: List[int] = []
-        label_to_id: Dict[str, int] = {}
-        next_id = 0
+        X = _metrics_matrix(rows, feature_keys)
+        labels = [r.get(label_key, "Healthy") for r in rows]
+        return self.train_from_arrays(
+            X, labels, feature_keys,
+            test_size=test_size,
+            random_state=random_state,
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            class_weight=class_weight
+        )
 
-        for r in rows:
-            # features in fixed order
-            feats = []
-            for k in feature_keys:
-                v = r.get(k, 0.0)
-                # If missing/None/NaN -> 0.0 (you can change strategy later)
-                if v is None or (isinstance(v, float) and np.isnan(v)):
-                    v = 0.0
-                feats.append(float(v))
-            X_list.append(feats)
+    def train_from_arrays(
+        self,
+        X: np.ndarray,
+        labels: List[str] | np.ndarray,
+        feature_keys: List[str],
+        test_size: float = 0.3,
+        random_state: int = 42,
+        n_estimators: int = 300,
+        max_depth: int | None = None,
+        class_weight: str | Dict[str, float] | None = "balanced",
+        feature_params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Same as train_from_rows, from a feature matrix (columns in
+        feature_keys order, missing = NaN) and one label per row, without
+        building a dict per row. feature_params: FeatureState.params() of
+        the state that computed any rolling feature columns.
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, len(feature_keys))
+        # If missing/None/NaN -> 0.0 (you can change strategy later)
+        X = np.where(np.isnan(X), 0.0, X)
+
+        # label ids in order of first appearance
+        names, first, y = np.unique(np.asarray(labels, dtype=object), return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        y = rank[y.reshape(-1)].astype(int)
 
-            raw_label = r.get(label_key, "Healthy")
-            if raw_label not in label_to_id:
-                label_to_id[raw_label] = next_id
-                next_id += 1
-            y_list.append(label_to_id[raw_label])
+        id_to_label = {i: str(names[j]) for i, j in enumerate(order)}
 
-        X = np.array(X_list, dtype=float)
-        y = np.array(y_list, dtype=int)
+        return self._fit(
+            X, y, id_to_label, feature_keys,
+            test_size=test_size,
+            random_state=random_state,
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            class_weight=class_weight,
+            feature_params=feature_params
+        )
+
+    def train_from_database(
+        self,
+        db: DatabaseAccess,
+        feature_keys: List[str],
+        label_column: str = "operator_label",
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        chunk_rows: int = 50000,
+        test_size: float = 0.3,
+        random_state: int = 42,
+        n_estimators: int = 300,
+        max_depth: int | None = None,
+        class_weight: str | Dict[str, float] | None = "balanced",
+        feature_state: Optional[FeatureState] = None
+    ) -> Dict[str, Any]:
+        """
+        Train on labeled telemetry rows (default: operator-confirmed labels)
+        streamed from the DB in chunk_rows chunks.
+        - per-label counts are read first, so X (float32) and y are
+          allocated once at their final size and filled chunk by chunk
+        - max_rows: stratified subsample of at most max_rows rows; every
+          label keeps its share of the table (at least 2 rows, so the
+          train/test split can stratify). Which rows are kept is drawn up
+          front per label (random_state), so the result is an exact-size
+          uniform sample without holding the table in memory
+        - feature_keys beyond the stored metrics are rolling features:
+          then every row in the range is replayed through feature_state's
+          settings (default FeatureState()) in ts order, see
+          FeatureState.training_rows
+        Memory is ~ max_rows * len(feature_keys) * 4 bytes + one chunk.
+        """
+        counts = db.count_training_labels(label_column, since=since, until=until)
+        counts = {k: v for k, v in counts.items() if v > 0}
+        if not counts:
+            raise RuntimeError(f"No rows with {label_column} to train on.")
+        names = sorted(counts)
+        index = {name: i for i, name in enumerate(names)}
+        total = sum(counts.values())
+
+        # rank (within its label, in scan order) of every row to keep
+        rng = np.random.default_rng(random_state)
+        keep_ranks: List[Optional[np.ndarray]] = []
+        for name in names:
+            n = counts[name]
+            if max_rows is None or total <= max_rows:
+                keep_ranks.append(None)
+                continue
+            quota = min(n, max(2, round(n * max_rows / total)))
+            keep_ranks.append(np.sort(rng.choice(n, size=quota, replace=False)))
+        capacity = sum(counts[nm] if kr is None else len(kr) for nm, kr in zip(names, keep_ranks))
+
+        X = np.empty((capacity, len(feature_keys)), dtype=np.float32)
+        y = np.empty(capacity, dtype=np.int64)
+        seen = np.zeros(len(names), dtype=np.int64)
+        filled = 0
+
+        feature_params = None
+        if any(k not in ROLLUP_METRICS for k in feature_keys):
+            feature_state = feature_state or FeatureState()
+            feature_params = feature_state.params()
+            source = feature_state.training_rows(
+                db, feature_keys, label_column=label_column, since=since, until=until, chunk_rows=chunk_rows
+            )
+        else:
+            source = db.iter_training_rows(
+                feature_keys, label_column=label_column, since=since, until=until, chunk_rows=chunk_rows
+            )
+        for rows in source:
+            # labels added after the count are not in the allocation
+            codes = np.fromiter((index.get(r[0], -1) for r in rows), dtype=np.int64, count=len(rows))
+            keep = codes >= 0
+            for c, ranks in enumerate(keep_ranks):
+                in_class = codes == c
+                k = int(in_class.sum())
+                if ranks is None or k == 0:
+                    seen[c] += k
+                    continue
+                r = seen[c] + np.arange(k)
+                pos = np.minimum(np.searchsorted(ranks, r), len(ranks) - 1)
+                keep[in_class] = ranks[pos] == r
+                seen[c] += k
+
+            take = np.flatnonzero(keep)[:capacity - filled]
+            if take.size == 0:
+                continue
+            # None -> NaN
+            X[filled:filled + take.size] = np.array([rows[i][1:] for i in take], dtype=np.float32)
+            y[filled:filled + take.size] = codes[take]
+            filled += take.size
+
+        X, y = X[:filled], y[:filled]
+        # If missing/None/NaN -> 0.0 (same as the other training paths)
+        X[np.isnan(X)] = 0.0
+
+        metrics = self._fit(
+            X, y, dict(enumerate(names)), feature_keys,
+            test_size=test_size,
+            random_state=random_state,
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            class_weight=class_weight,
+            feature_params=feature_params
+        )
+        metrics["rows_available"] = total
+        metrics["rows_used"] = filled
+        metrics["label_counts"] = counts
+        return metrics
 
-        id_to_label = {i: name for (name, i) in label_to_id.items()}
+    def _fit(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        id_to_label: Dict[int, str],
+        feature_keys: List[str],
+        test_size: float,
+        random_state: int,
+        n_estimators: int,
+        max_depth: int | None,
+        class_weight: str | Dict[str, float] | None,
+        feature_params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Scale, split, fit, evaluate and save. X is NaN-free, y holds label ids.
+        Raises before touching the active model if the labels can't give a
+        stratified split with every class on both sides.
+        """
+        ids, per_class = np.unique(y, return_counts=True)
+        counts = {id_to_label[int(i)]: int(n) for i, n in zip(ids, per_class)}
+        if len(ids) < 2:
+            raise RuntimeError(f"Need at least 2 labels to train, got {counts}.")
+        if per_class.min() < 2:
+            raise RuntimeError(f"Need at least 2 rows of every label to train, got {counts}.")
+        n_test = math.ceil(test_size * len(y))
+        if n_test < len(ids) or len(y) - n_test < len(ids):
+            raise RuntimeError(
+                f"{len(y)} rows with test_size={test_size} can't hold every label on both sides of the split, got {counts}."
+            )
 
         # Normalize
         scaler = MinMaxScaler()
@@ -116,7 +561,7 @@ class AIModel(BaseService):
             X_scaled, y,
             test_size=test_size,
             random_state=random_state,
-            stratify=y if len(np.unique(y)) > 1 else None
+            stratify=y
         )
 
         # RandomForest
@@ -140,13 +585,21 @@ class AIModel(BaseService):
         )
 
         # Save artifacts
-        self.artifacts = TrainedArtifacts(
+        art = TrainedArtifacts(
             scaler=scaler,
             model=model,
             feature_names=feature_keys,
-            label_names=id_to_label
+            label_names=id_to_label,
+            feature_params=feature_params
         )
-        self._save_artifacts(self.model_path, self.artifacts)
+        if self.use_compiled_forest:
+            art.compiled = CompiledForest.from_sklearn(model, scaler)
+        with self._reload_lock:
+            self._save_artifacts(self.model_path, art)
+            self._activate(
+                art, self.artifact_format, _file_sha256(self.model_path), _file_stat(self.model_path), 0.0
+            )
+            self._notify_pool()
         print(f"[AIModel] Model trained and saved to {self.model_path}")
 
         return {
@@ -156,52 +609,261 @@ class AIModel(BaseService):
             "label_mapping": id_to_label
         }
 
+    def compile_forest(self) -> CompiledForest:
+        """
+        Flatten the trained forest (scaler folded into the thresholds) so
+        predict_status/predict_batch skip sklearn's per-call overhead.
+        """
+        if self.artifacts is None:
+            raise RuntimeError("AIModel not loaded/trained yet.")
+        if self.artifacts.model is None:
+            return self.artifacts.compiled       # forest artifact: already compiled
+        compiled = CompiledForest.from_sklearn(self.artifacts.model, self.artifacts.scaler)
+        self.artifacts.compiled = compiled
+        return compiled
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Write the current model in artifact_format (e.g. convert a
+        model.pkl into a forest artifact: load it, then save).
+        """
+        if self.artifacts is None:
+            raise RuntimeError("AIModel not loaded/trained yet.")
+        self._save_artifacts(path or self.model_path, self.artifacts)
+
     # ----------------------------
     # INFERENCE
     # ----------------------------
     def predict_status(self, metrics: Dict[str, float]) -> Tuple[str, str]:
-        if self.artifacts is None:
+        art = self.artifacts      # one read: a concurrent reload can't mix models
+        if art is None:
             raise RuntimeError("AIModel not loaded/trained yet.")
 
         feats = []
-        for k in self.artifacts.feature_names:
+        for k in art.feature_names:
             v = metrics.get(k, 0.0)
             if v is None or (isinstance(v, float) and np.isnan(v)):
                 v = 0.0
             feats.append(float(v))
 
-        X_new = np.array([feats], dtype=float)
-        X_scaled = self.artifacts.scaler.transform(X_new)
-        class_id = int(self.artifacts.model.predict(X_scaled)[0])
+        entry = self._pred_cache
+        if entry is not None and entry[0] is art:
+            class_id = self._cached_id(art, entry[1], feats)
+        else:
+            class_id = int(self._predict_ids(art, np.array([feats], dtype=float))[0])
 
-        status_text = self.artifacts.label_names.get(class_id, "Unknown")
-        reason = self._reason_from_metrics(metrics)
+        status_text = art.label_names.get(class_id, "Unknown")
+        reason = self._reason_from_metrics(metrics, trends=art.feature_params is not None)
 
         return status_text, reason
 
+    def predict_batch(
+        self,
+        rows: List[Dict[str, Any]] | np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score many rows with one scaler.transform and one forest predict.
+
+        rows: list of metric dicts (same as predict_status), or a 2D array whose
+              columns follow artifacts.feature_names.
+        Returns (labels, reasons) as object arrays aligned with rows.
+        """
+        return self.predict_batch_async(rows).result()
+
+    def predict_batch_async(self, rows: List[Dict[str, Any]] | np.ndarray) -> Future:
+        """
+        predict_batch as a Future of (labels, reasons). Without an inference
+        pool (or below pool_min_rows) it is computed right away. With one,
+        the forest runs in the workers; reasons are computed here meanwhile.
+        If the workers fail, or answer with a different model version than
+        the one active at submit time (reload in progress), the batch is
+        scored in-process instead.
+        """
+        art = self.artifacts
+        if art is None:
+            raise RuntimeError("AIModel not loaded/trained yet.")
+        sha = self._model_meta.get("sha256")
+        result: Future = Future()
+
+        if isinstance(rows, np.ndarray):
+            raw = np.asarray(rows, dtype=float).reshape(-1, len(art.feature_names))
+            reason_cols = [art.feature_names.index(k) if k in art.feature_names else -1 for k in REASON_KEYS]
+            nan_col = np.full(raw.shape[0], np.nan)
+            reason_matrix = np.column_stack([raw[:, c] if c >= 0 else nan_col for c in reason_cols])
+        else:
+            raw = _metrics_matrix(rows, art.feature_names)
+            reason_matrix = _metrics_matrix(rows, REASON_KEYS)
+
+        trends = art.feature_params is not None
+        if raw.shape[0] == 0:
+            empty = np.empty(0, dtype=object)
+            result.set_result((empty, empty.copy()))
+            return result
+
+        # missing/None/NaN -> 0.0, same as predict_status
+        X_new = np.where(np.isnan(raw), 0.0, raw)
+        pool = self._pool
+        if pool is None or not pool.running or X_new.shape[0] < self.pool_min_rows \
+                or X_new.shape[1] > pool.max_features:
+            class_ids = self._predict_ids(art, X_new)
+            result.set_result((self._label_names(art, class_ids), self._reasons_from_matrix(reason_matrix, trends)))
+            return result
+
+        pending = pool.submit(X_new)
+        reasons = self._reasons_from_matrix(reason_matrix, trends)
+
+        def done(f: Future) -> None:
+            try:
+                class_ids, shas = f.result()
+                if shas != {sha}:
+                    raise RuntimeError("inference workers on another model version")
+            except Exception:
+                self.pool_fallbacks += 1
+                try:
+                    class_ids = self._predict_ids(art, X_new)
+                except Exception as e:
+                    result.set_exception(e)
+                    return
+            result.set_result((self._label_names(art, class_ids), reasons))
+
+        pending.add_done_callback(done)
+        return result
+
+    # ----------------------------
+    # Prediction cache
+    # ----------------------------
+    def check_prediction_cache(self, X: np.ndarray) -> Dict[str, Any]:
+        """
+        Score X (raw feature rows, columns in feature_names order, e.g.
+        recent telemetry) one row at a time through a fresh cache, like
+        predict_status does, and compare with uncached predictions.
+        Returns rows, disagreements and the hit rate the cache had on X.
+        """
+        art = self.artifacts
+        if art is None:
+            raise RuntimeError("AIModel not loaded/trained yet.")
+        X = np.asarray(X, dtype=float).reshape(-1, len(art.feature_names))
+        return self._check_cache(art, self._new_cache(art), np.where(np.isnan(X), 0.0, X))
+
+    def clear_prediction_cache(self) -> None:
+        entry = self._pred_cache
+        if entry is not None:
+            entry[1].clear()
+
+    def _new_cache(self, art: TrainedArtifacts) -> PredictionCache:
+        compiled = art.compiled if art.compiled is not None else CompiledForest.from_sklearn(art.model, art.scaler)
+        return PredictionCache(
+            compiled, art.feature_names, resolution=self.cache_resolution, max_entries=max(1, self.prediction_cache)
+        )
+
+    def _cached_id(self, art: TrainedArtifacts, cache: PredictionCache, feats: List[float]) -> int:
+        key = cache.key(feats)
+        class_id = cache.get(key)
+        if class_id is None:
+            return cache.fill(key, feats)
+        if class_id == UNCACHEABLE:
+            return int(self._predict_ids(art, np.array([feats], dtype=float))[0])
+        return class_id
+
+    def _check_cache(self, art: TrainedArtifacts, cache: PredictionCache, X: np.ndarray) -> Dict[str, Any]:
+        exact = self._predict_ids(art, X)
+        cached = np.array([self._cached_id(art, cache, row) for row in X.tolist()], dtype=exact.dtype)
+        return {
+            "rows": int(X.shape[0]),
+            "disagreements": int(np.sum(cached != exact)),
+            "hit_rate": cache.stats()["hit_rate"],
+        }
+
+    def _cache_check_rows(self, art: TrainedArtifacts, compiled: CompiledForest, copies: int = 3) -> np.ndarray:
+        """
+        Warm-up rows, half of them replaced by rows built from split
+        thresholds of the forest (a random one per feature): those sit
+        where the forest's decisions change and their cells are crossed by
+        splits. Each row is followed by copies drawn anywhere in its own
+        cell, so every cached cell is looked up by other vectors in it.
+        """
+        base = self._warmup_rows(art, n=128)
+        rng = np.random.default_rng(1)
+        half = base.shape[0] // 2
+        for f in range(base.shape[1]):
+            thr = compiled.threshold[(compiled.feature == f) & np.isfinite(compiled.threshold)]
+            if thr.size:
+                base[:half, f] = rng.choice(thr, size=half)
+        steps = np.array([self.cache_resolution.get(k, 0.0) for k in art.feature_names])
+        cells = np.floor(base / np.where(steps > 0, steps, 1.0) + 0.5)
+        offset = rng.uniform(-0.5, 0.5, size=(base.shape[0], copies, base.shape[1]))
+        inside = np.where(steps > 0, (cells[:, None, :] + offset) * steps, base[:, None, :])
+        return np.concatenate([base[:, None, :], inside], axis=1).reshape(-1, base.shape[1])
+
     # ----------------------------
     # Helpers
     # ----------------------------
+    def _label_names(self, art: TrainedArtifacts, class_ids: np.ndarray) -> np.ndarray:
+        classes = art.model.classes_ if art.model is not None else art.compiled.classes
+        names = np.array([art.label_names.get(int(c), "Unknown") for c in classes], dtype=object)
+        return names[np.searchsorted(classes, class_ids)]
+
+    def _predict_ids(self, art: TrainedArtifacts, X_new: np.ndarray) -> np.ndarray:
+        """
+        Raw (unscaled, NaN-free) feature matrix -> class ids.
+        """
+        if art.compiled is not None and (art.model is None or X_new.shape[0] <= self.compiled_max_rows):
+            return art.compiled.predict_ids(X_new)
+        return art.model.predict(art.scaler.transform(X_new))
+
     def _save_artifacts(self, path: str, artifacts: TrainedArtifacts) -> None:
-        with open(path, "wb") as f:
-            pickle.dump(artifacts, f)
+        if self.artifact_format == "forest":
+            compiled = artifacts.compiled
+            if compiled is None:
+                compiled = CompiledForest.from_sklearn(artifacts.model, artifacts.scaler)
+            save_forest_artifact(
+                path, compiled, artifacts.scaler, artifacts.feature_names, artifacts.label_names,
+                feature_params=artifacts.feature_params
+            )
+            return
+        if artifacts.model is None:
+            raise RuntimeError("Model was loaded from a forest artifact; it can only be saved as one.")
+        # compiled forest is derived data; it is rebuilt after loading.
+        # Written aside and renamed so a reloading reader never sees half a file
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(replace(artifacts, compiled=None), f)
+        os.replace(tmp, path)
 
     def _load_artifacts(self, path: str) -> TrainedArtifacts:
+        if is_forest_artifact(path):
+            loaded = load_forest_artifact(path, mmap=self.mmap_artifacts)
+            return TrainedArtifacts(
+                scaler=loaded["scaler"],
+                model=None,
+                feature_names=loaded["feature_names"],
+                label_names=loaded["label_names"],
+                compiled=loaded["compiled"],
+                feature_params=loaded["feature_params"]
+            )
         with open(path, "rb") as f:
-            return pickle.load(f)
+            art = pickle.load(f)
+        if not hasattr(art, "feature_params"):
+            art.feature_params = None       # pickled before rolling features existed
+        return art
 
     def _feature_importance(self, model: RandomForestClassifier, feature_keys: List[str]) -> Dict[str, float]:
         imp = model.feature_importances_
         return {feature_keys[i]: float(imp[i]) for i in range(len(feature_keys))}
 
-    def _reason_from_metrics(self, m: Dict[str, float]) -> str:
+    def _reason_from_metrics(self, m: Dict[str, float], trends: bool = False) -> str:
         """
         Human-readable reason string for dashboard.
+        trends: also report rising memory/storage slopes (only for a model
+        trained on rolling features, whose window/cadence the thresholds
+        assume).
         """
         used_mem = m.get("used_memory")
         used_sto = m.get("used_storage")
         cpu = m.get("cpuusage")
         temp = m.get("temperature")
+        mem_slope = m.get("used_memory_slope")
+        sto_slope = m.get("used_storage_slope")
 
         # Sensor glitches
         if temp is not None and (temp < -10 or temp > 120):
@@ -233,5 +895,78 @@ class AIModel(BaseService):
         if used_sto is not None and 3400 <= used_sto <= 3900:
             return "Elevated storage consumption"
 
-        return "Within normal operating range"
+        # Trends (rolling features)
+        if trends and mem_slope is not None and mem_slope > MEMORY_TREND_MB_PER_HOUR:
+            return "Memory usage rising steadily (possible leak)"
+        if trends and sto_slope is not None and sto_slope > STORAGE_TREND_MB_PER_HOUR:
+            return "Storage usage rising steadily"
+
+        return NORMAL_REASON
+
+    def _reasons_from_matrix(self, M: np.ndarray, trends: bool = False) -> np.ndarray:
+        """
+        Vectorized _reason_from_metrics.
+        M columns follow REASON_KEYS; missing values are NaN (every comparison
+        with NaN is False, which matches the "is not None" checks above).
+        np.select picks the first matching condition, so the order below must
+        stay the same as in _reason_from_metrics.
+        """
+        used_mem, used_sto, cpu, temp, mem_slope, sto_slope = (M[:, i] for i in range(6))
+        if not trends:
+            mem_slope = sto_slope = np.full(M.shape[0], np.nan)
+
+        with np.errstate(invalid="ignore"):
+            rules = [
+                # Sensor glitches
+                ((temp < -10) | (temp > 120), "Temperature sensor out-of-range (possible sensor glitch)"),
+                ((cpu < 0) | (cpu > 100), "CPU usage out-of-range (possible metric glitch)"),
+                # Critical conditions
+                (temp > 80, "High temperature detected"),
+                (temp < 5, "Extremely low temperature detected"),
+                (cpu > 90, "CPU usage exceeds threshold"),
+                (used_mem > 1600, "High memory consumption detected"),
+                (used_sto > 3900, "Storage almost full"),
+                # Warning conditions
+                ((temp >= 65) & (temp <= 80), "Elevated temperature"),
+                ((temp >= 5) & (temp < 10), "Low temperature (near limit)"),
+                ((cpu >= 60) & (cpu <= 90), "Elevated CPU usage"),
+                ((used_mem >= 1350) & (used_mem <= 1600), "Elevated memory consumption"),
+                ((used_sto >= 3400) & (used_sto <= 3900), "Elevated storage consumption"),
+                # Trends (rolling features)
+                (mem_slope > MEMORY_TREND_MB_PER_HOUR, "Memory usage rising steadily (possible leak)"),
+                (sto_slope > STORAGE_TREND_MB_PER_HOUR, "Storage usage rising steadily"),
+            ]
+
+        reasons = np.select(
+            [cond for cond, _ in rules],
+            [np.array(text, dtype=object) for _, text in rules],
+            default=np.array(NORMAL_REASON, dtype=object)
+        )
+        return reasons.astype(object)
+
+
+def _file_stat(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _metrics_matrix(rows: List[Dict[str, Any]], keys: List[str]) -> np.ndarray:
+    """
+    rows -> float matrix with columns in keys order; None/missing -> NaN.
+    """
+    return np.array(
+        [[np.nan if r.get(k) is None else r.get(k) for k in keys] for r in rows],
+        dtype=float
+    ).reshape(len(rows), len(keys))
 
@@ -0,0 +1,149 @@
+# bench_artifact.py
+"""
+Model artifact benchmark: pickle (model.pkl) vs forest artifact (model_Artifact).
+
+What it does:
+- Trains a model on synthetic data and saves it in both formats
+- Checks both give identical labels
+- Loads each format in fresh processes and reports AIModel.start() time
+  and memory: RSS after loading and after a 10k-row predict_batch, split
+  into anonymous (private to the process) and file-backed pages (page
+  cache, shared by every process mapping the file)
+- Keeps N processes loaded at the same time and reports how much their
+  total PSS (proportional set size: shared pages divided among the
+  sharers) grew from loading + predicting
+
+Usage:
+  python bench_artifact.py [--samples 4000] [--trees 400] [--procs 4]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ai_Model import AIModel
+from train_ai_model import FEATURE_KEYS, generate_synthetic_training_arrays
+
+
+def memory_kb(pid: str = "self") -> dict:
+    """
+    RSS split (kB) from /proc (Linux), plus PSS.
+    """
+    out = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                out[key] = int(rest.split()[0])
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                out["Pss"] = int(line.split()[1])
+    return out
+
+
+def worker(path: str, hold: bool) -> None:
+    """
+    Child process: load, predict, print one JSON line; with hold, wait for
+    stdin to close so the parent can measure several live processes.
+    """
+    X = np.load(path + ".rows.npy")
+    before = memory_kb()
+    t0 = time.perf_counter()
+    ai = AIModel(model_path=path)
+    ai.start()
+    load_s = time.perf_counter() - t0
+    loaded = memory_kb()
+    ai.predict_batch(X)
+    used = memory_kb()
+    print(json.dumps({"load_s": load_s, "before": before, "loaded": loaded, "used": used}), flush=True)
+    if hold:
+        sys.stdin.read()
+
+
+def run_workers(path: str, n: int, hold: bool = False):
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", path] + (["--hold"] if hold else [])
+    procs = [
+        subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=dict(os.environ))
+        for _ in range(n)
+    ]
+    results = []
+    for p in procs:
+        line = p.stdout.readline()
+        while not line.startswith("{"):     # skip service log lines
+            line = p.stdout.readline()
+        results.append(json.loads(line))
+    # PSS growth since just before loading (imports excluded)
+    pss = sum(memory_kb(str(p.pid))["Pss"] - r["before"]["Pss"] for p, r in zip(procs, results)) if hold else None
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+    return results, pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pickle vs forest artifact load benchmark")
+    parser.add_argument("--samples", type=int, default=4000)
+    parser.add_argument("--trees", type=int, default=400)
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--hold", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.hold)
+        return
+
+    tmp = tempfile.mkdtemp()
+    paths = {"pickle": os.path.join(tmp, "model.pkl"), "forest": os.path.join(tmp, "model.forest")}
+
+    X, labels = generate_synthetic_training_arrays(n_samples=args.samples)
+    ai = AIModel(model_path=paths["pickle"])
+    ai.train_from_arrays(X, labels, feature_keys=FEATURE_KEYS, n_estimators=args.trees)
+    ai.artifact_format = "forest"
+    ai.save(paths["forest"])
+
+    rows, _ = generate_synthetic_training_arrays(n_samples=10000, rng=np.random.default_rng(1))
+    for path in paths.values():
+        np.save(path + ".rows.npy", rows)
+
+    # --- correctness ---
+    loaded = {}
+    for fmt, path in paths.items():
+        m = AIModel(model_path=path)
+        m.start()
+        loaded[fmt] = m.predict_batch(rows)[0]
+    mismatches = int(np.sum(loaded["pickle"] != loaded["forest"]))
+    forest = ai.artifacts.compiled
+    print(f"\nForest: {forest.n_trees} trees, {forest.n_nodes:,d} nodes")
+    print(f"Label mismatches pickle vs forest ({len(rows):,d} rows): {mismatches}")
+
+    # --- load time + memory, fresh process each ---
+    print(f"\n{'format':8s} {'file MB':>8s} {'load ms':>8s} | MB after load: {'RSS':>6s} {'anon':>6s} "
+          f"{'file':>6s} | after predict: {'RSS':>6s} {'anon':>6s}")
+    for fmt, path in paths.items():
+        results, _ = run_workers(path, 5)
+        load_ms = statistics.median(r["load_s"] for r in results) * 1000
+        d = lambda stage, key: statistics.median(r[stage][key] - r["before"][key] for r in results) / 1024
+        print(
+            f"{fmt:8s} {os.path.getsize(path) / 1e6:8.2f} {load_ms:8.1f} | {'':14s}{d('loaded', 'VmRSS'):6.1f} "
+            f"{d('loaded', 'RssAnon'):6.1f} {d('loaded', 'RssFile'):6.1f} | {'':14s}{d('used', 'VmRSS'):6.1f} "
+            f"{d('used', 'RssAnon'):6.1f}"
+        )
+
+    # --- several processes sharing one model file ---
+    print(f"\n{args.procs} processes loaded at once, total PSS growth (MB)")
+    for fmt, path in paths.items():
+        _, pss = run_workers(path, args.procs, hold=True)
+        print(f"  {fmt:8s} {pss / 1024:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# bench_db.py
+"""
+Read latency under sustained write load.
+
+Modes:
+- shared    : rollback journal, reads share the writer connection + lock
+              (how DatabaseAccess worked before the read pool)
+- wal+pool  : WAL journal, per-thread read-only connections
+
+For each mode a writer thread inserts batches as fast as it can while
+reader threads call the dashboard queries (get_latest_per_device,
+get_history, get_latest_raw). Reports read p50/p99 and write throughput.
+
+Usage:
+  python bench_db.py [--seconds 10] [--readers 2] [--rate 0] [--batch 200]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from database_Access import DatabaseAccess
+
+SITES = [f"PH-NCR-{i:05d}" for i in range(200)]
+
+
+def make_row(ts: int) -> dict:
+    return {
+        "ts": ts,
+        "gateway": "142e0c1a5b3d9f70",
+        "siteid": random.choice(SITES),
+        "topic": "plc/devices/diagnostic/test",
+        "raw": {"cpuusage": random.uniform(0, 100), "temperature": random.uniform(20, 80), "pad": "x" * 1500},
+        "used_memory": random.uniform(800, 1700),
+        "used_storage": random.uniform(3000, 4200),
+        "cpuusage": random.uniform(0, 100),
+        "temperature": random.uniform(20, 80),
+        "health_status": "Healthy",
+        "reason": "Within normal operating range",
+    }
+
+
+def run_mode(name: str, db_kwargs: dict, seconds: float, readers: int, batch: int, rate: float) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db = DatabaseAccess(db_path=path, **db_kwargs)
+    db.start()
+
+    ts = 1_700_000_000
+    for _ in range(50):
+        db.insert_telemetry_batch([make_row(ts + i) for i in range(1000)])
+        ts += 1000
+
+    stop = threading.Event()
+    written = [0]
+    latencies = [[] for _ in range(readers)]
+
+    # rows are built up front so the writer thread spends its time in SQLite
+    pool = [make_row(ts + i) for i in range(batch * 20)]
+
+    def writer():
+        n = 0
+        t_next = time.perf_counter()
+        while not stop.is_set():
+            start = (n * batch) % len(pool)
+            db.insert_telemetry_batch(pool[start:start + batch])
+            n += 1
+            written[0] += batch
+            if rate > 0:
+                t_next += batch / rate
+                delay = t_next - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def reader(i: int):
+        out = latencies[i]
+        while not stop.is_set():
+            site = random.choice(SITES)
+            t0 = time.perf_counter()
+            db.get_latest_per_device(limit=500)
+            db.get_history(site, limit=200)
+            db.get_latest_raw(site)
+            out.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    t_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+    db.stop()
+
+    lat = np.array([x for xs in latencies for x in xs]) * 1000.0
+    print(
+        f"  {name:10s} reads/s={len(lat) / elapsed:8.0f}  "
+        f"p50={np.percentile(lat, 50):7.2f} ms  p99={np.percentile(lat, 99):7.2f} ms  "
+        f"writes/s={written[0] / elapsed:8.0f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=200, help="rows per write transaction")
+    parser.add_argument("--rate", type=float, default=0, help="target rows/s written (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    print(
+        f"Read latency under write load ({args.readers} readers, {args.batch} rows/commit, "
+        f"target {args.rate:.0f} rows/s, {args.seconds:.0f}s per mode)"
+    )
+    for name, kwargs in [
+        ("shared", {"journal_mode": "DELETE", "read_pool": False}),
+        ("wal+pool", {"journal_mode": "WAL", "read_pool": True}),
+    ]:
+        run_mode(name, kwargs, args.seconds, args.readers, args.batch, args.rate)
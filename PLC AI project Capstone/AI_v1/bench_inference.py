@@ -0,0 +1,123 @@
+# bench_inference.py
+"""
+Latency benchmark: sklearn RandomForest vs CompiledForest (forest_Engine).
+
+What it does:
+- Trains a model on synthetic data (same settings as train_ai_model.py)
+- Checks the compiled forest gives identical labels to sklearn, including
+  rows placed exactly on split thresholds
+- Times single-row predict_status and small predict_batch calls for both
+  engines (AIModel sends batches above compiled_max_rows to sklearn)
+
+Usage:
+  python bench_inference.py
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ai_Model import AIModel
+from train_ai_model import generate_synthetic_training_data
+
+FEATURE_KEYS = ["used_memory", "used_storage", "cpuusage", "temperature"]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000.0, q))
+
+
+def threshold_rows(ai: AIModel, n: int = 5000) -> np.ndarray:
+    """
+    Rows whose values sit exactly on (and one ulp around) the raw split
+    thresholds: the hardest case for folding the scaler into the tree.
+    """
+    art = ai.artifacts
+    rng = np.random.default_rng(0)
+    scaler = art.scaler
+    X = rng.uniform(scaler.data_min_, scaler.data_max_, size=(n, len(FEATURE_KEYS)))
+
+    picks = []
+    for est in art.model.estimators_[:50]:
+        t = est.tree_
+        inner = t.children_left != -1
+        for f, thr in zip(t.feature[inner], t.threshold[inner]):
+            raw = (thr - scaler.min_[f]) / scaler.scale_[f]
+            picks.append((f, raw))
+    for i in range(n):
+        f, raw = picks[rng.integers(len(picks))]
+        X[i, f] = np.nextafter(raw, [-np.inf, 0, np.inf][i % 3]) if i % 3 != 1 else raw
+    return X
+
+
+def check_identical(ai: AIModel, X: np.ndarray) -> int:
+    art = ai.artifacts
+    sk = art.model.predict(art.scaler.transform(X))
+    fast = art.compiled.predict_ids(X)
+    return int(np.sum(sk != fast))
+
+
+def time_single(ai: AIModel, rows, repeat: int):
+    samples = []
+    for i in range(repeat):
+        r = rows[i % len(rows)]
+        t0 = time.perf_counter()
+        ai.predict_status(r)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def time_batch(ai: AIModel, rows, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ai.predict_batch(rows)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == "__main__":
+    model_path = os.path.join(tempfile.mkdtemp(), "bench_model.pkl")
+    ai = AIModel(model_path=model_path)
+    ai.train_from_rows(
+        generate_synthetic_training_data(n_samples=4000),
+        feature_keys=FEATURE_KEYS,
+        label_key="label",
+        n_estimators=400,
+        max_depth=None
+    )
+    forest = ai.artifacts.compiled
+    print(f"\nCompiled forest: {forest.n_trees} trees, {forest.n_nodes} nodes, max depth {forest.max_depth}")
+
+    # --- correctness ---
+    rows = generate_synthetic_training_data(n_samples=20000)
+    X = np.array([[r[k] for k in FEATURE_KEYS] for r in rows], dtype=float)
+    X = np.where(np.isnan(X), 0.0, X)
+    print("Label mismatches (synthetic rows):  ", check_identical(ai, X))
+    print("Label mismatches (threshold rows):  ", check_identical(ai, threshold_rows(ai)))
+
+    # --- latency ---
+    compiled = ai.artifacts.compiled
+    single_rows = rows[:200]
+
+    batch_sizes = [8, 32, ai.compiled_max_rows]
+
+    ai.artifacts.compiled = None
+    sk_single = time_single(ai, single_rows, repeat=200)
+    sk_batch = [time_batch(ai, rows[:n]) for n in batch_sizes]
+
+    ai.artifacts.compiled = compiled
+    fast_single = time_single(ai, single_rows, repeat=2000)
+    fast_batch = [time_batch(ai, rows[:n]) for n in batch_sizes]
+
+    print("\nSingle-row predict_status latency (ms)")
+    print(f"  {'engine':10s} {'p50':>8s} {'p99':>8s}")
+    print(f"  {'sklearn':10s} {percentile_ms(sk_single, 50):8.3f} {percentile_ms(sk_single, 99):8.3f}")
+    print(f"  {'compiled':10s} {percentile_ms(fast_single, 50):8.3f} {percentile_ms(fast_single, 99):8.3f}")
+
+    print("\npredict_batch latency (ms, best of 20)")
+    print(f"  {'rows':>6s} {'sklearn':>10s} {'compiled':>10s}")
+    for n, sk, fast in zip(batch_sizes, sk_batch, fast_batch):
+        print(f"  {n:6d} {sk * 1000:10.3f} {fast * 1000:10.3f}")
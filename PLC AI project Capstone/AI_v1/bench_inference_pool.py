@@ -0,0 +1,121 @@
+# bench_inference_pool.py
+"""
+Throughput benchmark: in-process scoring vs InferencePool (worker processes).
+
+What it does:
+- Trains a model on synthetic data (same settings as train_ai_model.py)
+- For in-process and for each pool size, runs for --seconds:
+  - --submitters threads calling predict_batch on --batch-rows rows
+    (like IngestPipeline flushes)
+  - one thread parsing MQTT-sized JSON payloads (stand-in for the paho
+    loop / Flask handlers that share the interpreter)
+  - one thread sleeping 1 ms in a loop and recording how late it wakes up
+    (how long it waits for the GIL)
+- Reports scored rows/s, JSON payloads/s and wake-up lateness
+
+The pool only adds throughput with spare cores: on a single core the
+workers compete with the main process for the same CPU.
+
+Usage:
+  python bench_inference_pool.py [--workers 1,2,4] [--seconds 5] [--batch-rows 500] [--submitters 2]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from ai_Model import AIModel
+from train_ai_model import FEATURE_KEYS, generate_synthetic_training_arrays
+
+PAYLOAD = json.dumps({
+    "siteid": "PH-NCR-01788", "gateway": "GW-01", "time": 1700000000,
+    "totalmemory": 1873.92, "remainingmemory": 812.5, "storagetotal": 4249.6,
+    "remainingstorage": 640.2, "cpuusage": 37.5, "temperature": 44.1,
+    **{f"field{i}": i * 1.5 for i in range(40)}
+})
+
+
+def run(ai: AIModel, X: np.ndarray, seconds: float, batch_rows: int, submitters: int) -> dict:
+    stop = threading.Event()
+    scored = [0] * submitters
+    parsed = [0]
+    lateness = []
+
+    def submit(i: int) -> None:
+        rng = np.random.default_rng(i)
+        while not stop.is_set():
+            start = int(rng.integers(0, X.shape[0] - batch_rows))
+            ai.predict_batch(X[start:start + batch_rows])
+            scored[i] += batch_rows
+
+    def parse() -> None:
+        while not stop.is_set():
+            json.loads(PAYLOAD)
+            parsed[0] += 1
+
+    def tick() -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            time.sleep(0.001)
+            lateness.append(time.perf_counter() - t0 - 0.001)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(submitters)]
+    threads += [threading.Thread(target=parse), threading.Thread(target=tick)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    late_ms = np.array(lateness) * 1000
+    return {
+        "rows_per_sec": sum(scored) / seconds,
+        "json_per_sec": parsed[0] / seconds,
+        "late_p50": float(np.percentile(late_ms, 50)),
+        "late_p99": float(np.percentile(late_ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="in-process vs pooled inference throughput")
+    parser.add_argument("--workers", default=None, help="comma-separated pool sizes (default: 1,2,cores-1)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch-rows", type=int, default=500)
+    parser.add_argument("--submitters", type=int, default=2)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    sizes = sorted({int(w) for w in args.workers.split(",")}) if args.workers else sorted({1, 2, max(1, cores - 1)})
+
+    model_path = os.path.join(tempfile.mkdtemp(), "bench_model.pkl")
+    X, labels = generate_synthetic_training_arrays(n_samples=4000)
+    AIModel(model_path=model_path).train_from_arrays(X, labels, feature_keys=FEATURE_KEYS, n_estimators=400)
+    rows, _ = generate_synthetic_training_arrays(n_samples=50000, rng=np.random.default_rng(1))
+    rows = np.where(np.isnan(rows), 0.0, rows)
+
+    results = []
+    for workers in [0] + sizes:
+        ai = AIModel(model_path=model_path, inference_workers=workers)
+        ai.start()
+        stats = run(ai, rows, args.seconds, args.batch_rows, args.submitters)
+        ai.stop()
+        results.append(("in-process" if workers == 0 else f"pool x{workers}", stats))
+
+    print(f"\n{cores} CPU core(s), {args.submitters} submitter thread(s), {args.batch_rows}-row batches, "
+          f"{args.seconds:.0f}s per mode")
+    print(f"  {'mode':12s} {'rows/s':>10s} {'json/s':>10s} {'late p50 ms':>12s} {'late p99 ms':>12s}")
+    for name, st in results:
+        print(
+            f"  {name:12s} {st['rows_per_sec']:10,.0f} {st['json_per_sec']:10,.0f} "
+            f"{st['late_p50']:12.2f} {st['late_p99']:12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
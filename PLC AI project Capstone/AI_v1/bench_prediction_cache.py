@@ -0,0 +1,82 @@
+# bench_prediction_cache.py
+"""
+Prediction cache benchmark: AIModel.predict_status with and without the
+quantized prediction cache (prediction_Cache).
+
+What it does:
+- Trains a model on synthetic data (same settings as train_ai_model.py)
+- Simulates --devices devices each reporting a steady reading plus sensor
+  noise (values rounded to 2 decimals like the gateways send them)
+- Scores --readings readings one at a time, uncached and with the cache at
+  each resolution scale (1 = prediction_Cache.DEFAULT_RESOLUTION)
+- Reports us per call, hit rate, share of lookups in cells a split runs
+  through (always computed), evictions and labels that differ from the
+  uncached run (must be 0)
+
+Usage:
+  python bench_prediction_cache.py [--devices 200] [--readings 20000] [--scales 0.5,1,4] [--entries 10000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ai_Model import AIModel
+from prediction_Cache import DEFAULT_RESOLUTION
+from train_ai_model import FEATURE_KEYS, generate_synthetic_training_arrays
+
+# per-reading noise (std) around each device's steady state
+NOISE = {"used_memory": 0.3, "used_storage": 0.2, "cpuusage": 0.05, "temperature": 0.03}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="predict_status with/without the prediction cache")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--scales", default="0.5,1,4", help="comma-separated multiples of the default resolution")
+    parser.add_argument("--entries", type=int, default=10000)
+    args = parser.parse_args()
+
+    model_path = os.path.join(tempfile.mkdtemp(), "bench_model.pkl")
+    X, labels = generate_synthetic_training_arrays(n_samples=4000)
+    AIModel(model_path=model_path).train_from_arrays(X, labels, feature_keys=FEATURE_KEYS, n_estimators=300)
+
+    rng = np.random.default_rng(1)
+    steady, _ = generate_synthetic_training_arrays(n_samples=args.devices, rng=rng)
+    steady = np.nan_to_num(steady)
+    noise = np.array([NOISE[k] for k in FEATURE_KEYS])
+    device = rng.integers(0, args.devices, size=args.readings)
+    readings = np.round(steady[device] + rng.normal(0.0, noise, size=(args.readings, len(FEATURE_KEYS))), 2)
+    rows = [dict(zip(FEATURE_KEYS, r)) for r in readings.tolist()]
+
+    def score(ai: AIModel):
+        t0 = time.perf_counter()
+        out = [ai.predict_status(r)[0] for r in rows]
+        return out, (time.perf_counter() - t0) / len(rows) * 1e6
+
+    ai = AIModel(model_path=model_path)
+    ai.start()
+    baseline, base_us = score(ai)
+
+    print(f"\n{args.devices} devices, {args.readings:,d} readings, {args.entries:,d} cache entries")
+    print(f"  {'mode':14s} {'us/call':>8s} {'hit rate':>9s} {'split cells':>12s} {'evictions':>10s} {'label diffs':>12s}")
+    print(f"  {'uncached':14s} {base_us:8.1f}")
+    for scale in [float(s) for s in args.scales.split(",")]:
+        resolution = {k: v * scale for k, v in DEFAULT_RESOLUTION.items()}
+        ai = AIModel(model_path=model_path, prediction_cache=args.entries, cache_resolution=resolution)
+        ai.start()
+        out, us = score(ai)
+        st = ai.model_info()["prediction_cache"]
+        lookups = st["hits"] + st["misses"] + st["uncacheable_hits"]
+        diffs = sum(a != b for a, b in zip(out, baseline))
+        print(
+            f"  {f'cache x{scale:g}':14s} {us:8.1f} {st['hit_rate']:9.1%} "
+            f"{st['uncacheable_hits'] / lookups:12.1%} {st['evictions']:10,d} {diffs:12d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
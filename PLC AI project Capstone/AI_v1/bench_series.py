@@ -0,0 +1,112 @@
+# bench_series.py
+"""
+Chart series benchmark: raw rows vs downsampled /api/device/series.
+
+Builds a temp DB holding --rows samples for one siteid (1 per second),
+then for the full range compares:
+- raw       : get_history(columns=[metric]) serialized as JSON (what a
+              chart would have to download without downsampling)
+- lttb      : get_metric_series + LTTB to --points points
+- minmax    : get_metric_series + min/max buckets to --points points
+Reports server time (query + downsample + JSON) and response size, then
+the same through the Flask endpoint.
+
+Usage:
+  python bench_series.py [--rows 1000000] [--points 1000]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from database_Access import DatabaseAccess
+from series_Downsample import downsample
+from web_Server import WebServer
+
+SITE = "PH-NCR-00001"
+METRIC = "cpuusage"
+
+
+def build_db(n_rows: int) -> DatabaseAccess:
+    db = DatabaseAccess(db_path=os.path.join(tempfile.mkdtemp(), "series.db"), compress_raw=False)
+    db.start()
+    rng = np.random.default_rng(0)
+    cpu = np.clip(40 + rng.normal(0, 1, n_rows).cumsum() * 0.05 + rng.normal(0, 3, n_rows), 0, 100)
+    spikes = rng.random(n_rows) < 1e-4
+    cpu[spikes] = 100.0
+
+    t0 = 1_700_000_000
+    batch = 50_000
+    for start in range(0, n_rows, batch):
+        db.insert_telemetry_batch([
+            {
+                "ts": t0 + i,
+                "gateway": "142e0c1a5b3d9f70",
+                "siteid": SITE,
+                "topic": "plc/devices/diagnostic/test",
+                "raw": b"{}",
+                "used_memory": 1200.0,
+                "used_storage": 3500.0,
+                "cpuusage": float(cpu[i]),
+                "temperature": 45.0,
+                "health_status": "Healthy",
+                "reason": "Within normal operating range",
+            }
+            for i in range(start, min(start + batch, n_rows))
+        ])
+    return db
+
+
+def best_of(fn, repeat: int = 3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--points", type=int, default=1000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    db = build_db(args.rows)
+    print(f"Built {args.rows} rows in {time.perf_counter() - t0:.1f}s\n")
+    since, until = 1_700_000_000, 1_700_000_000 + args.rows
+
+    def raw():
+        rows = db.get_history(SITE, limit=args.rows, since=since, until=until, columns=[METRIC])
+        return json.dumps({"rows": rows})
+
+    def series(method):
+        def run():
+            ts, values = db.get_metric_series(SITE, METRIC, since, until)
+            ts, values = downsample(ts, values, args.points, method=method)
+            return json.dumps({"points": list(zip(ts.tolist(), values.tolist()))})
+        return run
+
+    t_fetch, (ts, values) = best_of(lambda: db.get_metric_series(SITE, METRIC, since, until))
+    print(f"get_metric_series: {len(ts)} points in {t_fetch * 1000:.0f} ms")
+    for method in ("lttb", "minmax"):
+        t, _ = best_of(lambda: downsample(ts, values, args.points, method=method), repeat=5)
+        print(f"  {method:7s} downsample only: {t * 1000:7.1f} ms")
+
+    print(f"\nFull range, metric={METRIC}, {args.points} points")
+    print(f"  {'mode':8s} {'time':>10s} {'bytes':>12s}")
+    for name, fn in [("raw", raw), ("lttb", series("lttb")), ("minmax", series("minmax"))]:
+        t, body = best_of(fn, repeat=1 if name == "raw" else 3)
+        print(f"  {name:8s} {t * 1000:8.0f} ms {len(body):12,d}")
+
+    client = WebServer(db=db).app.test_client()
+    url = f"/api/device/series?siteid={SITE}&metric={METRIC}&since={since}&until={until}&points={args.points}"
+    t, resp = best_of(lambda: client.get(url))
+    print(f"\nGET /api/device/series (lttb): {t * 1000:.0f} ms, {len(resp.data):,d} bytes, "
+          f"{len(resp.json['points'])} of {resp.json['raw_points']} points")
+    db.stop()
@@ -1,38 +1,254 @@
 # db.py
+import itertools
+import os
 import sqlite3
 import json
 import threading
-from typing import Any, Dict, List, Optional
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
 
 from base_Service import BaseService
 
 
+# Columns copied from telemetry into device_latest
+LATEST_COLUMNS = (
+    "ts", "gateway", "topic",
+    "used_memory", "used_storage", "cpuusage", "temperature",
+    "health_status", "reason"
+)
+
+# Metrics aggregated into the rollup tables
+ROLLUP_METRICS = ("used_memory", "used_storage", "cpuusage", "temperature")
+
+# Rollup resolutions: table name -> bucket width in seconds
+ROLLUP_TABLES = {
+    "1m": ("telemetry_rollup_1m", 60),
+    "1h": ("telemetry_rollup_1h", 3600),
+}
+
+# health_status <-> severity rank (worst status of a bucket = max rank)
+STATUS_RANK_SQL = "CASE {col} WHEN 'Critical' THEN 2 WHEN 'Warning' THEN 1 WHEN 'Healthy' THEN 0 END"
+RANK_STATUS_SQL = "CASE {expr} WHEN 2 THEN 'Critical' WHEN 1 THEN 'Warning' WHEN 0 THEN 'Healthy' END"
+
+# Secondary indexes on telemetry (dropped/recreated around bulk_load)
+TELEMETRY_INDEXES = {
+    "idx_telemetry_site_ts": "CREATE INDEX IF NOT EXISTS idx_telemetry_site_ts ON telemetry(siteid, ts);",
+    "idx_telemetry_gateway_ts": "CREATE INDEX IF NOT EXISTS idx_telemetry_gateway_ts ON telemetry(gateway, ts);",
+    # time-range scans across all devices (rollups + retention)
+    "idx_telemetry_ts": "CREATE INDEX IF NOT EXISTS idx_telemetry_ts ON telemetry(ts);",
+    # operator-labeled rows only (training set scans + label counts)
+    "idx_telemetry_labeled": (
+        "CREATE INDEX IF NOT EXISTS idx_telemetry_labeled ON telemetry(operator_label, id) "
+        "WHERE operator_label IS NOT NULL;"
+    ),
+}
+
+# Columns iter_training_rows can take labels from: operator-confirmed
+# labels, or the model's own output (e.g. to distill into a smaller forest)
+TRAINING_LABEL_COLUMNS = ("operator_label", "health_status")
+
+# search_devices sort keys -> SQL ordering expression
+DEVICE_SORTS = {
+    "ts": "ts",
+    "siteid": "siteid",
+    "gateway": "gateway",
+    "status": STATUS_RANK_SQL.format(col="health_status"),
+}
+
+# Columns get_history may project (id + ts are always returned for the cursor)
+HISTORY_COLUMNS = (
+    "id", "ts", "gateway", "siteid", "topic",
+    "used_memory", "used_storage", "cpuusage", "temperature",
+    "health_status", "reason"
+)
+
+JOURNAL_MODES = ("WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+INSERT_TELEMETRY_SQL = """
+    INSERT INTO telemetry
+    (id, ts, gateway, siteid, topic,
+     used_memory, used_storage, cpuusage, temperature,
+     health_status, reason)
+    VALUES (?, ?, ?, ?, ?,
+            ?, ?, ?, ?,
+            ?, ?)
+"""
+
+INSERT_RAW_SQL = "INSERT INTO telemetry_raw (telemetry_id, dict_id, payload) VALUES (?, ?, ?)"
+
+# telemetry_raw.dict_id: how payload is encoded
+RAW_PLAIN = -1          # verbatim bytes (compress_raw=False)
+RAW_ZLIB = 0            # zlib, no dictionary
+# > 0                   # zlib with the preset dictionary raw_dict.id
+
+ZDICT_MAX_BYTES = 32 * 1024   # zlib window; a bigger dictionary is never used
+
+
 class DatabaseAccess(BaseService):
     """
     SQLite DB wrapper.
     Stores:
-      - raw telemetry JSON
+      - raw telemetry JSON, exactly as received, in the side table
+        telemetry_raw (keyed by telemetry id, zlib-compressed with a preset
+        dictionary trained from recent payloads). It is only read when the
+        raw view is requested, so telemetry rows/pages stay small.
       - derived features (used_memory, used_storage, cpuusage, temperature)
       - AI outputs (health_status, reason)
+      - operator_label: label confirmed by an operator (training data)
+      - device_latest: one row per siteid with its newest telemetry,
+        kept up to date by a trigger in the same transaction as the insert
+      - telemetry_rollup_1m / telemetry_rollup_1h: per-siteid buckets with
+        min/max/avg/count of each metric + worst health_status
+        (filled by rollup_telemetry, raw rows aged out by purge_raw_before)
+
+    Connections:
+      - one writer connection, serialized by self._lock
+      - with read_pool=True (WAL), every reader thread gets its own
+        read-only connection, so dashboard reads never wait on inserts
+      - with read_pool=False, reads share the writer connection + lock
+      - long scans (exports, training) get their own snapshot connection
+        in WAL mode; otherwise they run on the writer connection + lock
     """
-    def __init__(self, db_path: str = "plc_health.db"):
+    def __init__(
+        self,
+        db_path: str = "plc_health.db",
+        journal_mode: str = "WAL",
+        synchronous: str = "NORMAL",
+        cache_size: int = -20000,          # negative = KiB (here ~20 MB per connection)
+        mmap_size: int = 256 * 1024 * 1024,
+        busy_timeout_ms: int = 5000,
+        read_pool: bool = True,
+        compress_raw: bool = True,
+        raw_compress_level: int = 6,
+        raw_dict_samples: int = 200,
+        auto_migrate: bool = True
+    ):
         super().__init__("DatabaseAccess")
         self.db_path = db_path
+        self.journal_mode = journal_mode.upper()
+        self.synchronous = synchronous.upper()
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.compress_raw = compress_raw
+        self.raw_compress_level = raw_compress_level
+        self.raw_dict_samples = raw_dict_samples
+        self.auto_migrate = auto_migrate
+
+        # preset zlib dictionaries (raw_dict table), active one used for new rows
+        self._zdicts: Dict[int, bytes] = {}
+        # compressor already primed with each dict; copied per payload
+        self._zcomp: Dict[int, Any] = {}
+        self._raw_dict_id = RAW_ZLIB
+        self._undict_rows = 0
+        self.legacy_raw = False   # telemetry still has the old raw_json column
+        # an in-memory DB cannot be opened a second time
+        self.read_pool = read_pool and db_path != ":memory:"
+        self.wal = False          # journal_mode actually in effect is WAL (set in start)
+
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"journal_mode must be one of {JOURNAL_MODES}")
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous must be one of {SYNCHRONOUS_MODES}")
+
         self._lock = threading.Lock()
         self._conn: Optional[sqlite3.Connection] = None
 
+        # per-thread read-only connections (owner thread -> connection)
+        self._local = threading.local()
+        self._read_conns: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._pool_lock = threading.Lock()
+
     def start(self) -> None:
         super().start()
         self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self._conn.row_factory = sqlite3.Row
+        self._apply_pragmas(self._conn, writer=True)
+        # the requested mode may not stick (in-memory DB, some filesystems)
+        self.wal = self._conn.execute("PRAGMA journal_mode").fetchone()[0].upper() == "WAL"
         self._init_schema()
 
     def stop(self) -> None:
+        with self._pool_lock:
+            for conn in self._read_conns.values():
+                conn.close()
+            self._read_conns = {}
+            self._local = threading.local()
         if self._conn:
             self._conn.close()
             self._conn = None
         super().stop()
 
+    # ----------------------------
+    # Connections
+    # ----------------------------
+    def _apply_pragmas(self, conn: sqlite3.Connection, writer: bool) -> None:
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        if writer:
+            # journal_mode is persistent in the file; synchronous is per connection
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+
+    def _open_read_only(self) -> sqlite3.Connection:
+        uri = "file:" + quote(os.path.abspath(self.db_path)) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        self._apply_pragmas(conn, writer=False)
+        return conn
+
+    def _read_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open_read_only()
+            with self._pool_lock:
+                # thread-per-request servers: close connections of exited threads
+                for t in [t for t in self._read_conns if not t.is_alive()]:
+                    self._read_conns.pop(t).close()
+                self._read_conns[threading.current_thread()] = conn
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _reading(self) -> Iterator[sqlite3.Connection]:
+        """
+        Connection for a read query: this thread's read-only connection, or
+        the shared writer connection (held under the lock) without the pool.
+        """
+        assert self._conn is not None
+        if not self.read_pool:
+            with self._lock:
+                yield self._conn
+            return
+        yield self._read_conn()
+
+    @contextmanager
+    def _streaming(self) -> Iterator[sqlite3.Connection]:
+        """
+        Connection for one long statement pulled with fetchmany. In WAL mode
+        a dedicated read-only connection reads a snapshot while inserts go
+        on. Otherwise a reader blocks the writer anyway (and :memory: cannot
+        be opened twice), so the statement runs on the writer connection
+        under the lock: inserts wait for it instead of failing on busy.
+        """
+        assert self._conn is not None
+        if not (self.read_pool and self.wal):
+            with self._lock:
+                yield self._conn
+            return
+        conn = self._open_read_only()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
     def _init_schema(self) -> None:
         assert self._conn is not None
         with self._lock:
@@ -44,7 +260,33 @@ class DatabaseAccess(BaseService):
                 gateway TEXT,
                 siteid TEXT,
                 topic TEXT,
-                raw_json TEXT NOT NULL,
+
+                used_memory REAL,
+                used_storage REAL,
+                cpuusage REAL,
+                temperature REAL,
+
+                health_status TEXT,
+                reason TEXT,
+
+                operator_label TEXT
+            );
+            """)
+            telemetry_cols = {r["name"] for r in cur.execute("PRAGMA table_info(telemetry)")}
+            legacy_raw = "raw_json" in telemetry_cols
+            if "operator_label" not in telemetry_cols:
+                cur.execute("ALTER TABLE telemetry ADD COLUMN operator_label TEXT")
+            for sql in TELEMETRY_INDEXES.values():
+                cur.execute(sql)
+
+            # Materialized "latest row per device" (served to the dashboard)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS device_latest (
+                siteid TEXT PRIMARY KEY,
+                telemetry_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                gateway TEXT,
+                topic TEXT,
 
                 used_memory REAL,
                 used_storage REAL,
@@ -55,17 +297,170 @@ class DatabaseAccess(BaseService):
                 reason TEXT
             );
             """)
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_site_ts ON telemetry(siteid, ts);")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_gateway_ts ON telemetry(gateway, ts);")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_device_latest_ts ON device_latest(ts);")
+            # device list: status filter sorted by recency, gateway sort/lookup
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_device_latest_status_ts ON device_latest(health_status, ts);"
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_device_latest_gateway ON device_latest(gateway);")
+
+            self._create_latest_trigger(cur)
+
+            # Raw payloads (side table, lazily loaded) + compression dictionaries
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS telemetry_raw (
+                telemetry_id INTEGER PRIMARY KEY,
+                dict_id INTEGER NOT NULL,
+                payload BLOB NOT NULL
+            );
+            """)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS raw_dict (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_ts INTEGER NOT NULL,
+                zdict BLOB NOT NULL
+            );
+            """)
+            cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_telemetry_raw_delete
+            AFTER DELETE ON telemetry
+            BEGIN
+                DELETE FROM telemetry_raw WHERE telemetry_id = OLD.id;
+            END;
+            """)
+
+            # Downsampled history
+            metric_cols = ",\n".join(
+                f"{m}_min REAL, {m}_max REAL, {m}_avg REAL, {m}_count INTEGER"
+                for m in ROLLUP_METRICS
+            )
+            for table, _ in ROLLUP_TABLES.values():
+                cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    siteid TEXT NOT NULL,
+                    bucket_ts INTEGER NOT NULL,
+                    samples INTEGER NOT NULL,
+                    {metric_cols},
+                    worst_status TEXT,
+                    PRIMARY KEY (siteid, bucket_ts)
+                ) WITHOUT ROWID;
+                """)
+
+            # Watermarks: "rollup_1m" = raw rows with ts < value are rolled up,
+            # "raw_purged_before" = raw rows with ts < value may be deleted
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            """)
             self._conn.commit()
 
+            # Existing DB from before device_latest existed -> backfill once
+            has_latest = cur.execute("SELECT 1 FROM device_latest LIMIT 1").fetchone()
+            has_telemetry = cur.execute("SELECT 1 FROM telemetry LIMIT 1").fetchone()
+            for r in cur.execute("SELECT id, zdict FROM raw_dict ORDER BY id"):
+                self._zdicts[r["id"]] = r["zdict"]
+                self._raw_dict_id = r["id"]
+
+        if has_telemetry and not has_latest:
+            n = self.rebuild_device_latest()
+            print(f"[DatabaseAccess] Backfilled device_latest ({n} devices)")
+
+        self.legacy_raw = legacy_raw
+        if legacy_raw and not self.auto_migrate:
+            print("[DatabaseAccess] Legacy raw_json column present: telemetry inserts refused until migrate_raw_payloads runs")
+        if legacy_raw and self.auto_migrate:
+            stats = self.migrate_raw_payloads()
+            print(
+                f"[DatabaseAccess] Migrated {stats['rows']} raw payloads to telemetry_raw "
+                f"({stats['bytes_before']} -> {stats['bytes_after']} bytes)"
+            )
+        elif self.compress_raw and not self._zdicts and has_telemetry:
+            self.train_raw_dictionary()
+
+    def _create_latest_trigger(self, cur: sqlite3.Cursor) -> None:
+        # Upsert on every telemetry insert (also covers executemany batches).
+        # Older rows arriving late never replace a newer one.
+        cols = ", ".join(LATEST_COLUMNS)
+        new_cols = ", ".join(f"NEW.{c}" for c in LATEST_COLUMNS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in LATEST_COLUMNS)
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_telemetry_device_latest
+        AFTER INSERT ON telemetry
+        WHEN NEW.siteid IS NOT NULL
+        BEGIN
+            INSERT INTO device_latest (siteid, telemetry_id, {cols})
+            VALUES (NEW.siteid, NEW.id, {new_cols})
+            ON CONFLICT(siteid) DO UPDATE SET
+                telemetry_id = excluded.telemetry_id, {updates}
+            WHERE excluded.ts >= device_latest.ts;
+        END;
+        """)
+
+    @contextmanager
+    def bulk_load(self) -> Iterator[None]:
+        """
+        For large offline imports (service not ingesting): drops the telemetry
+        indexes and the device_latest trigger so inserts only append rows.
+        On exit the indexes are rebuilt in one pass each and device_latest is
+        recomputed.
+        """
+        assert self._conn is not None
+        with self._lock:
+            cur = self._conn.cursor()
+            for name in TELEMETRY_INDEXES:
+                cur.execute(f"DROP INDEX IF EXISTS {name}")
+            cur.execute("DROP TRIGGER IF EXISTS trg_telemetry_device_latest")
+            self._conn.commit()
+        try:
+            yield
+        finally:
+            with self._lock:
+                cur = self._conn.cursor()
+                for sql in TELEMETRY_INDEXES.values():
+                    cur.execute(sql)
+                self._create_latest_trigger(cur)
+                self._conn.commit()
+            self.rebuild_device_latest()
+
+    def rebuild_device_latest(self) -> int:
+        """
+        Recompute device_latest from the full telemetry table.
+        Use after bulk imports/deletes or on DBs created before the table existed.
+        Returns the number of devices.
+        """
+        assert self._conn is not None
+        cols = ", ".join(LATEST_COLUMNS)
+        with self._lock:
+            cur = self._conn.cursor()
+            try:
+                cur.execute("DELETE FROM device_latest")
+                cur.execute(f"""
+                    INSERT INTO device_latest (siteid, telemetry_id, {cols})
+                    SELECT siteid, id, {cols}
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER (
+                            PARTITION BY siteid ORDER BY ts DESC, id DESC
+                        ) AS rn
+                        FROM telemetry
+                        WHERE siteid IS NOT NULL
+                    )
+                    WHERE rn = 1
+                """)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            return cur.execute("SELECT COUNT(*) FROM device_latest").fetchone()[0]
+
     def insert_telemetry(
         self,
         ts: int,
         gateway: str,
         siteid: str,
         topic: str,
-        raw: Dict[str, Any],
+        raw: Dict[str, Any] | str | bytes,
         used_memory: float | None,
         used_storage: float | None,
         cpuusage: float | None,
@@ -73,73 +468,856 @@ class DatabaseAccess(BaseService):
         health_status: str | None,
         reason: str | None,
     ) -> None:
+        self.insert_telemetry_batch([{
+            "ts": ts, "gateway": gateway, "siteid": siteid, "topic": topic, "raw": raw,
+            "used_memory": used_memory, "used_storage": used_storage,
+            "cpuusage": cpuusage, "temperature": temperature,
+            "health_status": health_status, "reason": reason,
+        }])
+
+    def insert_telemetry_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Insert many rows in one transaction (one executemany per table + one commit).
+        Each row uses the same keys as insert_telemetry's arguments.
+        "raw" may be the received payload (bytes/str, stored verbatim) or a dict;
+        rows with raw None get no telemetry_raw entry.
+        After the commit each row dict gets its telemetry "id", and
+        "new_device" = True if its siteid had no device_latest row before
+        this batch (dashboards count new devices from it).
+        """
+        if not rows:
+            return
+        if self.legacy_raw:
+            # the old raw_json column is NOT NULL: every insert would fail on it
+            raise RuntimeError(
+                "telemetry still has the legacy raw_json column; "
+                "run `python db_admin.py migrate-raw` (or start with auto_migrate=True) before inserting"
+            )
+        # compress outside the writer lock
+        dict_id = self._raw_dict_id if self.compress_raw else RAW_PLAIN
+        payloads = [
+            None if r.get("raw") is None else self._encode_raw(r["raw"], dict_id) for r in rows
+        ]
+
         assert self._conn is not None
         with self._lock:
             cur = self._conn.cursor()
-            cur.execute("""
-                INSERT INTO telemetry
-                (ts, gateway, siteid, topic, raw_json,
-                 used_memory, used_storage, cpuusage, temperature,
-                 health_status, reason)
-                VALUES (?, ?, ?, ?, ?,
-                        ?, ?, ?, ?,
-                        ?, ?)
-            """, (
-                ts, gateway, siteid, topic, json.dumps(raw),
-                used_memory, used_storage, cpuusage, temperature,
-                health_status, reason
-            ))
-            self._conn.commit()
+            try:
+                # explicit ids so the raw side table can be keyed without
+                # a per-row lastrowid round trip. Take the write lock first:
+                # another process (import_diagnostics.py, db_admin.py) must
+                # not claim the same ids between the read and the insert
+                cur.execute("BEGIN IMMEDIATE")
+                new_sites = self._unknown_siteids(cur, {r.get("siteid") for r in rows} - {None})
+                first_id = self._next_telemetry_id(cur)
+                ids = range(first_id, first_id + len(rows))
+                cur.executemany(INSERT_TELEMETRY_SQL, [(
+                    tid, r["ts"], r.get("gateway"), r.get("siteid"), r.get("topic"),
+                    r.get("used_memory"), r.get("used_storage"), r.get("cpuusage"), r.get("temperature"),
+                    r.get("health_status"), r.get("reason")
+                ) for tid, r in zip(ids, rows)])
+                cur.executemany(INSERT_RAW_SQL, [
+                    (tid, dict_id, payload) for tid, payload in zip(ids, payloads) if payload is not None
+                ])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        for tid, r in zip(ids, rows):
+            r["id"] = tid
+            r["new_device"] = r.get("siteid") in new_sites
 
-    def get_latest_per_device(self, limit: int = 200) -> List[Dict[str, Any]]:
+        if self.compress_raw and dict_id == RAW_ZLIB:
+            self._undict_rows += len(rows)
+            if self._undict_rows >= self.raw_dict_samples:
+                self._undict_rows = 0
+                self.train_raw_dictionary()
+
+    def _unknown_siteids(self, cur: sqlite3.Cursor, siteids: set, chunk: int = 500) -> set:
+        # siteids without a device_latest row yet (read inside the write transaction)
+        known = set()
+        ids = list(siteids)
+        for i in range(0, len(ids), chunk):
+            part = ids[i:i + chunk]
+            cur.execute(f"SELECT siteid FROM device_latest WHERE siteid IN ({', '.join('?' * len(part))})", part)
+            known.update(r[0] for r in cur.fetchall())
+        return siteids - known
+
+    def _next_telemetry_id(self, cur: sqlite3.Cursor) -> int:
+        # AUTOINCREMENT semantics: never reuse ids of purged rows
+        seq = cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'telemetry'").fetchone()
+        top = cur.execute("SELECT MAX(id) FROM telemetry").fetchone()[0]
+        return max(seq[0] if seq else 0, top or 0) + 1
+
+    # ----------------------------
+    # Rollups + retention
+    # ----------------------------
+    def get_rollup_state(self, name: str) -> Optional[int]:
+        with self._reading() as conn:
+            row = conn.execute("SELECT value FROM rollup_state WHERE name = ?", (name,)).fetchone()
+        return None if row is None else int(row["value"])
+
+    def _set_rollup_state(self, cur: sqlite3.Cursor, name: str, value: int) -> None:
+        cur.execute("""
+            INSERT INTO rollup_state (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = excluded.value
+        """, (name, int(value)))
+
+    def rollup_telemetry(
+        self,
+        until_ts: int,
+        late_seconds: int = 120,
+        max_span: int = 3600
+    ) -> Dict[str, int]:
         """
-        Latest row per siteid (device).
+        Aggregate completed buckets with ts < until_ts into the rollup tables.
+
+        - 1m buckets come from raw telemetry, 1h buckets from the 1m buckets
+        - the last late_seconds before the watermark are recomputed on every
+          run (INSERT OR REPLACE), so slightly late messages are still counted
+        - work is split into max_span-second transactions so the writer lock
+          is released between chunks
+        Returns number of bucket rows written per resolution.
         """
+        written = {"1m": 0, "1h": 0}
+
+        # ---- raw -> 1m ----
+        table_1m, width_1m = ROLLUP_TABLES["1m"]
+        wm = self.get_rollup_state("rollup_1m")
+        if wm is None:
+            with self._reading() as conn:
+                row = conn.execute("SELECT MIN(ts) AS t FROM telemetry").fetchone()
+            if row["t"] is None:
+                return written
+            wm = int(row["t"])
+        start = (max(0, wm - late_seconds) // width_1m) * width_1m
+        end = (int(until_ts) // width_1m) * width_1m
+        for lo in range(start, end, max_span):
+            hi = min(end, lo + max_span)
+            written["1m"] += self._rollup_chunk(self._rollup_raw_sql(table_1m, width_1m), lo, hi, "rollup_1m")
+
+        # ---- 1m -> 1h (only hours whose minutes are all rolled up) ----
+        table_1h, width_1h = ROLLUP_TABLES["1h"]
+        wm_1m = self.get_rollup_state("rollup_1m")
+        if wm_1m is None:
+            return written
+        wm = self.get_rollup_state("rollup_1h")
+        if wm is None:
+            with self._reading() as conn:
+                row = conn.execute(f"SELECT MIN(bucket_ts) AS t FROM {table_1m}").fetchone()
+            if row["t"] is None:
+                return written
+            wm = int(row["t"])
+        start = (max(0, wm - late_seconds - width_1h) // width_1h) * width_1h
+        end = (wm_1m // width_1h) * width_1h
+        for lo in range(start, end, max(max_span, width_1h)):
+            hi = min(end, lo + max(max_span, width_1h))
+            written["1h"] += self._rollup_chunk(self._rollup_1m_sql(table_1h, width_1h), lo, hi, "rollup_1h")
+
+        return written
+
+    def _rollup_chunk(self, sql: str, lo: int, hi: int, state_name: str) -> int:
         assert self._conn is not None
         with self._lock:
             cur = self._conn.cursor()
-            cur.execute("""
-                SELECT t1.*
-                FROM telemetry t1
-                INNER JOIN (
-                    SELECT siteid, MAX(ts) AS max_ts
+            try:
+                cur.execute(sql, (lo, hi))
+                n = cur.rowcount
+                self._set_rollup_state(cur, state_name, hi)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return n
+
+    def _rollup_raw_sql(self, table: str, width: int) -> str:
+        cols = ", ".join(f"{m}_min, {m}_max, {m}_avg, {m}_count" for m in ROLLUP_METRICS)
+        aggs = ", ".join(f"MIN({m}), MAX({m}), AVG({m}), COUNT({m})" for m in ROLLUP_METRICS)
+        worst = RANK_STATUS_SQL.format(expr="MAX(" + STATUS_RANK_SQL.format(col="health_status") + ")")
+        return f"""
+            INSERT OR REPLACE INTO {table} (siteid, bucket_ts, samples, {cols}, worst_status)
+            SELECT siteid, (ts / {width}) * {width} AS bucket, COUNT(*), {aggs}, {worst}
+            FROM telemetry
+            WHERE ts >= ? AND ts < ? AND siteid IS NOT NULL
+            GROUP BY siteid, bucket
+        """
+
+    def _rollup_1m_sql(self, table: str, width: int) -> str:
+        src = ROLLUP_TABLES["1m"][0]
+        cols = ", ".join(f"{m}_min, {m}_max, {m}_avg, {m}_count" for m in ROLLUP_METRICS)
+        aggs = ", ".join(
+            f"MIN({m}_min), MAX({m}_max), SUM({m}_avg * {m}_count) / SUM({m}_count), SUM({m}_count)"
+            for m in ROLLUP_METRICS
+        )
+        worst = RANK_STATUS_SQL.format(expr="MAX(" + STATUS_RANK_SQL.format(col="worst_status") + ")")
+        return f"""
+            INSERT OR REPLACE INTO {table} (siteid, bucket_ts, samples, {cols}, worst_status)
+            SELECT siteid, (bucket_ts / {width}) * {width} AS bucket, SUM(samples), {aggs}, {worst}
+            FROM {src}
+            WHERE bucket_ts >= ? AND bucket_ts < ?
+            GROUP BY siteid, bucket
+        """
+
+    def purge_raw_before(
+        self,
+        cutoff_ts: int,
+        chunk_size: int = 500,
+        pause: float = 0.05,
+        late_seconds: int = 120
+    ) -> int:
+        """
+        Delete raw telemetry older than cutoff_ts, chunk_size rows per
+        transaction, sleeping `pause` seconds between chunks so inserts can
+        take the writer lock. Rows not yet rolled up, or in the late window
+        rollup_telemetry (same late_seconds) still recomputes, are never
+        deleted. Returns number of rows deleted.
+        """
+        rolled = self.get_rollup_state("rollup_1m")
+        if rolled is None:
+            return 0
+        _, width_1m = ROLLUP_TABLES["1m"]
+        settled = (max(0, rolled - late_seconds) // width_1m) * width_1m
+        cutoff = min(int(cutoff_ts), settled)
+
+        assert self._conn is not None
+        total = 0
+        while self.running:
+            with self._lock:
+                cur = self._conn.cursor()
+                cur.execute("""
+                    DELETE FROM telemetry
+                    WHERE id IN (
+                        SELECT id FROM telemetry
+                        WHERE ts < ?
+                        ORDER BY ts
+                        LIMIT ?
+                    )
+                """, (cutoff, chunk_size))
+                n = cur.rowcount
+                if n < chunk_size:
+                    # nothing older than cutoff is left
+                    self._set_rollup_state(cur, "raw_purged_before", cutoff)
+                self._conn.commit()
+            total += n
+            if n < chunk_size:
+                break
+            time.sleep(pause)
+        return total
+
+    def purge_rollups_before(self, resolution: str, cutoff_ts: int) -> int:
+        table, _ = ROLLUP_TABLES[resolution]
+        assert self._conn is not None
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute(f"DELETE FROM {table} WHERE bucket_ts < ?", (int(cutoff_ts),))
+            self._conn.commit()
+            return cur.rowcount
+
+    def choose_resolution(self, since: int, until: int, raw_max_span: int = 6 * 3600) -> str:
+        """
+        raw for short ranges still covered by raw rows, 1m up to 7 days, else 1h.
+        """
+        purged = self.get_rollup_state("raw_purged_before") or 0
+        if until - since <= raw_max_span and since >= purged:
+            return "raw"
+        if until - since <= 7 * 24 * 3600:
+            return "1m"
+        return "1h"
+
+    def get_metric_history(
+        self,
+        siteid: str,
+        since: int,
+        until: int,
+        resolution: str = "auto"
+    ) -> List[Dict[str, Any]]:
+        """
+        Metric history for [since, until), oldest first.
+        resolution: "raw", "1m", "1h" or "auto" (see choose_resolution).
+        Rollup rows carry <metric> = bucket average plus <metric>_min/_max,
+        samples and health_status = worst status in the bucket.
+        """
+        if resolution == "auto":
+            resolution = self.choose_resolution(since, until)
+
+        with self._reading() as conn:
+            cur = conn.cursor()
+            if resolution == "raw":
+                cols = ", ".join(ROLLUP_METRICS)
+                cur.execute(f"""
+                    SELECT ts, {cols}, health_status
                     FROM telemetry
-                    WHERE siteid IS NOT NULL
-                    GROUP BY siteid
-                ) t2
-                ON t1.siteid = t2.siteid AND t1.ts = t2.max_ts
-                ORDER BY t1.ts DESC
+                    WHERE siteid = ? AND ts >= ? AND ts < ?
+                    ORDER BY ts
+                """, (siteid, since, until))
+            else:
+                table, _ = ROLLUP_TABLES[resolution]
+                cols = ", ".join(f"{m}_avg AS {m}, {m}_min, {m}_max" for m in ROLLUP_METRICS)
+                cur.execute(f"""
+                    SELECT bucket_ts AS ts, {cols}, samples, worst_status AS health_status
+                    FROM {table}
+                    WHERE siteid = ? AND bucket_ts >= ? AND bucket_ts < ?
+                    ORDER BY bucket_ts
+                """, (siteid, since, until))
+            rows = cur.fetchall()
+        return [dict(r, resolution=resolution) for r in rows]
+
+    def get_metric_series(
+        self,
+        siteid: str,
+        metric: str,
+        since: int,
+        until: int,
+        resolution: str = "raw",
+        chunk_rows: int = 65536
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ts, value) arrays of one metric for [since, until), oldest first,
+        NULL values skipped. Rows are fetched as plain tuples in chunks
+        straight into numpy (no per-row dicts), for downsampling.
+        resolution: "raw", "1m" or "1h" (bucket averages at bucket_ts).
+        Rollups only reach their watermark; the rest of the range comes
+        from raw rows, which are never purged past it.
+        """
+        if metric not in ROLLUP_METRICS:
+            raise ValueError(f"metric must be one of {ROLLUP_METRICS}")
+        queries = []
+        if resolution != "raw":
+            if resolution not in ROLLUP_TABLES:
+                raise ValueError(f"resolution must be one of {('raw', *ROLLUP_TABLES)}")
+            table, _ = ROLLUP_TABLES[resolution]
+            rolled = min(until, self.get_rollup_state(f"rollup_{resolution}") or since)
+            queries.append((f"""
+                SELECT bucket_ts, {metric}_avg
+                FROM {table}
+                WHERE siteid = ? AND bucket_ts >= ? AND bucket_ts < ? AND {metric}_avg IS NOT NULL
+                ORDER BY bucket_ts
+            """, (siteid, since, rolled)))
+            since = max(since, rolled)
+        queries.append((f"""
+            SELECT ts, {metric}
+            FROM telemetry
+            WHERE siteid = ? AND ts >= ? AND ts < ? AND {metric} IS NOT NULL
+            ORDER BY ts
+        """, (siteid, since, until)))
+
+        chunks = []
+        with self._reading() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            for sql, params in queries:
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    flat = itertools.chain.from_iterable(rows)
+                    chunks.append(np.fromiter(flat, dtype=np.float64, count=2 * len(rows)).reshape(-1, 2))
+        if not chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        data = np.concatenate(chunks)
+        return data[:, 0].astype(np.int64), data[:, 1]
+
+    def get_latest_per_device(self, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        Latest row per siteid (device), read from device_latest.
+        """
+        with self._reading() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT *
+                FROM device_latest
+                ORDER BY ts DESC
                 LIMIT ?
             """, (limit,))
             rows = cur.fetchall()
         return [dict(r) for r in rows]
 
-    def get_history(self, siteid: str, limit: int = 2000) -> List[Dict[str, Any]]:
-        assert self._conn is not None
-        with self._lock:
-            cur = self._conn.cursor()
-            cur.execute("""
+    def get_device_statuses(self) -> List[Tuple[str, int, Optional[str]]]:
+        """
+        (siteid, ts, health_status) of every device, from device_latest.
+        """
+        with self._reading() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute("SELECT siteid, ts, health_status FROM device_latest")
+            return cur.fetchall()
+
+    def search_devices(
+        self,
+        q: Optional[str] = None,
+        statuses: Optional[List[Optional[str]]] = None,
+        sort: str = "ts",
+        descending: bool = True,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        One page of device_latest plus the total number of matches.
+        - q: case-insensitive substring of siteid or gateway
+        - statuses: health_status values to keep (None = no status yet)
+        - sort: key of DEVICE_SORTS; ties broken by siteid
+        Status filters and ts/siteid/gateway orderings use the device_latest
+        indexes; a substring q scans device_latest (one row per device).
+        """
+        if sort not in DEVICE_SORTS:
+            raise ValueError(f"sort must be one of {tuple(DEVICE_SORTS)}")
+
+        where, params = [], []
+        if q:
+            pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where.append("(siteid LIKE ? ESCAPE '\\' OR gateway LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        if statuses:
+            named = [st for st in statuses if st is not None]
+            terms = []
+            if named:
+                terms.append(f"health_status IN ({', '.join('?' * len(named))})")
+                params += named
+            if len(named) < len(statuses):
+                terms.append("health_status IS NULL")
+            where.append("(" + " OR ".join(terms) + ")")
+        where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+        direction = "DESC" if descending else "ASC"
+
+        with self._reading() as conn:
+            cur = conn.cursor()
+            total = cur.execute(f"SELECT COUNT(*) FROM device_latest {where_sql}", params).fetchone()[0]
+            cur.execute(f"""
                 SELECT *
+                FROM device_latest
+                {where_sql}
+                ORDER BY {DEVICE_SORTS[sort]} {direction}, siteid {direction}
+                LIMIT ? OFFSET ?
+            """, params + [limit, offset])
+            rows = cur.fetchall()
+        return [dict(r) for r in rows], total
+
+    def get_device_latest(self, siteid: str) -> Optional[Dict[str, Any]]:
+        with self._reading() as conn:
+            row = conn.execute("SELECT * FROM device_latest WHERE siteid = ?", (siteid,)).fetchone()
+        return dict(row) if row else None
+
+    def get_history(
+        self,
+        siteid: str,
+        limit: int = 2000,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        before: Optional[Tuple[int, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        History of one device, newest first.
+        - since/until: ts range [since, until)
+        - columns: projection (subset of HISTORY_COLUMNS; id and ts always included)
+        - before: keyset cursor (ts, id) of the last row of the previous page;
+          only rows strictly older than it are returned
+        Served by idx_telemetry_site_ts, which is ordered by (siteid, ts, id).
+        """
+        cols = list(HISTORY_COLUMNS) if not columns else ["id", "ts"] + [
+            c for c in columns if c not in ("id", "ts")
+        ]
+        bad = [c for c in cols if c not in HISTORY_COLUMNS]
+        if bad:
+            raise ValueError(f"Unknown history column(s): {', '.join(bad)}")
+
+        where, params = self._history_filter(siteid, since, until)
+        if before is not None:
+            where.append("(ts, id) < (?, ?)")
+            params.extend([int(before[0]), int(before[1])])
+
+        with self._reading() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT {", ".join(cols)}
                 FROM telemetry
-                WHERE siteid = ?
-                ORDER BY ts DESC
+                WHERE {" AND ".join(where)}
+                ORDER BY ts DESC, id DESC
                 LIMIT ?
-            """, (siteid, limit))
+            """, (*params, int(limit)))
             rows = cur.fetchall()
         return [dict(r) for r in rows]
 
-    def get_latest_raw(self, siteid: str) -> Optional[Dict[str, Any]]:
+    def iter_telemetry(
+        self,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        siteids: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+        chunk_rows: int = 5000
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        Bulk export: yields lists of up to chunk_rows row tuples (columns in
+        the order of export_columns(columns)) for ts in [since, until).
+        - without siteids: ordered by (ts, id) via idx_telemetry_ts
+        - with siteids: ordered by (siteid, ts, id) via idx_telemetry_site_ts,
+          so SQLite never has to sort the result
+        Runs one statement (see _streaming) and pulls it with fetchmany:
+        memory stays at one chunk. In WAL mode writers keep going during the
+        export (the WAL cannot be checkpointed past the export's snapshot
+        until it ends); without WAL inserts wait for the export to finish.
+        """
+        cols = self.export_columns(columns)
+        where, params = [], []
+        if siteids:
+            where.append(f"siteid IN ({', '.join('?' * len(siteids))})")
+            params.extend(siteids)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(int(until))
+        where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+        order = "siteid, ts, id" if siteids else "ts, id"
+
+        with self._streaming() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(f"SELECT {', '.join(cols)} FROM telemetry {where_sql} ORDER BY {order}", params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+
+    @staticmethod
+    def export_columns(columns: Optional[List[str]] = None) -> List[str]:
+        cols = list(columns) if columns else list(HISTORY_COLUMNS)
+        bad = [c for c in cols if c not in HISTORY_COLUMNS]
+        if bad:
+            raise ValueError(f"Unknown history column(s): {', '.join(bad)}")
+        return cols
+
+    # ----------------------------
+    # Training data
+    # ----------------------------
+    def set_operator_labels(
+        self,
+        label: Optional[str],
+        ids: Optional[Iterable[int]] = None,
+        siteid: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None
+    ) -> int:
+        """
+        Set (or with label None, clear) operator_label on the telemetry rows
+        matching all given filters: explicit ids, a device, a ts range.
+        Returns the number of rows changed.
+        """
+        where, params = [], []
+        if ids is not None:
+            ids = [int(i) for i in ids]
+            if not ids:
+                return 0
+            where.append(f"id IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+        if siteid is not None:
+            where.append("siteid = ?")
+            params.append(siteid)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(int(until))
+        if not where:
+            raise ValueError("set_operator_labels needs ids, siteid or a ts range")
+
         assert self._conn is not None
         with self._lock:
             cur = self._conn.cursor()
+            try:
+                cur.execute(f"UPDATE telemetry SET operator_label = ? WHERE {' AND '.join(where)}", [label, *params])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            return cur.rowcount
+
+    def count_training_labels(
+        self,
+        label_column: str = "operator_label",
+        since: Optional[int] = None,
+        until: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Rows per label (rows without a label are not training data).
+        """
+        where, params = self._training_filter(label_column, since, until)
+        with self._reading() as conn:
+            rows = conn.execute(
+                f"SELECT {label_column} AS label, COUNT(*) AS n FROM telemetry WHERE {where} GROUP BY {label_column}",
+                params
+            ).fetchall()
+        return {r["label"]: int(r["n"]) for r in rows}
+
+    def iter_training_rows(
+        self,
+        feature_keys: List[str],
+        label_column: str = "operator_label",
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        chunk_rows: int = 50000
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        Labeled rows as (label, *features) tuples (missing feature = None),
+        up to chunk_rows per list. Same single-statement / _streaming /
+        fetchmany approach as iter_telemetry. Row order is
+        storage order: stable for a given DB, not sorted.
+        """
+        bad = [k for k in feature_keys if k not in ROLLUP_METRICS]
+        if bad:
+            raise ValueError(f"Unknown feature column(s): {', '.join(bad)}")
+        where, params = self._training_filter(label_column, since, until)
+
+        with self._streaming() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(f"SELECT {', '.join([label_column, *feature_keys])} FROM telemetry WHERE {where}", params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+
+    def iter_training_sequence(
+        self,
+        metrics: List[str],
+        label_column: str = "operator_label",
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        chunk_rows: int = 50000
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        Every row in [since, until) as (siteid, ts, label, *metrics) tuples
+        (label None if unlabeled), ordered by (ts, id) via idx_telemetry_ts:
+        the order feature_State replays devices in to rebuild per-device
+        rolling features for training.
+        """
+        bad = [k for k in metrics if k not in ROLLUP_METRICS]
+        if bad:
+            raise ValueError(f"Unknown feature column(s): {', '.join(bad)}")
+        if label_column not in TRAINING_LABEL_COLUMNS:
+            raise ValueError(f"label_column must be one of {TRAINING_LABEL_COLUMNS}")
+        where, params = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(int(until))
+        where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+        with self._streaming() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(
+                f"SELECT {', '.join(['siteid', 'ts', label_column, *metrics])} FROM telemetry "
+                f"{where_sql} ORDER BY ts, id",
+                params
+            )
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+
+    def _training_filter(self, label_column: str, since: Optional[int], until: Optional[int]) -> Tuple[str, List[Any]]:
+        if label_column not in TRAINING_LABEL_COLUMNS:
+            raise ValueError(f"label_column must be one of {TRAINING_LABEL_COLUMNS}")
+        where, params = [f"{label_column} IS NOT NULL"], []
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(int(until))
+        return " AND ".join(where), params
+
+    def count_history(self, siteid: str, since: Optional[int] = None, until: Optional[int] = None) -> int:
+        """
+        Number of stored rows for a device (index-only count, no row decoding).
+        """
+        where, params = self._history_filter(siteid, since, until)
+        with self._reading() as conn:
+            row = conn.execute(f"SELECT COUNT(*) FROM telemetry WHERE {' AND '.join(where)}", params).fetchone()
+        return int(row[0])
+
+    def _history_filter(self, siteid: str, since: Optional[int], until: Optional[int]) -> Tuple[List[str], List[Any]]:
+        where, params = ["siteid = ?"], [siteid]
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(int(until))
+        return where, params
+
+    def get_latest_raw(self, siteid: str) -> Optional[Dict[str, Any]]:
+        text = self.get_latest_raw_text(siteid)
+        if text is None:
+            return None
+        return json.loads(text)
+
+    def get_latest_raw_text(self, siteid: str) -> Optional[str]:
+        """
+        Stored payload of the newest row, as JSON text (not parsed), so the
+        web API can pass it through without a decode/encode round trip.
+        """
+        with self._reading() as conn:
+            cur = conn.cursor()
             cur.execute("""
-                SELECT raw_json
-                FROM telemetry
-                WHERE siteid = ?
-                ORDER BY ts DESC
-                LIMIT 1
+                SELECT r.dict_id, r.payload
+                FROM device_latest l
+                JOIN telemetry_raw r ON r.telemetry_id = l.telemetry_id
+                WHERE l.siteid = ?
             """, (siteid,))
             row = cur.fetchone()
         if not row:
             return None
-        return json.loads(row["raw_json"])
+        return self._decode_raw(row["dict_id"], row["payload"])
+
+    # ----------------------------
+    # Raw payload encoding
+    # ----------------------------
+    def _encode_raw(self, raw: Dict[str, Any] | str | bytes | None, dict_id: int) -> bytes:
+        if isinstance(raw, (bytes, bytearray, memoryview)):
+            data = bytes(raw)
+        elif isinstance(raw, str):
+            data = raw.encode("utf-8")
+        else:
+            data = json.dumps(raw).encode("utf-8")
+        if dict_id == RAW_PLAIN:
+            return data
+        if dict_id == RAW_ZLIB:
+            return zlib.compress(data, self.raw_compress_level)
+        base = self._zcomp.get(dict_id)
+        if base is None:
+            base = self._zcomp[dict_id] = zlib.compressobj(self.raw_compress_level, zdict=self._zdicts[dict_id])
+        c = base.copy()
+        return c.compress(data) + c.flush()
+
+    def _decode_raw(self, dict_id: int, payload: bytes) -> str:
+        if dict_id == RAW_PLAIN:
+            return bytes(payload).decode("utf-8")
+        if dict_id == RAW_ZLIB:
+            return zlib.decompress(payload).decode("utf-8")
+        d = zlib.decompressobj(zdict=self._load_zdict(dict_id))
+        return (d.decompress(payload) + d.flush()).decode("utf-8")
+
+    def _load_zdict(self, dict_id: int) -> bytes:
+        zd = self._zdicts.get(dict_id)
+        if zd is None:
+            # trained by another process/connection after we started
+            with self._reading() as conn:
+                row = conn.execute("SELECT zdict FROM raw_dict WHERE id = ?", (dict_id,)).fetchone()
+            zd = self._zdicts[dict_id] = row["zdict"]
+        return zd
+
+    def train_raw_dictionary(self, samples: Optional[int] = None) -> Optional[int]:
+        """
+        Build a zlib preset dictionary from the most recent payloads and make
+        it the active one for new rows. Simulator/device payloads share the
+        same ~60 keys and most values, so a dictionary made of real payloads
+        lets even a single small message compress well.
+        Returns the new dictionary id (None if there are no payloads yet).
+        """
+        samples = samples or self.raw_dict_samples
+        with self._reading() as conn:
+            rows = conn.execute("""
+                SELECT dict_id, payload FROM telemetry_raw
+                ORDER BY telemetry_id DESC
+                LIMIT ?
+            """, (samples,)).fetchall()
+        if not rows:
+            return None
+
+        zdict = _build_zdict(self._decode_raw(r["dict_id"], r["payload"]).encode("utf-8") for r in rows)
+
+        assert self._conn is not None
+        with self._lock:
+            cur = self._conn.cursor()
+            dict_id = self._store_zdict(cur, zdict)
+            self._conn.commit()
+        print(f"[DatabaseAccess] Trained raw payload dictionary #{dict_id} ({len(zdict)} bytes)")
+        return dict_id
+
+    def _store_zdict(self, cur: sqlite3.Cursor, zdict: bytes) -> int:
+        cur.execute("INSERT INTO raw_dict (created_ts, zdict) VALUES (?, ?)", (int(time.time()), zdict))
+        dict_id = int(cur.lastrowid)
+        self._zdicts[dict_id] = zdict
+        self._raw_dict_id = dict_id
+        return dict_id
+
+    def migrate_raw_payloads(self, chunk_size: int = 2000) -> Dict[str, int]:
+        """
+        Move telemetry.raw_json (DBs created before telemetry_raw existed)
+        into the compressed side table and drop the column.
+        Returns {"rows", "bytes_before", "bytes_after"}.
+        """
+        assert self._conn is not None
+        stats = {"rows": 0, "bytes_before": 0, "bytes_after": 0}
+
+        def plain(value: str | bytes) -> bytes:
+            # raw_json was TEXT, or a zlib BLOB when compress_raw was on
+            return zlib.decompress(value) if isinstance(value, bytes) else value.encode("utf-8")
+
+        with self._lock:
+            cur = self._conn.cursor()
+            if self.compress_raw and not self._zdicts:
+                recent = cur.execute(
+                    "SELECT raw_json FROM telemetry ORDER BY id DESC LIMIT ?", (self.raw_dict_samples,)
+                ).fetchall()
+                if recent:
+                    self._store_zdict(cur, _build_zdict(plain(r["raw_json"]) for r in recent))
+            dict_id = self._raw_dict_id if self.compress_raw else RAW_PLAIN
+
+            try:
+                src = self._conn.cursor()
+                src.execute("SELECT id, raw_json FROM telemetry ORDER BY id")
+                while True:
+                    chunk = src.fetchmany(chunk_size)
+                    if not chunk:
+                        break
+                    out = []
+                    for r in chunk:
+                        data = plain(r["raw_json"])
+                        stats["bytes_before"] += len(data)
+                        payload = self._encode_raw(data, dict_id)
+                        stats["bytes_after"] += len(payload)
+                        out.append((r["id"], dict_id, payload))
+                    cur.executemany(INSERT_RAW_SQL, out)
+                    stats["rows"] += len(chunk)
+                cur.execute("ALTER TABLE telemetry DROP COLUMN raw_json")
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        self.legacy_raw = False
+        return stats
+
+    def vacuum(self) -> None:
+        assert self._conn is not None
+        with self._lock:
+            self._conn.execute("VACUUM")
+            # in WAL mode the rewritten pages land in the -wal file first
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _build_zdict(payloads_newest_first: Iterable[bytes]) -> bytes:
+    """
+    Concatenate recent payloads into a zlib preset dictionary (max 32 KiB).
+    Newest payloads go last: zlib favours matches near the end of the dictionary.
+    """
+    parts: List[bytes] = []
+    size = 0
+    for data in payloads_newest_first:
+        if size + len(data) > ZDICT_MAX_BYTES:
+            if not parts:
+                parts.append(data[-ZDICT_MAX_BYTES:])
+            break
+        parts.append(data)
+        size += len(data)
+    return b"".join(reversed(parts))
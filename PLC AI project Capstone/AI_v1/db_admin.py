@@ -0,0 +1,146 @@
+# db_admin.py
+"""
+Maintenance commands for plc_health.db (run while the service is stopped,
+or against a copy).
+
+Usage:
+  python db_admin.py rebuild-latest [--db plc_health.db]
+  python db_admin.py migrate-raw [--db plc_health.db]
+  python db_admin.py train-dict [--db plc_health.db] [--samples 200]
+  python db_admin.py export [--db plc_health.db] [--format ndjson|csv] [--since TS] [--until TS]
+                            [--siteid ID ...] [--columns a,b] [--out FILE]
+  python db_admin.py label (--label Healthy|Warning|Critical | --clear) [--db plc_health.db]
+                           [--id N ...] [--siteid ID] [--since TS] [--until TS]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from database_Access import DatabaseAccess
+from telemetry_Export import EXPORT_FORMATS, export_telemetry
+
+
+def cmd_rebuild_latest(db: DatabaseAccess, args) -> None:
+    t0 = time.perf_counter()
+    n = db.rebuild_device_latest()
+    print(f"[db_admin] device_latest rebuilt: {n} devices in {time.perf_counter() - t0:.2f}s")
+
+
+def cmd_migrate_raw(db: DatabaseAccess, args) -> None:
+    size_before = _db_size(db.db_path)
+    t0 = time.perf_counter()
+    if db.legacy_raw:
+        stats = db.migrate_raw_payloads()
+        print(
+            f"[db_admin] moved {stats['rows']} payloads to telemetry_raw: "
+            f"{stats['bytes_before'] / 1e6:.2f} MB -> {stats['bytes_after'] / 1e6:.2f} MB "
+            f"({_pct(stats['bytes_before'], stats['bytes_after'])})"
+        )
+    else:
+        print("[db_admin] raw payloads already in telemetry_raw")
+    db.vacuum()
+    size_after = _db_size(db.db_path)
+    print(
+        f"[db_admin] DB file {size_before / 1e6:.2f} MB -> {size_after / 1e6:.2f} MB "
+        f"({_pct(size_before, size_after)}) in {time.perf_counter() - t0:.1f}s"
+    )
+
+
+def cmd_train_dict(db: DatabaseAccess, args) -> None:
+    dict_id = db.train_raw_dictionary(samples=args.samples)
+    if dict_id is None:
+        print("[db_admin] no payloads stored yet")
+
+
+def cmd_export(db: DatabaseAccess, args) -> None:
+    columns = [c for c in args.columns.split(",") if c] if args.columns else None
+    chunks = export_telemetry(
+        db,
+        fmt=args.format,
+        since=args.since,
+        until=args.until,
+        siteids=args.siteid,
+        columns=columns
+    )
+    t0 = time.perf_counter()
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for block in chunks:
+            out.write(block)
+    finally:
+        if args.out:
+            out.close()
+    if args.out:
+        print(f"[db_admin] exported to {args.out} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+
+def cmd_label(db: DatabaseAccess, args) -> None:
+    label = None if args.clear else args.label
+    n = db.set_operator_labels(label, ids=args.id, siteid=args.siteid, since=args.since, until=args.until)
+    print(f"[db_admin] operator_label {'cleared' if label is None else '= ' + label} on {n} rows")
+    print(f"[db_admin] labeled rows: {db.count_training_labels()}")
+
+
+def _db_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def _pct(before: int, after: int) -> str:
+    return f"-{100.0 * (before - after) / before:.1f}%" if before else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="plc_health.db maintenance")
+    parser.add_argument("--db", default="plc_health.db", help="SQLite DB path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-latest", help="recompute device_latest from telemetry")
+    p.set_defaults(func=cmd_rebuild_latest)
+
+    p = sub.add_parser("migrate-raw", help="move raw_json into compressed telemetry_raw, then VACUUM")
+    p.set_defaults(func=cmd_migrate_raw)
+
+    p = sub.add_parser("train-dict", help="train a new zlib dictionary from recent payloads")
+    p.add_argument("--samples", type=int, default=200)
+    p.set_defaults(func=cmd_train_dict)
+
+    p = sub.add_parser("export", help="stream telemetry rows as NDJSON or CSV")
+    p.add_argument("--format", choices=tuple(EXPORT_FORMATS), default="ndjson")
+    p.add_argument("--since", type=int, default=None, help="unix ts (inclusive)")
+    p.add_argument("--until", type=int, default=None, help="unix ts (exclusive)")
+    p.add_argument("--siteid", action="append", default=None, help="repeat for several devices")
+    p.add_argument("--columns", default=None, help="comma-separated subset of columns")
+    p.add_argument("--out", default=None, help="output file (default: stdout)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("label", help="set operator_label (training label) on telemetry rows")
+    g = p.add_mutually_exclusive_group(required=True)
+    g.add_argument("--label", choices=("Healthy", "Warning", "Critical"))
+    g.add_argument("--clear", action="store_true", help="remove the label")
+    p.add_argument("--id", type=int, action="append", default=None, help="telemetry id (repeatable)")
+    p.add_argument("--siteid", default=None)
+    p.add_argument("--since", type=int, default=None, help="unix ts (inclusive)")
+    p.add_argument("--until", type=int, default=None, help="unix ts (exclusive)")
+    p.set_defaults(func=cmd_label)
+
+    args = parser.parse_args()
+
+    # export to stdout: keep service log lines out of the data
+    log = sys.stderr if args.command == "export" and not args.out else sys.stdout
+
+    # migrate-raw reports sizes itself, so don't migrate implicitly on start
+    db = DatabaseAccess(db_path=args.db, auto_migrate=False)
+    with contextlib.redirect_stdout(log):
+        db.start()
+    try:
+        args.func(db, args)
+    finally:
+        with contextlib.redirect_stdout(log):
+            db.stop()
+
+
+if __name__ == "__main__":
+    main()
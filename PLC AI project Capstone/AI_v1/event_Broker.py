@@ -0,0 +1,118 @@
+# event_broker.py
+import itertools
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from base_Service import BaseService
+
+# Fields pushed for a device when a newer sample is committed
+DEVICE_EVENT_FIELDS = (
+    "ts", "gateway", "siteid",
+    "used_memory", "used_storage", "cpuusage", "temperature",
+    "health_status", "reason", "new_device"
+)
+
+
+class EventBroker(BaseService):
+    """
+    In-process publish/subscribe for dashboard push (SSE).
+    - IngestPipeline listener (add_listener(broker.on_batch)) turns each
+      committed batch into one "devices" event holding only the devices
+      that got a newer sample, newest sample per device
+    - Each subscriber gets its own bounded queue; a subscriber that falls
+      behind is dropped (the browser's EventSource reconnects and reloads)
+    - stop() closes every open stream
+    """
+    def __init__(self, max_queue: int = 256):
+        super().__init__("EventBroker")
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers: List["queue.Queue[Optional[Tuple[int, str, Any]]]"] = []
+        self._seq = itertools.count(1)
+        self._last_ts: Dict[str, int] = {}
+
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def stop(self) -> None:
+        with self._lock:
+            subs, self._subscribers = self._subscribers, []
+        for q in subs:
+            _close(q)
+        super().stop()
+
+    # ----------------------------
+    # Subscribers
+    # ----------------------------
+    def subscribe(self) -> "queue.Queue[Optional[Tuple[int, str, Any]]]":
+        """
+        Queue of (event_id, event_name, data) tuples; None means the stream
+        was closed by the broker.
+        """
+        q: "queue.Queue[Optional[Tuple[int, str, Any]]]" = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q) -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    # ----------------------------
+    # Publishing
+    # ----------------------------
+    def publish(self, event: str, data: Any) -> None:
+        item = (next(self._seq), event, data)
+        with self._lock:
+            subs = list(self._subscribers)
+        for q in subs:
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                self.unsubscribe(q)
+                self.dropped_subscribers += 1
+                _close(q)
+        self.published += 1
+
+    def on_batch(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Pipeline listener: publish the newest sample of each device in the
+        batch, skipping samples older than what was already pushed.
+        """
+        newest: Dict[str, Dict[str, Any]] = {}
+        for r in rows:
+            siteid = r.get("siteid")
+            if siteid is None:
+                continue
+            cur = newest.get(siteid)
+            if cur is None or r["ts"] >= cur["ts"]:
+                newest[siteid] = r
+
+        changed = []
+        with self._lock:
+            for siteid, r in newest.items():
+                if r["ts"] < self._last_ts.get(siteid, r["ts"]):
+                    continue
+                self._last_ts[siteid] = r["ts"]
+                changed.append({k: r.get(k) for k in DEVICE_EVENT_FIELDS})
+        if changed:
+            self.publish("devices", changed)
+
+
+def _close(q: "queue.Queue") -> None:
+    # make room for the close marker so a blocked reader always wakes up
+    while True:
+        try:
+            q.put_nowait(None)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
@@ -0,0 +1,332 @@
+# feature_state.py
+import math
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from base_Service import BaseService
+from database_Access import ROLLUP_METRICS, DatabaseAccess
+
+# Metrics with rolling statistics, and the statistics kept for each
+ROLLING_METRICS = ROLLUP_METRICS
+ROLLING_STATS = ("ewma", "mean", "std", "slope")
+
+
+def rolling_feature_names(metrics: Sequence[str] = ROLLING_METRICS) -> List[str]:
+    """
+    "<metric>_<stat>" feature names, metric-major (the column order of
+    FeatureState.replay).
+    """
+    return [f"{m}_{s}" for m in metrics for s in ROLLING_STATS]
+
+
+ROLLING_FEATURE_KEYS = rolling_feature_names()
+
+# Weight the replayed history must leave to the (unknown) older samples
+# for a rebuilt EWMA to match the live one
+EWMA_WARM_TOLERANCE = 1e-4
+
+
+class _DeviceWindow:
+    """
+    Rolling state of one siteid: the last `window` messages in a ring
+    (ts + one value column per metric, NaN = missing), and per metric the
+    EWMA and running sums over the ring:
+      sums[m] = [n, St, Sv, Stt, Svv, Stv]
+    with t = ts - ref_t and v = value - ref_v[m], so the sums stay small
+    and var/slope don't lose precision to cancellation. Every `window`
+    messages the refs move to the current data and the sums are recomputed
+    from the ring, so rounding error never builds up (amortized O(1)).
+    """
+    __slots__ = ("ts", "values", "head", "size", "adds", "ref_t", "ref_v", "sums", "ewma")
+
+    def __init__(self, window: int, n_metrics: int):
+        self.ts = array("d", bytes(8 * window))
+        self.values = [array("d", [math.nan]) * window for _ in range(n_metrics)]
+        self.head = 0              # next slot to write
+        self.size = 0
+        self.adds = 0
+        self.ref_t = 0.0
+        self.ref_v = [0.0] * n_metrics
+        self.sums = [[0.0] * 6 for _ in range(n_metrics)]
+        self.ewma: List[Optional[float]] = [None] * n_metrics
+
+    def add(self, ts: float, vals: List[float], alpha: float) -> None:
+        window = len(self.ts)
+        i = self.head
+        if self.adds == 0:
+            self.ref_t = ts
+        if self.size == window:
+            # drop the sample being overwritten
+            old_t = self.ts[i] - self.ref_t
+            for m, col in enumerate(self.values):
+                old = col[i]
+                if old == old:
+                    _add(self.sums[m], old_t, old - self.ref_v[m], -1.0)
+        else:
+            self.size += 1
+
+        self.ts[i] = ts
+        t = ts - self.ref_t
+        for m, v in enumerate(vals):
+            self.values[m][i] = v
+            if v != v:             # missing: this metric's state is unchanged
+                continue
+            e = self.ewma[m]
+            if e is None:
+                self.ewma[m] = v
+                if self.sums[m][0] == 0:
+                    self.ref_v[m] = v
+            else:
+                self.ewma[m] = e + alpha * (v - e)
+            _add(self.sums[m], t, v - self.ref_v[m], 1.0)
+
+        self.head = (i + 1) % window
+        self.adds += 1
+        if self.adds % window == 0:
+            self._rebase()
+
+    def _rebase(self) -> None:
+        window = len(self.ts)
+        slots = [(self.head + k) % window for k in range(window)] if self.size == window else range(self.size)
+        self.ref_t = self.ts[slots[0]]
+        for m, col in enumerate(self.values):
+            if self.ewma[m] is not None:
+                self.ref_v[m] = self.ewma[m]
+            sums = self.sums[m] = [0.0] * 6
+            for j in slots:
+                v = col[j]
+                if v == v:
+                    _add(sums, self.ts[j] - self.ref_t, v - self.ref_v[m], 1.0)
+
+    def features(self, metrics: Sequence[str]) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {}
+        for m, name in enumerate(metrics):
+            n, st, sv, stt, svv, stv = self.sums[m]
+            mean = std = slope = None
+            if n > 0:
+                mean = self.ref_v[m] + sv / n
+                std = math.sqrt(max(svv - sv * sv / n, 0.0) / (n - 1)) if n > 1 else 0.0
+                d = n * stt - st * st
+                if n > 1 and d > 1e-6 * n * n:     # timestamps not all equal
+                    slope = (n * stv - st * sv) / d * 3600.0
+            out[f"{name}_ewma"] = self.ewma[m]
+            out[f"{name}_mean"] = mean
+            out[f"{name}_std"] = std
+            out[f"{name}_slope"] = slope
+        return out
+
+
+def _add(s: List[float], t: float, v: float, sign: float) -> None:
+    s[0] += sign
+    s[1] += sign * t
+    s[2] += sign * v
+    s[3] += sign * t * t
+    s[4] += sign * v * v
+    s[5] += sign * t * v
+
+
+def _value(x: Any) -> float:
+    # missing and non-finite readings (json accepts Infinity) count as
+    # missing: one inf would turn the EWMA and the sums NaN for good
+    if x is None:
+        return math.nan
+    x = float(x)
+    return x if math.isfinite(x) else math.nan
+
+
+class FeatureState(BaseService):
+    """
+    Streaming per-siteid rolling statistics of each metric, as extra model
+    features (ROLLING_FEATURE_KEYS):
+    - <metric>_ewma: exponentially weighted mean, alpha = 2 / (ewma_span + 1)
+    - <metric>_mean, <metric>_std: over the device's last `window` messages
+    - <metric>_slope: least-squares trend over the same window, units per
+      hour (e.g. MB/h of memory: a leak or storage creep shows here long
+      before a threshold is crossed)
+    O(1) per message, no history queries (see _DeviceWindow). A missing
+    or non-finite metric leaves that metric's statistics unchanged.
+    window and ewma_span count messages, so the time they cover (and how
+    noisy the slope is) depend on how often a device reports: `interval`
+    is the reporting period in seconds they were chosen for. It is part of
+    params(), so serving a model with a different setting is flagged.
+    - update(row) adds the features to the row; IngestPipeline calls it on
+      every batch before scoring, so a model trained with these names
+      (train_ai_model.py --rolling) reads them like any other metric
+    - start() rebuilds the state from the telemetry table (every device's
+      last warm_rows samples, oldest first): the table is the persisted
+      state, nothing else has to be saved or kept in sync. warm_rows
+      defaults to enough samples for the window and for the EWMA to match
+      the live one (EWMA_WARM_TOLERANCE)
+    - training_rows / replay run stored or synthetic series through a
+      fresh state, so training sees the features ingest would produce
+    """
+    def __init__(
+        self,
+        db: Optional[DatabaseAccess] = None,
+        window: int = 60,
+        ewma_span: float = 30.0,
+        interval: float = 60.0,
+        metrics: Sequence[str] = ROLLING_METRICS,
+        warm_rows: Optional[int] = None,
+        warm_max_devices: int = 100000
+    ):
+        super().__init__("FeatureState")
+        if window < 2:
+            raise ValueError("window must be >= 2")
+        bad = [m for m in metrics if m not in ROLLUP_METRICS]
+        if bad:
+            raise ValueError(f"Unknown metric(s): {', '.join(bad)}")
+        self.db = db
+        self.window = window
+        self.ewma_span = ewma_span
+        self.interval = interval
+        self.alpha = 2.0 / (ewma_span + 1.0)
+        self.metrics = tuple(metrics)
+        self.feature_names = rolling_feature_names(self.metrics)
+        if warm_rows is None:
+            warm_rows = max(window, math.ceil(math.log(EWMA_WARM_TOLERANCE) / math.log(1.0 - self.alpha)))
+        self.warm_rows = warm_rows
+        self.warm_max_devices = warm_max_devices
+
+        self._lock = threading.Lock()
+        self._devices: Dict[str, _DeviceWindow] = {}
+        self.updates = 0
+        self.skipped = 0
+
+    def start(self) -> None:
+        super().start()
+        if self.db is None:
+            return
+        t0 = time.perf_counter()
+        n = self.warm()
+        print(f"[FeatureState] Rebuilt {n} devices in {time.perf_counter() - t0:.2f}s")
+
+    def warm(self) -> int:
+        devices: Dict[str, _DeviceWindow] = {}
+        cols = ["siteid", *self.metrics]
+        for dev in self.db.get_latest_per_device(limit=self.warm_max_devices):
+            hist = self.db.get_history(dev["siteid"], limit=self.warm_rows, columns=cols)
+            state = devices[dev["siteid"]] = _DeviceWindow(self.window, len(self.metrics))
+            for row in reversed(hist):
+                state.add(float(row["ts"]), [_value(row.get(m)) for m in self.metrics], self.alpha)
+        with self._lock:
+            self._devices = devices
+        return len(devices)
+
+    def params(self) -> Dict[str, Any]:
+        """
+        Settings that define the features; stored with a model trained on
+        them (AIModel feature_params) so serving can check they match.
+        """
+        return {
+            "window": self.window,
+            "ewma_span": self.ewma_span,
+            "interval": self.interval,
+            "metrics": list(self.metrics),
+        }
+
+    # ----------------------------
+    # Ingest side
+    # ----------------------------
+    def update(self, row: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        """
+        Add one message (keys: siteid, ts, metrics) and write the device's
+        rolling features into row. Returns them ({} without a siteid).
+        """
+        with self._lock:
+            return self._update(row)
+
+    def update_batch(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for row in rows:
+                self._update(row)
+
+    def _update(self, row: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        siteid = row.get("siteid")
+        if siteid is None:
+            return {}
+        try:
+            ts = _value(row.get("ts"))
+            values = [_value(row.get(m)) for m in self.metrics]
+        except (TypeError, ValueError):
+            ts = math.nan
+        if math.isnan(ts):
+            # no usable ts/readings: the row is stored, but the window keeps
+            # its previous state (the slope needs a time axis)
+            self.skipped += 1
+            return {}
+        state = self._devices.get(siteid)
+        if state is None:
+            state = self._devices[siteid] = _DeviceWindow(self.window, len(self.metrics))
+        state.add(ts, values, self.alpha)
+        self.updates += 1
+        feats = state.features(self.metrics)
+        row.update(feats)
+        return feats
+
+    # ----------------------------
+    # Read side
+    # ----------------------------
+    def features(self, siteid: str) -> Optional[Dict[str, Optional[float]]]:
+        with self._lock:
+            state = self._devices.get(siteid)
+            return state.features(self.metrics) if state is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"devices": len(self._devices), "updates": self.updates, "skipped": self.skipped}
+
+    # ----------------------------
+    # Training
+    # ----------------------------
+    def replay(self, siteids: Sequence[str], ts: np.ndarray, X: np.ndarray) -> np.ndarray:
+        """
+        Rolling features of a series of rows, through a fresh state.
+        X columns follow self.metrics (missing = NaN). Rows are applied in
+        ts order (stable); returns (n, len(feature_names)) aligned with the
+        input, missing = NaN.
+        """
+        state = FeatureState(window=self.window, ewma_span=self.ewma_span, interval=self.interval, metrics=self.metrics)
+        ts = np.asarray(ts)
+        out = np.full((ts.shape[0], len(self.feature_names)), np.nan)
+        for i in np.argsort(ts, kind="stable").tolist():
+            feats = state.update({"siteid": siteids[i], "ts": ts[i], **dict(zip(self.metrics, X[i].tolist()))})
+            out[i] = [np.nan if feats[k] is None else feats[k] for k in self.feature_names]
+        return out
+
+    def training_rows(
+        self,
+        db: DatabaseAccess,
+        feature_keys: List[str],
+        label_column: str = "operator_label",
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        chunk_rows: int = 50000
+    ) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        Same contract as DatabaseAccess.iter_training_rows, for feature_keys
+        that may include rolling features: every stored row in [since,
+        until) goes through a fresh state in (ts, id) order, labeled rows
+        are emitted. Rows in the first window after since see a partial
+        window.
+        """
+        known = set(self.metrics) | set(self.feature_names) | set(ROLLUP_METRICS)
+        bad = [k for k in feature_keys if k not in known]
+        if bad:
+            raise ValueError(f"Unknown feature(s): {', '.join(bad)}")
+        state = FeatureState(window=self.window, ewma_span=self.ewma_span, interval=self.interval, metrics=self.metrics)
+        cols = list(dict.fromkeys([*self.metrics, *(k for k in feature_keys if k in ROLLUP_METRICS)]))
+        for rows in db.iter_training_sequence(cols, label_column=label_column, since=since, until=until,
+                                              chunk_rows=chunk_rows):
+            out = []
+            for siteid, ts, label, *vals in rows:
+                row = {"siteid": siteid, "ts": ts, **dict(zip(cols, vals))}
+                state._update(row)
+                if label is not None:
+                    out.append((label, *[row.get(k) for k in feature_keys]))
+            if out:
+                yield out
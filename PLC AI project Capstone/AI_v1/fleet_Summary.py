@@ -0,0 +1,159 @@
+# fleet_summary.py
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from base_Service import BaseService
+from database_Access import DatabaseAccess
+
+SUMMARY_STATUSES = ("Healthy", "Warning", "Critical", "Unknown")
+
+
+def site_prefix(siteid: str) -> str:
+    """
+    "PH-NCR-01788" -> "PH-NCR" (everything before the last "-").
+    """
+    head, sep, _ = siteid.rpartition("-")
+    return head if sep else siteid
+
+
+class FleetSummary(BaseService):
+    """
+    Healthy/Warning/Critical/Unknown device counts, fleet-wide and per site
+    prefix, kept up to date incrementally.
+    - on_batch (IngestPipeline listener): for each device whose latest
+      sample changed, decrement its old status and increment the new one
+    - summary() copies the counters: cost depends on the number of
+      prefixes, not devices
+    - every reconcile_interval seconds the counters are rebuilt from
+      device_latest (catches writes that bypassed the pipeline); the number
+      of devices that disagreed is kept as `drift`
+    """
+    def __init__(self, db: DatabaseAccess, reconcile_interval: float = 300.0):
+        super().__init__("FleetSummary")
+        self.db = db
+        self.reconcile_interval = reconcile_interval
+
+        self._lock = threading.Lock()
+        self._devices: Dict[str, Tuple[int, str]] = {}     # siteid -> (ts, status)
+        self._by_prefix: Dict[str, Dict[str, int]] = {}
+        self._total = _zero_counts()
+        self.reconciled_at: Optional[float] = None
+        self.drift = 0
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        super().start()
+        self.reconcile()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="fleet-summary", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        super().stop()
+
+    # ----------------------------
+    # Incremental updates
+    # ----------------------------
+    def on_batch(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for r in rows:
+                siteid = r.get("siteid")
+                if siteid is None:
+                    continue
+                self._set(siteid, r["ts"], _status_key(r.get("health_status")))
+
+    def _set(self, siteid: str, ts: int, status: str) -> bool:
+        """
+        Apply one sample (lock held). Returns False if it was older than
+        the device's current one.
+        """
+        old = self._devices.get(siteid)
+        if old is not None:
+            if ts < old[0]:
+                return False
+            if old[1] == status:
+                self._devices[siteid] = (ts, status)
+                return True
+        prefix = site_prefix(siteid)
+        counts = self._by_prefix.get(prefix)
+        if counts is None:
+            counts = self._by_prefix[prefix] = _zero_counts()
+        if old is not None:
+            counts[old[1]] -= 1
+            self._total[old[1]] -= 1
+        counts[status] += 1
+        self._total[status] += 1
+        self._devices[siteid] = (ts, status)
+        return True
+
+    # ----------------------------
+    # Reconcile
+    # ----------------------------
+    def reconcile(self) -> int:
+        """
+        Rebuild the counters from device_latest. Samples that arrived after
+        the DB snapshot (newer ts in memory) are kept. Returns the drift.
+        """
+        snapshot = self.db.get_device_statuses()
+        with self._lock:
+            current = self._devices
+            devices: Dict[str, Tuple[int, str]] = {}
+            drift = 0
+            for siteid, ts, status in snapshot:
+                entry = (ts, _status_key(status))
+                mem = current.get(siteid)
+                if mem is not None and mem[0] > ts:
+                    entry = mem
+                elif mem is None or mem[1] != entry[1]:
+                    drift += 1
+                devices[siteid] = entry
+            for siteid, entry in current.items():
+                devices.setdefault(siteid, entry)
+            if self.reconciled_at is None:
+                drift = 0       # initial load, nothing to correct yet
+
+            self._devices = {}
+            self._by_prefix = {}
+            self._total = _zero_counts()
+            for siteid, (ts, status) in devices.items():
+                self._set(siteid, ts, status)
+            self.reconciled_at = time.time()
+            self.drift = drift
+        if drift and self.running:
+            print(f"[FleetSummary] Reconciled: {drift} device(s) corrected")
+        return drift
+
+    def _loop(self) -> None:
+        while not self._stop_event.wait(self.reconcile_interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"[FleetSummary] Error: {e}")
+
+    # ----------------------------
+    # Read side
+    # ----------------------------
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "devices": len(self._devices),
+                "total": dict(self._total),
+                "sites": {p: dict(c) for p, c in sorted(self._by_prefix.items())},
+                "reconciled_at": self.reconciled_at,
+                "drift": self.drift,
+            }
+
+
+def _status_key(status: Optional[str]) -> str:
+    return status if status in SUMMARY_STATUSES else "Unknown"
+
+
+def _zero_counts() -> Dict[str, int]:
+    return {st: 0 for st in SUMMARY_STATUSES}
@@ -0,0 +1,218 @@
+# forest_engine.py
+from typing import Optional, Tuple
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import MinMaxScaler
+
+
+class CompiledForest:
+    """
+    RandomForestClassifier flattened into plain numpy node arrays.
+
+    All trees are concatenated into one set of arrays:
+      feature[n]    feature index tested at node n
+      threshold[n]  go left if x[feature] <= threshold (RAW units)
+      left[n]       left child (leaves point to themselves)
+      right[n]      right child (leaves point to themselves)
+      value[n]      per-class probability of node n (normalized like sklearn)
+      roots[t]      root node of tree t
+
+    The MinMaxScaler is folded into the thresholds, so predict_ids takes the
+    unscaled feature matrix directly. Folding is exact (labels are identical
+    to scaler.transform + model.predict), see _fold_thresholds.
+    """
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        classes: np.ndarray,
+        max_depth: int
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self) -> int:
+        return int(self.roots.shape[0])
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.feature.shape[0])
+
+    # ----------------------------
+    # Build
+    # ----------------------------
+    @classmethod
+    def from_sklearn(
+        cls,
+        model: RandomForestClassifier,
+        scaler: Optional[MinMaxScaler] = None
+    ) -> "CompiledForest":
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            idx = np.arange(n)
+
+            feat = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+            thr = np.where(is_leaf, np.inf, tree.threshold).astype(np.float64)
+            left = np.where(is_leaf, idx, tree.children_left) + offset
+            right = np.where(is_leaf, idx, tree.children_right) + offset
+
+            # same normalization as DecisionTreeClassifier.predict_proba
+            val = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = val.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            val = val / normalizer
+
+            features.append(feat)
+            thresholds.append(thr)
+            lefts.append(left.astype(np.int32))
+            rights.append(right.astype(np.int32))
+            values.append(val)
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features)
+        threshold = np.concatenate(thresholds)
+
+        if scaler is not None:
+            scale = np.asarray(scaler.scale_, dtype=np.float64)
+            shift = np.asarray(scaler.min_, dtype=np.float64)
+        else:
+            scale = np.ones(model.n_features_in_, dtype=np.float64)
+            shift = np.zeros(model.n_features_in_, dtype=np.float64)
+        threshold = _fold_thresholds(threshold, scale[feature], shift[feature])
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+            max_depth=max_depth
+        )
+
+    # ----------------------------
+    # Inference
+    # ----------------------------
+    def predict_proba(self, X: np.ndarray, chunk_rows: int = 2048) -> np.ndarray:
+        """
+        X: raw (unscaled) float matrix, shape (n_rows, n_features), no NaN.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        out = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_rows):
+            out[start:start + chunk_rows] = self._proba_chunk(X[start:start + chunk_rows])
+        return out
+
+    def predict_ids(self, X: np.ndarray) -> np.ndarray:
+        """
+        Class ids (values of model.classes_), same as model.predict(scaler.transform(X)).
+        """
+        proba = self.predict_proba(X)
+        return self.classes.take(np.argmax(proba, axis=1), axis=0)
+
+    def predict_box(self, x: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[int, bool]:
+        """
+        Class id of the single row x, and whether every point of the box
+        lo <= v <= hi (per feature, x inside it) gets that class too: true
+        when no split on x's paths has its threshold in [lo, hi), so the
+        whole box reaches the same leaves. One traversal for both.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        nodes = self.roots.copy()
+        same = True
+        for _ in range(self.max_depth):
+            feat = self.feature[nodes]
+            thr = self.threshold[nodes]      # leaves: +inf, never inside a box
+            if same and np.any((lo[feat] <= thr) & (thr < hi[feat])):
+                same = False
+            nodes = np.where(x[feat] <= thr, self.left[nodes], self.right[nodes])
+        proba = self._proba_from_leaves(nodes[:, np.newaxis])
+        return int(self.classes[np.argmax(proba[0])]), same
+
+    def _proba_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)  # (n_trees, n_rows)
+
+        # every tree advances one level per step; leaves loop onto themselves
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self._proba_from_leaves(nodes)
+
+    def _proba_from_leaves(self, nodes: np.ndarray) -> np.ndarray:
+        # sklearn adds tree probabilities one estimator at a time; cumsum keeps
+        # that exact summation order so argmax ties resolve identically
+        leaf_values = self.value[nodes]                      # (n_trees, n_rows, n_classes)
+        proba = np.cumsum(leaf_values, axis=0)[-1]
+        proba /= self.n_trees
+        return proba
+
+
+def _fold_thresholds(threshold: np.ndarray, scale: np.ndarray, shift: np.ndarray) -> np.ndarray:
+    """
+    Move MinMaxScaler into the split thresholds.
+
+    sklearn evaluates a split as
+        float32(x * scale + shift) <= threshold
+    (transform in float64, then the tree casts X to float32). That test is
+    monotone in x, so it is equivalent to x <= T where T is the largest
+    float64 for which it still holds. T is found per node by bisection on
+    floats, which makes the folded comparison bit-for-bit equivalent rather
+    than an approximation like (threshold - shift) / scale.
+    """
+    def goes_left(x: np.ndarray) -> np.ndarray:
+        with np.errstate(over="ignore", invalid="ignore"):
+            scaled = (x * scale + shift).astype(np.float32).astype(np.float64)
+        return scaled <= threshold
+
+    finite = np.isfinite(threshold)
+    guess = np.where(finite, (threshold - shift) / scale, 0.0)
+    delta = np.abs(guess) * 1e-6 + 1e-6
+
+    lo = guess - delta
+    hi = guess + delta
+    # widen until lo goes left and hi goes right
+    for _ in range(64):
+        bad_lo = finite & ~goes_left(lo)
+        bad_hi = finite & goes_left(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        delta = delta * 2
+        lo = np.where(bad_lo, guess - delta, lo)
+        hi = np.where(bad_hi, guess + delta, hi)
+
+    for _ in range(200):
+        mid = lo + (hi - lo) / 2
+        active = finite & (mid != lo) & (mid != hi)
+        if not active.any():
+            break
+        left_mask = goes_left(mid)
+        lo = np.where(active & left_mask, mid, lo)
+        hi = np.where(active & ~left_mask, mid, hi)
+
+    return np.where(finite, lo, threshold)
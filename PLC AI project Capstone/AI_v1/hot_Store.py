@@ -0,0 +1,246 @@
+# hot_store.py
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from base_Service import BaseService
+from database_Access import DEVICE_SORTS, DatabaseAccess
+
+FEATURES = ("used_memory", "used_storage", "cpuusage", "temperature")
+
+STATUS_CODES = {"Healthy": 0, "Warning": 1, "Critical": 2}
+STATUS_NAMES = {v: k for k, v in STATUS_CODES.items()}
+NO_STATUS = -1
+
+# Columns a hot-store history row can answer; anything else goes to the DB
+HOT_COLUMNS = ("id", "ts", "siteid") + FEATURES + ("health_status",)
+
+# Fields kept for the newest sample of each device (device list / detail view)
+LATEST_FIELDS = ("ts", "gateway", "siteid", "topic") + FEATURES + ("health_status", "reason")
+
+
+class _DeviceRing:
+    """
+    Preallocated ring buffer for one siteid (arrival order).
+    """
+    __slots__ = ("ids", "ts", "values", "status", "head", "count", "complete", "latest")
+
+    def __init__(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, len(FEATURES)), np.nan, dtype=np.float64)
+        self.status = np.full(capacity, NO_STATUS, dtype=np.int8)
+        self.head = 0              # next slot to write
+        self.count = 0
+        self.complete = True       # ring holds the device's entire history
+        self.latest: Dict[str, Any] = {}
+
+    def append(self, row: Dict[str, Any]) -> None:
+        cap = self.ts.shape[0]
+        i = self.head
+        self.ids[i] = row.get("id") or 0
+        self.ts[i] = row["ts"]
+        for j, k in enumerate(FEATURES):
+            v = row.get(k)
+            self.values[i, j] = np.nan if v is None else v
+        self.status[i] = STATUS_CODES.get(row.get("health_status"), NO_STATUS)
+        self.head = (i + 1) % cap
+        if self.count == cap:
+            self.complete = False      # oldest sample overwritten
+        else:
+            self.count += 1
+
+        if not self.latest or row["ts"] >= self.latest["ts"]:
+            self.latest = {k: row.get(k) for k in LATEST_FIELDS}
+            self.latest["telemetry_id"] = row.get("id")
+
+    def ordered(self) -> Tuple[np.ndarray, ...]:
+        """
+        Samples sorted newest first (by ts, then id).
+        """
+        n = self.count
+        idx = (self.head - 1 - np.arange(n)) % self.ts.shape[0]
+        ids, ts = self.ids[idx], self.ts[idx]
+        order = np.lexsort((-ids, -ts))
+        idx = idx[order]
+        return self.ids[idx], self.ts[idx], self.values[idx], self.status[idx]
+
+
+class HotStore(BaseService):
+    """
+    In-process hot store for the dashboard.
+    - Last `capacity` samples per siteid in preallocated numpy ring buffers
+      (ts, the four features, encoded status); O(1) append and latest lookup
+    - Fed by IngestPipeline (add_listener(hot_store.on_batch))
+    - Warms itself from DatabaseAccess on start
+    - WebServer reads it first and falls back to the DB for anything older
+      than what the ring still holds
+    """
+    def __init__(self, db: DatabaseAccess, capacity: int = 256, warm_max_devices: int = 100000):
+        super().__init__("HotStore")
+        self.db = db
+        self.capacity = capacity
+        self.warm_max_devices = warm_max_devices
+        self._lock = threading.Lock()
+        self._rings: Dict[str, _DeviceRing] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def start(self) -> None:
+        super().start()
+        t0 = time.perf_counter()
+        n = self.warm()
+        print(f"[HotStore] Warmed {n} devices in {time.perf_counter() - t0:.2f}s")
+
+    def warm(self) -> int:
+        cols = [c for c in HOT_COLUMNS if c not in ("id", "ts")] + ["gateway", "topic", "reason"]
+        rings: Dict[str, _DeviceRing] = {}
+        for dev in self.db.get_latest_per_device(limit=self.warm_max_devices):
+            siteid = dev["siteid"]
+            hist = self.db.get_history(siteid, limit=self.capacity + 1, columns=cols)
+            ring = _DeviceRing(self.capacity)
+            for row in reversed(hist[:self.capacity]):
+                ring.append(row)
+            # more rows in the DB than fit -> ring is only a window
+            ring.complete = len(hist) <= self.capacity
+            # device_latest is authoritative for the newest row (incl. reason/gateway)
+            ring.latest = {k: dev.get(k) for k in LATEST_FIELDS}
+            ring.latest["telemetry_id"] = dev.get("telemetry_id")
+            rings[siteid] = ring
+        with self._lock:
+            self._rings = rings
+        return len(rings)
+
+    # ----------------------------
+    # Ingest side
+    # ----------------------------
+    def on_batch(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for row in rows:
+                siteid = row.get("siteid")
+                if siteid is None:
+                    continue
+                ring = self._rings.get(siteid)
+                if ring is None:
+                    ring = self._rings[siteid] = _DeviceRing(self.capacity)
+                ring.append(row)
+
+    # ----------------------------
+    # Read side
+    # ----------------------------
+    def latest(self, siteid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            ring = self._rings.get(siteid)
+            return dict(ring.latest) if ring is not None and ring.latest else None
+
+    def latest_all(self) -> List[Dict[str, Any]]:
+        """
+        Newest sample of every device, newest first (like get_latest_per_device).
+        """
+        with self._lock:
+            out = [dict(r.latest) for r in self._rings.values() if r.latest]
+        out.sort(key=lambda d: d["ts"], reverse=True)
+        return out
+
+    def search_latest(
+        self,
+        q: Optional[str] = None,
+        statuses: Optional[List[Optional[str]]] = None,
+        sort: str = "ts",
+        descending: bool = True,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Same contract as DatabaseAccess.search_devices, over the in-memory
+        latest samples.
+        """
+        if sort not in DEVICE_SORTS:
+            raise ValueError(f"sort must be one of {tuple(DEVICE_SORTS)}")
+        needle = q.lower() if q else None
+        keep = set(statuses) if statuses else None
+
+        with self._lock:
+            latest = [r.latest for r in self._rings.values() if r.latest]
+        matches = []
+        for d in latest:
+            if keep is not None and d.get("health_status") not in keep:
+                continue
+            if needle and needle not in (d.get("siteid") or "").lower() \
+                    and needle not in (d.get("gateway") or "").lower():
+                continue
+            matches.append(d)
+
+        def key(d):
+            v = STATUS_CODES.get(d.get("health_status")) if sort == "status" else d.get(sort)
+            # NULLs sort first ascending, like SQLite
+            return (v is not None, v if v is not None else 0), d.get("siteid") or ""
+
+        matches.sort(key=key, reverse=descending)
+        return [dict(d) for d in matches[offset:offset + limit]], len(matches)
+
+    def history(
+        self,
+        siteid: str,
+        limit: int,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        before: Optional[Tuple[int, int]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Same contract as DatabaseAccess.get_history, or None when the ring
+        cannot answer it (columns not kept, or range older than the ring).
+        """
+        if columns and any(c not in HOT_COLUMNS for c in columns):
+            return None
+        if not columns:
+            return None   # full rows include gateway/topic/reason per sample
+
+        with self._lock:
+            ring = self._rings.get(siteid)
+            if ring is None or ring.count == 0:
+                self.misses += 1
+                return None
+            ids, ts, values, status = ring.ordered()
+            complete = ring.complete
+
+        mask = np.ones(ts.shape[0], dtype=bool)
+        if since is not None:
+            mask &= ts >= since
+        if until is not None:
+            mask &= ts < until
+        if before is not None:
+            mask &= (ts < before[0]) | ((ts == before[0]) & (ids < before[1]))
+        sel = np.flatnonzero(mask)[:limit]
+
+        # fewer rows than asked and older rows may exist only in the DB
+        oldest = ts[-1]
+        if len(sel) < limit and not complete and (since is None or since < oldest):
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        cols = ["id", "ts"] + [c for c in columns if c not in ("id", "ts")]
+        out = []
+        for i in sel:
+            row: Dict[str, Any] = {"id": int(ids[i]), "ts": int(ts[i])}
+            for c in cols[2:]:
+                if c == "siteid":
+                    row[c] = siteid
+                elif c == "health_status":
+                    row[c] = STATUS_NAMES.get(int(status[i]))
+                else:
+                    v = values[i, FEATURES.index(c)]
+                    row[c] = None if np.isnan(v) else float(v)
+            out.append(row)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            devices = len(self._rings)
+            samples = sum(r.count for r in self._rings.values())
+        return {"devices": devices, "samples": samples, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,199 @@
+# import_diagnostics.py
+"""
+Import historical Diagnostic_Data.csv into plc_health.db.
+
+What it does:
+- Streams the CSV with csv.DictReader (memory is bounded by --chunk-rows,
+  whatever the file size)
+- Derives used_memory / used_storage exactly like the MQTT path
+  (telemetry_Fields.derive_telemetry)
+- Optionally scores each chunk with AIModel.predict_batch
+- Inserts each chunk as one transaction; telemetry indexes and the
+  device_latest trigger are dropped for the import and rebuilt once at
+  the end (DatabaseAccess.bulk_load)
+- Reports rows/s
+
+Run it while the service is stopped.
+
+Usage:
+  python import_diagnostics.py [--csv Diagnostic_Data/Diagnostic_Data.csv] [--db plc_health.db]
+                               [--model model.pkl | --no-score] [--chunk-rows 20000]
+                               [--no-raw] [--raw-level 1] [--tz-offset-hours 0]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from ai_Model import AIModel
+from database_Access import DatabaseAccess
+from telemetry_Fields import derive_telemetry, to_int
+
+IMPORT_TOPIC = "import/diagnostic_data_csv"
+
+# "unixtime" in the CSV is a date string, not epoch seconds
+DATETIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+)
+_formats = list(DATETIME_FORMATS)
+
+
+def parse_datetime(value: Optional[str], tz: timezone) -> Optional[int]:
+    """
+    Epoch seconds from an ISO 8601 / common date string (or epoch number).
+    Naive values are taken to be in tz.
+    """
+    if not value:
+        return None
+    epoch = to_int(value)
+    if epoch is not None:
+        return epoch
+    value = value.strip()
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        dt = None
+        # a file normally uses one format: try the last one that worked first
+        for i, fmt in enumerate(_formats):
+            try:
+                dt = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if i:
+                _formats.insert(0, _formats.pop(i))
+            break
+        if dt is None:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return int(dt.timestamp())
+
+
+def read_chunks(path: str, chunk_rows: int) -> Iterator[List[Dict[str, str]]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        chunk = []
+        for rec in csv.DictReader(f):
+            chunk.append(rec)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def to_rows(records: List[Dict[str, str]], tz: timezone, keep_raw: bool) -> List[Dict[str, Any]]:
+    """
+    CSV records -> insert_telemetry_batch rows. Records without a usable
+    timestamp are dropped.
+    """
+    rows = []
+    for rec in records:
+        fields = derive_telemetry(rec, default_ts=parse_datetime(rec.get("unixtime"), tz) or -1)
+        if fields["ts"] < 0:
+            continue
+        raw = None
+        if keep_raw:
+            raw = json.dumps({k: v for k, v in rec.items() if k and v not in (None, "")}, separators=(",", ":"))
+        rows.append({
+            **fields,
+            "topic": IMPORT_TOPIC,
+            "raw": raw,
+            "health_status": None,
+            "reason": None,
+        })
+    return rows
+
+
+def score(ai: AIModel, rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    labels, reasons = ai.predict_batch(rows)
+    for r, label, reason in zip(rows, labels, reasons):
+        r["health_status"] = label
+        r["reason"] = reason
+
+
+def run_import(
+    db: DatabaseAccess,
+    csv_path: str,
+    ai: Optional[AIModel] = None,
+    chunk_rows: int = 20000,
+    keep_raw: bool = True,
+    tz: timezone = timezone.utc
+) -> Dict[str, float]:
+    read = inserted = 0
+    t0 = time.perf_counter()
+    with db.bulk_load():
+        for records in read_chunks(csv_path, chunk_rows):
+            rows = to_rows(records, tz, keep_raw)
+            if ai is not None:
+                score(ai, rows)
+            db.insert_telemetry_batch(rows)
+            read += len(records)
+            inserted += len(rows)
+            elapsed = time.perf_counter() - t0
+            print(f"[import] {inserted:,d} rows ({inserted / elapsed:,.0f} rows/s)", end="\r", flush=True)
+        t_load = time.perf_counter() - t0
+        print()
+        print("[import] rebuilding indexes and device_latest ...")
+    elapsed = time.perf_counter() - t0
+    return {
+        "read": read,
+        "inserted": inserted,
+        "skipped": read - inserted,
+        "load_seconds": t_load,
+        "seconds": elapsed,
+        "rows_per_sec": inserted / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Diagnostic_Data.csv into the telemetry DB")
+    parser.add_argument("--csv", default="Diagnostic_Data/Diagnostic_Data.csv")
+    parser.add_argument("--db", default="plc_health.db")
+    parser.add_argument("--model", default="model.pkl", help="model used to score rows")
+    parser.add_argument("--no-score", action="store_true", help="import without health_status")
+    parser.add_argument("--chunk-rows", type=int, default=20000, help="rows per read + transaction")
+    parser.add_argument("--no-raw", action="store_true", help="don't store the CSV record as raw payload")
+    parser.add_argument(
+        "--raw-level", type=int, default=1,
+        help="zlib level for raw payloads (1 is several times faster than the service's 6)"
+    )
+    parser.add_argument("--tz-offset-hours", type=float, default=0.0, help="timezone of naive date strings")
+    args = parser.parse_args()
+
+    csv.field_size_limit(sys.maxsize)
+    tz = timezone(timedelta(hours=args.tz_offset_hours))
+
+    ai = None
+    if not args.no_score:
+        ai = AIModel(model_path=args.model)
+        ai.start()
+        if ai.artifacts is None:
+            print("[import] no model, importing without health_status")
+            ai = None
+
+    db = DatabaseAccess(db_path=args.db, raw_compress_level=args.raw_level)
+    db.start()
+    try:
+        stats = run_import(db, args.csv, ai=ai, chunk_rows=args.chunk_rows, keep_raw=not args.no_raw, tz=tz)
+    finally:
+        db.stop()
+
+    print(
+        f"[import] {stats['inserted']:,d} rows imported, {stats['skipped']:,d} skipped (no timestamp) | "
+        f"load {stats['load_seconds']:.1f}s, total {stats['seconds']:.1f}s incl. index build "
+        f"-> {stats['rows_per_sec']:,.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
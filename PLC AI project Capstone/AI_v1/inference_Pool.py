@@ -0,0 +1,320 @@
+# inference_pool.py
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from base_Service import BaseService
+
+
+class InferencePool(BaseService):
+    """
+    Forest prediction in worker processes, so scoring doesn't hold the
+    main interpreter's GIL (MQTT loop, HTTP handlers, DB writer).
+    - each worker loads model_path once (AIModel; forest artifacts are
+      memory-mapped, so the pages are shared between workers)
+    - each worker owns two shared memory blocks: the parent writes a
+      micro-batch of feature rows (float64) into the input block and
+      sends only (rows, columns) over a pipe; the worker writes class ids
+      into the output block. No rows are pickled
+    - submit(X) splits X into micro_batch-row pieces across idle workers
+      and returns a Future of (class ids, {model sha256 used}); a
+      collector thread resolves it. submit blocks while every worker is
+      busy (backpressure)
+    - reload() makes every worker reload model_path after the parent has
+      swapped models; results carry the sha256 so the caller can detect
+      a worker still on the previous model
+    """
+    def __init__(
+        self,
+        model_path: str,
+        workers: Optional[int] = None,
+        micro_batch: int = 256,
+        max_rows: int = 4096,
+        max_features: int = 32,
+        mmap_artifacts: bool = True,
+        start_timeout: float = 120.0
+    ):
+        super().__init__("InferencePool")
+        self.model_path = model_path
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.micro_batch = min(micro_batch, max_rows)
+        self.max_rows = max_rows
+        self.max_features = max_features
+        self.mmap_artifacts = mmap_artifacts
+        self.start_timeout = start_timeout
+
+        self._procs: List[mp.Process] = []
+        self._conns: List = []
+        self._send_locks: List[threading.Lock] = []
+        self._inputs: List[SharedMemory] = []
+        self._outputs: List[SharedMemory] = []
+        self._idle: "queue.Queue[int]" = queue.Queue()
+        self._pending: Dict[int, Tuple[Future, int]] = {}     # worker -> (piece future, rows)
+        self._lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+        self._closing = False
+
+        self.pieces = 0
+        self.rows = 0
+        self.worker_errors = 0
+
+    def start(self) -> None:
+        ctx = mp.get_context("spawn")      # never fork a process that runs threads
+        in_size = self.max_rows * self.max_features * 8
+        out_size = self.max_rows * 8
+        for w in range(self.workers):
+            shm_in = SharedMemory(create=True, size=in_size)
+            shm_out = SharedMemory(create=True, size=out_size)
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(
+                target=_worker_main,
+                args=(child_conn, self.model_path, shm_in.name, shm_out.name,
+                      self.max_rows, self.max_features, self.mmap_artifacts),
+                name=f"inference-{w}",
+                daemon=True
+            )
+            proc.start()
+            child_conn.close()
+            self._procs.append(proc)
+            self._conns.append(parent_conn)
+            self._send_locks.append(threading.Lock())
+            self._inputs.append(shm_in)
+            self._outputs.append(shm_out)
+
+        for w, conn in enumerate(self._conns):
+            if not conn.poll(self.start_timeout):
+                self.stop()
+                raise RuntimeError(f"Inference worker {w} did not start")
+            msg = conn.recv()
+            if msg[0] != "ready":
+                self.stop()
+                raise RuntimeError(f"Inference worker {w} failed to start: {msg[1]}")
+            self._idle.put(w)
+
+        self._closing = False
+        self._collector = threading.Thread(target=self._collect_loop, name="inference-collector", daemon=True)
+        self._collector.start()
+        super().start()
+
+    def stop(self) -> None:
+        self._closing = True
+        for w, conn in enumerate(self._conns):
+            try:
+                with self._send_locks[w]:
+                    conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        if self._collector:
+            self._collector.join(timeout=5)
+            self._collector = None
+        for conn in self._conns:
+            conn.close()
+        for shm in self._inputs + self._outputs:
+            shm.close()
+            shm.unlink()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for fut, _ in pending.values():
+            fut.set_exception(RuntimeError("InferencePool stopped"))
+        self._procs, self._conns, self._send_locks, self._inputs, self._outputs = [], [], [], [], []
+        self._idle = queue.Queue()
+        super().stop()
+
+    # ----------------------------
+    # Parent side
+    # ----------------------------
+    def submit(self, X: np.ndarray) -> Future:
+        """
+        X: raw (unscaled, NaN-free) feature matrix. Resolves to
+        (class ids, set of model sha256s the workers used).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        n, f = X.shape
+        if f > self.max_features:
+            raise ValueError(f"{f} features, pool buffers hold {self.max_features}")
+        result: Future = Future()
+        if not self.running or not any(p.is_alive() for p in self._procs):
+            result.set_exception(RuntimeError("InferencePool not running"))
+            return result
+
+        starts = list(range(0, n, self.micro_batch)) or [0]
+        out = np.empty(n, dtype=np.int64)
+        shas = set()
+        remaining = [len(starts)]
+        lock = threading.Lock()
+
+        def piece_done(piece: Future, start: int) -> None:
+            with lock:
+                if result.done():           # an earlier piece failed
+                    return
+                exc = piece.exception()
+                if exc is not None:
+                    result.set_exception(exc)
+                    return
+                ids, sha = piece.result()
+                out[start:start + ids.shape[0]] = ids
+                shas.add(sha)
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    result.set_result((out, shas))
+
+        for start in starts:
+            piece = self._submit_piece(X[start:start + self.micro_batch])
+            piece.add_done_callback(lambda p, s=start: piece_done(p, s))
+        return result
+
+    def reload(self) -> None:
+        """
+        Ask every live worker to reload model_path. Queued behind work
+        already sent to it; the pipe keeps the order. Dead workers are
+        skipped (their pipe is broken, they get no more work anyway).
+        """
+        for w, conn in enumerate(self._conns):
+            if not self._procs[w].is_alive():
+                continue
+            try:
+                with self._send_locks[w]:
+                    conn.send(("reload",))
+            except (OSError, ValueError):
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "alive": sum(p.is_alive() for p in self._procs),
+            "idle": self._idle.qsize(),
+            "pieces": self.pieces,
+            "rows": self.rows,
+            "worker_errors": self.worker_errors,
+        }
+
+    def _submit_piece(self, X: np.ndarray) -> Future:
+        n, f = X.shape
+        fut: Future = Future()
+        while True:
+            try:
+                w = self._idle.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not any(p.is_alive() for p in self._procs):
+                    fut.set_exception(RuntimeError("No inference worker alive"))
+                    return fut
+        np.ndarray((n, f), dtype=np.float64, buffer=self._inputs[w].buf)[:] = X
+        with self._lock:
+            self._pending[w] = (fut, n)
+        try:
+            with self._send_locks[w]:
+                self._conns[w].send(("predict", n, f))
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._pending.pop(w, None)
+            fut.set_exception(e)
+        self.pieces += 1
+        self.rows += n
+        return fut
+
+    def _collect_loop(self) -> None:
+        conns = {conn: w for w, conn in enumerate(self._conns)}
+        while conns and not self._closing:
+            for conn in wait(list(conns), timeout=0.5):
+                w = conns[conn]
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    # worker died: fail its piece, never hand it out again
+                    del conns[conn]
+                    if self._closing:
+                        continue
+                    self.worker_errors += 1
+                    self._finish(w, exc=RuntimeError(f"Inference worker {w} exited"), reuse=False)
+                    continue
+                kind = msg[0]
+                if kind == "done":
+                    n, sha = msg[1], msg[2]
+                    ids = np.ndarray((n,), dtype=np.int64, buffer=self._outputs[w].buf).copy()
+                    self._finish(w, value=(ids, sha))
+                elif kind == "error":
+                    self.worker_errors += 1
+                    self._finish(w, exc=RuntimeError(msg[1]))
+                elif kind == "reload_error":
+                    self.worker_errors += 1
+                    print(f"[InferencePool] Worker {w} reload failed: {msg[1]}")
+
+    def _finish(self, w: int, value=None, exc: Optional[BaseException] = None, reuse: bool = True) -> None:
+        with self._lock:
+            entry = self._pending.pop(w, None)
+        if reuse:
+            self._idle.put(w)
+        if entry is None:
+            return
+        fut, _ = entry
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(value)
+
+
+def _worker_main(conn, model_path, in_name, out_name, max_rows, max_features, mmap_artifacts) -> None:
+    """
+    Worker process: load the model once, then serve predict/reload
+    messages until "stop" or the pipe closes.
+    """
+    try:
+        from ai_Model import AIModel
+
+        shm_in = SharedMemory(name=in_name)
+        shm_out = SharedMemory(name=out_name)
+        # the parent owns (and unlinks) the blocks; spawned workers share
+        # its resource tracker, so attaching registers nothing new
+        X_buf = np.ndarray((max_rows * max_features,), dtype=np.float64, buffer=shm_in.buf)
+        out = np.ndarray((max_rows,), dtype=np.int64, buffer=shm_out.buf)
+
+        ai = AIModel(model_path=model_path, mmap_artifacts=mmap_artifacts)
+        if os.path.exists(model_path):
+            ai.reload()
+        sha = ai.model_info().get("sha256")
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready",))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = msg[0]
+        if kind == "stop":
+            break
+        if kind == "reload":
+            try:
+                ai.reload()
+                sha = ai.model_info().get("sha256")
+            except Exception as e:
+                conn.send(("reload_error", f"{type(e).__name__}: {e}"))
+            continue
+        if kind == "predict":
+            _, n, f = msg
+            try:
+                art = ai.artifacts
+                if art is None:
+                    raise RuntimeError("no model loaded")
+                out[:n] = ai._predict_ids(art, X_buf[:n * f].reshape(n, f))
+                conn.send(("done", n, sha))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+
+    del X_buf, out
+    shm_in.close()
+    shm_out.close()
@@ -0,0 +1,236 @@
+# ingest_pipeline.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from base_Service import BaseService
+from database_Access import DatabaseAccess
+from ai_Model import AIModel
+from feature_State import FeatureState
+
+
+class IngestPipeline(BaseService):
+    """
+    Bounded in-memory queue between the MQTT callback and the DB.
+    - MqttClient._on_message only enqueues rows (never waits on SQLite)
+    - A dedicated writer thread drains the queue in batches
+    - A batch is flushed when it reaches batch_size rows or when
+      flush_interval seconds have passed since its first row
+    - Rows that arrive without a health_status are scored together with
+      AIModel.predict_batch_async (one transform + one forest predict per
+      batch). With an inference pool the forest runs in worker processes:
+      the writer thread hands the scored-batch Future to a DB thread
+      through a queue of max_inflight batches and goes on collecting, so
+      scoring batch n+1 overlaps writing batch n. Batches are written in
+      arrival order
+    - With a FeatureState, every batch first updates the per-device
+      rolling statistics (writer thread, arrival order) and each row gets
+      its device's rolling features, so a model trained on them can score
+      it. They are not stored; FeatureState rebuilds itself from the
+      stored metrics
+    - Each batch is one executemany + one commit
+    - After a batch is committed, listeners (add_listener) are called with
+      the written rows (each row now has its telemetry "id")
+    - If the queue is full the row is dropped and counted (the paho loop
+      must never block)
+    """
+    def __init__(
+        self,
+        db: DatabaseAccess,
+        ai: Optional[AIModel] = None,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_queue: int = 10000,
+        max_inflight: int = 4,
+        features: Optional[FeatureState] = None
+    ):
+        super().__init__("IngestPipeline")
+        self.db = db
+        self.ai = ai
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_inflight = max_inflight
+        self.features = features
+        self._checked_model = None      # artifacts whose feature_params were checked
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        # (batch, rows being scored, Future) in arrival order; None = writer done
+        self._scored: "queue.Queue[Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[Future]]]]" = \
+            queue.Queue(maxsize=max_inflight)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._db_thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+        # counters (read by stats())
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        super().start()
+        self._stop_event.clear()
+        self._db_thread = threading.Thread(target=self._db_loop, name="ingest-db", daemon=True)
+        self._db_thread.start()
+        self._thread = threading.Thread(target=self._writer_loop, name="ingest-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # writer drains whatever is still queued, then the DB thread
+        # writes every batch handed to it
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._db_thread:
+            self._scored.put(None)
+            self._db_thread.join()
+            self._db_thread = None
+        super().stop()
+
+    # ----------------------------
+    # Producer side (paho thread)
+    # ----------------------------
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        Enqueue one telemetry row (same keys as DatabaseAccess.insert_telemetry).
+        Returns False if the queue is full and the row was dropped.
+        """
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def add_listener(self, fn: Callable[[List[Dict[str, Any]]], None]) -> None:
+        """
+        fn(rows) runs on the DB thread after every committed batch.
+        Keep it cheap; it delays the next flush.
+        """
+        self._listeners.append(fn)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "inflight": self._scored.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
+
+    # ----------------------------
+    # Writer stage
+    # ----------------------------
+    def _writer_loop(self) -> None:
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                if self.features is not None:
+                    try:
+                        self.features.update_batch(batch)
+                    except Exception as e:
+                        # rows still get stored and scored, just without fresh rolling features
+                        print(f"[IngestPipeline] Error updating features for batch of {len(batch)}: {e}")
+                pending, fut = self._score_async(batch)
+                self._scored.put((batch, pending, fut))      # blocks at max_inflight
+
+    def _db_loop(self) -> None:
+        while True:
+            item = self._scored.get()
+            if item is None:
+                return
+            batch, pending, fut = item
+            if fut is not None:
+                self._apply_scores(pending, fut)
+            self._flush(batch)
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """
+        Block until one row is available (or flush_interval passes), then keep
+        collecting until batch_size or the flush deadline is reached.
+        """
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._stop_event.is_set():
+                    # shutting down: take what is already queued, no waiting
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score_async(self, batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Future]]:
+        if self.ai is None or self.ai.artifacts is None:
+            return [], None
+        self._check_features(self.ai.artifacts)
+        pending = [r for r in batch if r.get("health_status") is None]
+        if not pending:
+            return [], None
+        try:
+            return pending, self.ai.predict_batch_async(pending)
+        except Exception as e:
+            print(f"[IngestPipeline] Error scoring batch of {len(pending)}: {e}")
+            return [], None
+
+    def _check_features(self, art) -> None:
+        """
+        Warn once per model if it was trained on rolling features this
+        pipeline doesn't compute the same way (they would read as 0 or
+        drift from what the model learned).
+        """
+        if art is self._checked_model:
+            return
+        self._checked_model = art
+        params = art.feature_params
+        if params is None:
+            return
+        if self.features is None:
+            print("[IngestPipeline] Model uses rolling features but the pipeline has no FeatureState")
+        elif params != self.features.params():
+            print(f"[IngestPipeline] Model rolling features {params} differ from FeatureState {self.features.params()}")
+
+    def _apply_scores(self, pending: List[Dict[str, Any]], fut: Future) -> None:
+        try:
+            labels, reasons = fut.result()
+        except Exception as e:
+            print(f"[IngestPipeline] Error scoring batch of {len(pending)}: {e}")
+            return
+        for r, label, reason in zip(pending, labels, reasons):
+            r["health_status"] = label
+            r["reason"] = reason
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.db.insert_telemetry_batch(batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"[IngestPipeline] Error writing batch of {len(batch)}: {e}")
+            return
+
+        for fn in self._listeners:
+            try:
+                fn(batch)
+            except Exception as e:
+                print(f"[IngestPipeline] Listener {getattr(fn, '__qualname__', fn)} failed: {e}")
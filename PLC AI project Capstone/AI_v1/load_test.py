@@ -0,0 +1,164 @@
+# load_test.py
+"""
+HTTP load test for WebServer: Flask dev server vs waitress.
+
+For each server mode a WebServer is started on a temp DB filled with
+--devices devices, then --clients threads hammer /api/devices over
+keep-alive connections for --seconds. Reports requests/s and p50/p99.
+The response cache is off (every request renders) unless --cache is given.
+--streams N holds N /api/stream (SSE) connections open meanwhile, like
+open dashboards: each accepted one occupies a worker thread, the ones
+above the server's max_streams get 503.
+
+Usage:
+  python load_test.py [--clients 32] [--seconds 10] [--devices 500] [--threads 16] [--streams 0] [--cache]
+"""
+
+import argparse
+import http.client
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from database_Access import DatabaseAccess
+from event_Broker import EventBroker
+from response_Cache import ResponseCache
+from web_Server import SERVER_MODES, WebServer
+
+
+def make_row(siteid: str, ts: int) -> dict:
+    return {
+        "ts": ts,
+        "gateway": "142e0c1a5b3d9f70",
+        "siteid": siteid,
+        "topic": "plc/devices/diagnostic/test",
+        "raw": {"cpuusage": random.uniform(0, 100)},
+        "used_memory": random.uniform(800, 1700),
+        "used_storage": random.uniform(3000, 4200),
+        "cpuusage": random.uniform(0, 100),
+        "temperature": random.uniform(20, 80),
+        "health_status": random.choice(["Healthy", "Warning", "Critical"]),
+        "reason": "Within normal operating range",
+    }
+
+
+def wait_for_port(host: str, port: int, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/api/devices")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on {host}:{port} did not come up")
+
+
+def run_mode(mode: str, db: DatabaseAccess, port: int, args) -> None:
+    web = WebServer(
+        db=db,
+        host="127.0.0.1",
+        port=port,
+        broker=EventBroker() if args.streams else None,
+        cache=ResponseCache() if args.cache else None,
+        server=mode,
+        threads=args.threads
+    )
+    web.start()
+    wait_for_port("127.0.0.1", port)
+
+    # open streams are left unread; the server only writes keepalives
+    streams, rejected = [], 0
+    for _ in range(args.streams):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.request("GET", "/api/stream")
+        resp = conn.getresponse()
+        if resp.status == 200:
+            streams.append(conn)
+        else:
+            resp.read()
+            conn.close()
+            rejected += 1
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(args.clients)]
+    errors = [0]
+
+    def client(i: int):
+        out = latencies[i]
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", "/api/devices")
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors[0] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            out.append(time.perf_counter() - t0)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    t_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+    for conn in streams:
+        conn.close()
+    if web.broker is not None:
+        web.broker.stop()       # ends the open streams so their workers can exit
+    web.stop()
+
+    lat = np.array([x for xs in latencies for x in xs]) * 1000.0
+    if not len(lat):
+        print(f"  {mode:9s} no successful requests ({errors[0]} errors)")
+        return
+    print(
+        f"  {mode:9s} req/s={len(lat) / elapsed:8.0f}  "
+        f"p50={np.percentile(lat, 50):7.2f} ms  p99={np.percentile(lat, 99):7.2f} ms  "
+        f"errors={errors[0]}" + (f"  streams open={len(streams)} rejected={rejected}" if args.streams else "")
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32, help="concurrent keep-alive clients")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16, help="waitress worker threads")
+    parser.add_argument("--streams", type=int, default=0, help="SSE connections held open during the run")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--cache", action="store_true", help="enable the response cache")
+    args = parser.parse_args()
+
+    # waitress logs every time requests queue behind busy workers
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)
+
+    db = DatabaseAccess(db_path=os.path.join(tempfile.mkdtemp(), "load.db"))
+    db.start()
+    db.insert_telemetry_batch([make_row(f"PH-NCR-{i:05d}", 1_700_000_000 + i) for i in range(args.devices)])
+
+    print(
+        f"GET /api/devices ({args.devices} devices, {args.clients} clients, "
+        f"{args.seconds:.0f}s per mode, cache {'on' if args.cache else 'off'})"
+    )
+    for i, mode in enumerate(SERVER_MODES):
+        run_mode(mode, db, args.port + i, args)
+    db.stop()
@@ -5,6 +5,13 @@ import time
 from database_Access import DatabaseAccess
 from ai_Model import AIModel
 from mqtt_Client import MqttClient
+from ingest_Pipeline import IngestPipeline
+from feature_State import FeatureState
+from hot_Store import HotStore
+from event_Broker import EventBroker
+from response_Cache import ResponseCache
+from fleet_Summary import FleetSummary
+from rollup_Service import RollupService
 from web_Server import WebServer
 
 
@@ -21,7 +28,43 @@ def stop_all(services):
 
 def main():
     db = DatabaseAccess(db_path="plc_health.db")
-    ai = AIModel(model_path="model.pkl")
+    # model.pkl is re-read (validated, then swapped in) when it changes.
+    # On multi-core hosts inference_workers=N scores ingest batches in N
+    # worker processes, off this interpreter's GIL (see bench_inference_pool.py)
+    ai = AIModel(model_path="model.pkl", watch_interval=5.0, inference_workers=0)
+
+    # per-device EWMA / rolling mean, std, slope of each metric, updated on
+    # every message and rebuilt from the telemetry table on start; models
+    # trained with train_ai_model.py --rolling score on them. Windows count
+    # messages: 60 at one per minute (interval) = the last hour
+    features = FeatureState(db=db, window=60, ewma_span=30.0, interval=60.0)
+
+    # MQTT callback -> bounded queue -> batched scoring + DB writer
+    pipeline = IngestPipeline(
+        db=db,
+        ai=ai,
+        features=features,
+        batch_size=500,
+        flush_interval=0.5,
+        max_queue=10000
+    )
+
+    # last 256 samples per device in memory, fed by every committed batch
+    hot = HotStore(db=db, capacity=256)
+    pipeline.add_listener(hot.on_batch)
+
+    # dashboard JSON cached until the next committed batch (ETag/304)
+    cache = ResponseCache(max_entries=1024, max_age=5.0)
+    pipeline.add_listener(cache.bump)
+
+    # Healthy/Warning/Critical counts per site prefix, reconciled every 5 min
+    fleet = FleetSummary(db=db, reconcile_interval=300.0)
+    pipeline.add_listener(fleet.on_batch)
+
+    # per-device updates pushed to dashboards over SSE; registered last so a
+    # client refetching on an event never gets the pre-batch cache/hot data
+    broker = EventBroker()
+    pipeline.add_listener(broker.on_batch)
 
     mqtt = MqttClient(
         db=db,
@@ -30,12 +73,34 @@ def main():
         broker_port=1883,
         topic="plc/devices/diagnostic/#",
         username=None,
-        password=None
+        password=None,
+        pipeline=pipeline
     )
 
-    web = WebServer(db=db, host="127.0.0.1", port=5000)
+    # 1m/1h history rollups + raw retention
+    rollup = RollupService(db=db, interval=60.0, raw_max_age=7 * 24 * 3600)
+
+    # server="dev" for Flask's built-in server, "waitress" for production.
+    # Each open /api/stream holds a worker thread: at most 8 of the 16, the
+    # rest keep serving the API (more dashboards fall back to polling)
+    web = WebServer(
+        db=db,
+        host="127.0.0.1",
+        port=5000,
+        hot_store=hot,
+        broker=broker,
+        cache=cache,
+        fleet=fleet,
+        ai=ai,
+        features=features,
+        server="waitress",
+        threads=16,
+        max_streams=8,
+        backlog=1024,
+        channel_timeout=120
+    )
 
-    services = [db, ai, mqtt, web]
+    services = [db, ai, features, hot, broker, fleet, pipeline, rollup, mqtt, web]
     start_all(services)
 
     try:
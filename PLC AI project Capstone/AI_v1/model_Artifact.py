@@ -0,0 +1,177 @@
+# model_artifact.py
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from forest_Engine import CompiledForest
+
+# Artifact formats AIModel can save (loading detects the format itself)
+ARTIFACT_FORMATS = ("pickle", "forest")
+
+FOREST_MAGIC = b"PLCFRST\0"
+FOREST_VERSION = 1
+ALIGN = 64
+
+# array name -> on-disk dtype (little-endian, fixed width)
+FOREST_ARRAYS = {
+    "feature": "<i4",
+    "threshold": "<f8",
+    "left": "<i4",
+    "right": "<i4",
+    "value": "<f8",
+    "roots": "<i4",
+    "classes": "<i8",
+    "scaler_min": "<f8",
+    "scaler_scale": "<f8",
+    "scaler_data_min": "<f8",
+    "scaler_data_max": "<f8",
+}
+
+
+def is_forest_artifact(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(FOREST_MAGIC)) == FOREST_MAGIC
+
+
+def save_forest_artifact(
+    path: str,
+    compiled: CompiledForest,
+    scaler: MinMaxScaler,
+    feature_names: List[str],
+    label_names: Dict[int, str],
+    feature_params: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Write a model as plain arrays, no pickle:
+
+      magic (8 bytes) | header length (uint64 LE) | JSON header | arrays
+
+    The header holds version, names, scalar fields and every array's
+    dtype/shape/offset; each array starts on a 64-byte boundary so
+    load_forest_artifact can map it in place. The file is written next to
+    path and renamed over it, so a running reader never sees half a file.
+    """
+    arrays = {
+        "feature": compiled.feature,
+        "threshold": compiled.threshold,
+        "left": compiled.left,
+        "right": compiled.right,
+        "value": compiled.value,
+        "roots": compiled.roots,
+        "classes": compiled.classes,
+        "scaler_min": scaler.min_,
+        "scaler_scale": scaler.scale_,
+        "scaler_data_min": scaler.data_min_,
+        "scaler_data_max": scaler.data_max_,
+    }
+    arrays = {
+        name: np.ascontiguousarray(np.asarray(a), dtype=FOREST_ARRAYS[name]) for name, a in arrays.items()
+    }
+
+    layout = {}
+    header: Dict[str, Any] = {
+        "version": FOREST_VERSION,
+        "feature_names": list(feature_names),
+        "label_names": {str(k): v for k, v in label_names.items()},
+        "feature_params": feature_params,
+        "max_depth": compiled.max_depth,
+        "scaler_feature_range": [float(v) for v in scaler.feature_range],
+        "scaler_n_samples_seen": int(scaler.n_samples_seen_),
+        "arrays": layout,
+    }
+    # offsets depend on the header size, which depends on the offsets:
+    # lay out relative to the data start, then fix the data start once
+    offset = 0
+    for name, a in arrays.items():
+        layout[name] = {"dtype": FOREST_ARRAYS[name], "shape": list(a.shape), "offset": offset}
+        offset = _aligned(offset + a.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _aligned(len(FOREST_MAGIC) + 8 + len(header_bytes) + 64)
+    header["data_start"] = data_start
+    header_bytes = json.dumps(header).encode("utf-8")
+    assert len(FOREST_MAGIC) + 8 + len(header_bytes) <= data_start
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(FOREST_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, a in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(a.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def load_forest_artifact(path: str, mmap: bool = True) -> Dict[str, Any]:
+    """
+    Read a file written by save_forest_artifact. With mmap=True the arrays
+    are read-only views on the mapped file: loading costs the header parse
+    only, pages are read on first use and shared by every process mapping
+    the same file. Returns compiled, scaler, feature_names, label_names,
+    feature_params.
+    Nothing in the file is executed; bad offsets/shapes raise ValueError
+    (and out-of-range node indices would raise IndexError at predict).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(FOREST_MAGIC)) != FOREST_MAGIC:
+            raise ValueError(f"{path} is not a forest artifact")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        if header.get("version") != FOREST_VERSION:
+            raise ValueError(f"Unsupported forest artifact version {header.get('version')}")
+        if not mmap:
+            f.seek(0)
+            buf = np.frombuffer(f.read(), dtype=np.uint8)
+
+    if mmap:
+        buf = np.memmap(path, dtype=np.uint8, mode="r")
+    data_start = int(header["data_start"])
+
+    arrays = {}
+    for name, dtype in FOREST_ARRAYS.items():
+        spec = header["arrays"][name]
+        if spec["dtype"] != dtype:
+            raise ValueError(f"Array {name}: dtype {spec['dtype']}, expected {dtype}")
+        shape = tuple(int(s) for s in spec["shape"])
+        start = data_start + int(spec["offset"])
+        nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+        if start < data_start or start + nbytes > buf.shape[0]:
+            raise ValueError(f"Array {name} lies outside the file")
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buf, offset=start)
+
+    compiled = CompiledForest(
+        feature=arrays["feature"],
+        threshold=arrays["threshold"],
+        left=arrays["left"],
+        right=arrays["right"],
+        value=arrays["value"],
+        roots=arrays["roots"],
+        classes=arrays["classes"],
+        max_depth=header["max_depth"]
+    )
+
+    scaler = MinMaxScaler(feature_range=tuple(header["scaler_feature_range"]))
+    scaler.min_ = np.array(arrays["scaler_min"])
+    scaler.scale_ = np.array(arrays["scaler_scale"])
+    scaler.data_min_ = np.array(arrays["scaler_data_min"])
+    scaler.data_max_ = np.array(arrays["scaler_data_max"])
+    scaler.data_range_ = scaler.data_max_ - scaler.data_min_
+    scaler.n_features_in_ = scaler.min_.shape[0]
+    scaler.n_samples_seen_ = header["scaler_n_samples_seen"]
+
+    return {
+        "compiled": compiled,
+        "scaler": scaler,
+        "feature_names": list(header["feature_names"]),
+        "label_names": {int(k): v for k, v in header["label_names"].items()},
+        "feature_params": header.get("feature_params"),
+    }
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
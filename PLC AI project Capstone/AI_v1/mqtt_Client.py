@@ -1,14 +1,15 @@
 # mqtt_client.py
 import json
-import time
 import threading
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import paho.mqtt.client as mqtt
 
 from base_Service import BaseService
 from database_Access import DatabaseAccess
 from ai_Model import AIModel
+from ingest_Pipeline import IngestPipeline
+from telemetry_Fields import derive_telemetry
 
 
 class MqttClient(BaseService):
@@ -17,7 +18,8 @@ class MqttClient(BaseService):
     - Receives device health JSON
     - Derives features
     - Runs AI prediction
-    - Stores to DB
+    - Stores to DB (through IngestPipeline if given, so the paho
+      network thread never waits on SQLite)
     """
     def __init__(
         self,
@@ -27,7 +29,8 @@ class MqttClient(BaseService):
         broker_port: int = 1883,
         topic: str = "plc/devices/diagnostic/#",
         username: Optional[str] = None,
-        password: Optional[str] = None
+        password: Optional[str] = None,
+        pipeline: Optional[IngestPipeline] = None
     ):
         super().__init__("MqttClient")
         self.db = db
@@ -37,6 +40,7 @@ class MqttClient(BaseService):
         self.topic = topic
         self.username = username
         self.password = password
+        self.pipeline = pipeline
 
         self._client: Optional[mqtt.Client] = None
         self._thread: Optional[threading.Thread] = None
@@ -70,62 +74,55 @@ class MqttClient(BaseService):
 
     def _on_message(self, client, userdata, msg):
         try:
-            payload = msg.payload.decode("utf-8", errors="ignore")
-            data = json.loads(payload) if payload.strip().startswith("{") else {"raw": payload}
-
-            # Extract common identity
-            siteid = str(data.get("siteid") or data.get("SiteId") or "UNKNOWN")
-            gateway = str(data.get("gateway") or data.get("Gateway") or "UNKNOWN")
-            ts = int(data.get("time") or data.get("updatetime") or time.time())
-
-            # Derive features you specified
-            totalmemory = _to_float(data.get("totalmemory"))
-            remainingmemory = _to_float(data.get("remainingmemory"))
-            storagetotal = _to_float(data.get("storagetotal"))
-            remainingstorage = _to_float(data.get("remainingstorage"))
-            cpuusage = _to_float(data.get("cpuusage"))
-            temperature = _to_float(data.get("temperature"))
-
-            used_memory = None
-            if totalmemory is not None and remainingmemory is not None:
-                used_memory = totalmemory - remainingmemory
-
-            used_storage = None
-            if storagetotal is not None and remainingstorage is not None:
-                used_storage = storagetotal - remainingstorage
-
-            # AI predict (if model loaded)
+            # Parse once; the received bytes are what gets stored (no re-dump)
+            raw, data = _parse_payload(msg.payload)
+
+            # Identity + derived features (shared with import_diagnostics.py)
+            fields = derive_telemetry(data)
+
+            # AI predict (if model loaded). When the pipeline has the model it
+            # scores whole batches itself, so leave status empty here.
             health_status, reason = None, None
-            if self.ai.artifacts is not None:
-                health_status, reason = self.ai.predict_status({
-                    "used_memory": used_memory,
-                    "used_storage": used_storage,
-                    "cpuusage": cpuusage,
-                    "temperature": temperature,
-                })
-
-            # Store
-            self.db.insert_telemetry(
-                ts=ts,
-                gateway=gateway,
-                siteid=siteid,
-                topic=msg.topic,
-                raw=data,
-                used_memory=used_memory,
-                used_storage=used_storage,
-                cpuusage=cpuusage,
-                temperature=temperature,
-                health_status=health_status,
-                reason=reason
-            )
+            batch_scored = self.pipeline is not None and self.pipeline.ai is not None
+            if self.ai.artifacts is not None and not batch_scored:
+                health_status, reason = self.ai.predict_status(fields)
+
+            row = {
+                **fields,
+                "topic": msg.topic,
+                "raw": raw,
+                "health_status": health_status,
+                "reason": reason,
+            }
+
+            # Store (queued for the batch writer, or direct)
+            if self.pipeline is not None:
+                self.pipeline.submit(row)
+            else:
+                self.db.insert_telemetry(**row)
         except Exception as e:
             print(f"[MQTT] Error handling message: {e}")
 
 
-def _to_float(x: Any) -> Optional[float]:
-    if x is None:
-        return None
+def _parse_payload(payload: bytes) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Returns (bytes to store, parsed dict).
+    UTF-8 JSON objects are stored verbatim (the API splices the stored
+    bytes into UTF-8 responses); JSON objects in another encoding
+    (json.loads detects UTF-16/32) are re-encoded; anything else is
+    wrapped as {"raw": text}.
+    """
+    try:
+        data = json.loads(payload.decode("utf-8"))
+        if isinstance(data, dict):
+            return payload, data
+    except ValueError:
+        pass
     try:
-        return float(x)
-    except Exception:
-        return None
+        data = json.loads(payload)
+        if isinstance(data, dict):
+            return json.dumps(data).encode("utf-8"), data
+    except ValueError:
+        pass
+    data = {"raw": payload.decode("utf-8", errors="ignore")}
+    return json.dumps(data).encode("utf-8"), data
@@ -0,0 +1,115 @@
+# prediction_cache.py
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from forest_Engine import CompiledForest
+
+# Quantization step per feature (raw units); features not listed are exact
+DEFAULT_RESOLUTION = {
+    "used_memory": 1.0,
+    "used_storage": 1.0,
+    "cpuusage": 0.1,
+    "temperature": 0.1,
+}
+
+# Cached value for a cell that contains a split threshold: always compute
+UNCACHEABLE = -1
+
+
+class PredictionCache:
+    """
+    Bounded LRU of forest class ids keyed by the quantized feature vector,
+    for one model (AIModel builds a new one on every model swap).
+
+    Cell of value v with step s: q = floor(v / s + 0.5), covering
+    [(q - 0.5) s, (q + 0.5) s); features with step 0 (or non-finite
+    values) are keyed exactly. On a miss, fill() scores the vector and
+    checks its cell in the same forest traversal
+    (CompiledForest.predict_box, with a small margin): when no split on
+    its paths lies inside the cell, every vector in the cell reaches the
+    same leaves and the cached class is exactly what the forest would
+    return. Cells a split runs through are remembered as UNCACHEABLE and
+    always evaluated.
+    """
+    def __init__(
+        self,
+        compiled: CompiledForest,
+        feature_names: List[str],
+        resolution: Optional[Dict[str, float]] = None,
+        max_entries: int = 10000
+    ):
+        resolution = DEFAULT_RESOLUTION if resolution is None else resolution
+        self.compiled = compiled
+        self.steps = [float(resolution.get(k, 0.0)) for k in feature_names]
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[Any, ...], int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable_hits = 0
+        self.evictions = 0
+
+    def key(self, feats: List[float]) -> Tuple[Any, ...]:
+        return tuple(
+            math.floor(v / s + 0.5) if s > 0 and math.isfinite(v) else v
+            for v, s in zip(feats, self.steps)
+        )
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[int]:
+        """
+        Class id, UNCACHEABLE, or None (not cached).
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if value == UNCACHEABLE:
+                self.uncacheable_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def fill(self, key: Tuple[Any, ...], feats: List[float]) -> int:
+        """
+        Score feats (whose key is key), cache the result, return the class id.
+        """
+        lo = np.array(feats, dtype=np.float64)
+        hi = lo.copy()          # exact features: empty interval, no split inside
+        for f, (q, s) in enumerate(zip(key, self.steps)):
+            if s > 0 and isinstance(q, int):
+                margin = s * 1e-6
+                lo[f] = (q - 0.5) * s - margin
+                hi[f] = (q + 0.5) * s + margin
+        class_id, same = self.compiled.predict_box(feats, lo, hi)
+        value = class_id if same else UNCACHEABLE
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return class_id
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.uncacheable_hits
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "uncacheable_hits": self.uncacheable_hits,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
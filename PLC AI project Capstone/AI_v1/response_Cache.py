@@ -0,0 +1,86 @@
+# response_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Cache of rendered JSON bodies for the dashboard endpoints.
+    - Keyed by endpoint + query args
+    - An entry is valid while the ingest version it was rendered at is
+      still current (bump() is an IngestPipeline listener) and it is
+      younger than max_age (covers writes that bypass the pipeline,
+      e.g. retention purges)
+    - Each body carries a content-hash ETag so unchanged responses turn
+      into 304s even after the version moved on
+    """
+    def __init__(self, max_entries: int = 1024, max_age: float = 5.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, float, str, str]]" = OrderedDict()
+        self._version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self, *_args) -> None:
+        """
+        New data was ingested; every cached body is now stale.
+        Signature fits IngestPipeline.add_listener.
+        """
+        with self._lock:
+            self._version += 1
+
+    def get_or_render(self, key: str, render: Callable[[], str]) -> Tuple[str, str]:
+        """
+        (body, etag) for key, calling render() only on a miss.
+        The etag is unquoted (Response.set_etag adds the quotes).
+        """
+        now = time.monotonic()
+        with self._lock:
+            version = self._version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and now - entry[1] < self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2], entry[3]
+            self.misses += 1
+
+        # render outside the lock; a concurrent miss on the same key just renders twice
+        body = render()
+        etag = hashlib.blake2b(body.encode(), digest_size=8).hexdigest()
+        with self._lock:
+            self._entries[key] = (version, now, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
+
+    def count_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
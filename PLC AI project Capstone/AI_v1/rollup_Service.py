@@ -0,0 +1,77 @@
+# rollup_service.py
+import threading
+import time
+from typing import Optional
+
+from base_Service import BaseService
+from database_Access import DatabaseAccess
+
+
+class RollupService(BaseService):
+    """
+    Background job for long-term history.
+    Every `interval` seconds:
+    - rolls raw telemetry up into 1-minute and 1-hour buckets per siteid
+    - deletes raw rows older than raw_max_age (in small chunks, so the
+      writer lock is never held for long)
+    - deletes 1-minute buckets older than rollup_1m_max_age
+      (1-hour buckets are kept)
+    """
+    def __init__(
+        self,
+        db: DatabaseAccess,
+        interval: float = 60.0,
+        raw_max_age: int = 7 * 24 * 3600,
+        rollup_1m_max_age: int = 90 * 24 * 3600,
+        purge_chunk_size: int = 500,
+        purge_pause: float = 0.05,
+        late_seconds: int = 120
+    ):
+        super().__init__("RollupService")
+        self.db = db
+        self.interval = interval
+        self.raw_max_age = raw_max_age
+        self.rollup_1m_max_age = rollup_1m_max_age
+        self.purge_chunk_size = purge_chunk_size
+        self.purge_pause = purge_pause
+        self.late_seconds = late_seconds
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        super().start()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="rollup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        super().stop()
+
+    def run_once(self, now: Optional[int] = None) -> None:
+        now = int(now if now is not None else time.time())
+        written = self.db.rollup_telemetry(until_ts=now, late_seconds=self.late_seconds)
+        purged = self.db.purge_raw_before(
+            now - self.raw_max_age,
+            chunk_size=self.purge_chunk_size,
+            pause=self.purge_pause,
+            late_seconds=self.late_seconds
+        )
+        purged_1m = self.db.purge_rollups_before("1m", now - self.rollup_1m_max_age)
+        if written["1m"] or written["1h"] or purged or purged_1m:
+            print(
+                f"[RollupService] buckets 1m={written['1m']} 1h={written['1h']} | "
+                f"purged raw={purged} 1m={purged_1m}"
+            )
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[RollupService] Error: {e}")
+            self._stop_event.wait(self.interval)
@@ -0,0 +1,84 @@
+# series_downsample.py
+from typing import Tuple
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def downsample(
+    ts: np.ndarray,
+    values: np.ndarray,
+    max_points: int,
+    method: str = "lttb"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce a time series (ts ascending, no NaNs) to at most max_points points.
+    Series that already fit are returned unchanged.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method must be one of {DOWNSAMPLE_METHODS}")
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    if ts.shape[0] <= max_points:
+        return ts, values
+    idx = lttb_indices(ts, values, max_points) if method == "lttb" else minmax_indices(ts, values, max_points)
+    return ts[idx], values[idx]
+
+
+def lttb_indices(ts: np.ndarray, values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets (Steinarsson 2013).
+    First and last points are kept; the n - 2 points in between are split
+    into n_out - 2 equal-count buckets and from each bucket the point forming
+    the largest triangle with the previously chosen point and the average of
+    the next bucket is kept. One python iteration per output point, numpy
+    over the points of each bucket.
+    """
+    n = ts.shape[0]
+    x = ts.astype(np.float64) - float(ts[0])     # keep areas well conditioned
+    y = values.astype(np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)   # n_out - 2 buckets
+    starts, ends = edges[:-1], edges[1:]
+
+    # average point of every bucket (+ the last point as the final "next bucket")
+    # (reduceat's last segment runs to the end, so leave the final point out)
+    counts = ends - starts
+    avg_x = np.append(np.add.reduceat(x[:-1], starts) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:-1], starts) / counts, y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        s, e = starts[b], ends[b]
+        cx, cy = avg_x[b + 1], avg_y[b + 1]
+        ax, ay = x[a], y[a]
+        # twice the triangle area (sign dropped)
+        area = np.abs((ax - cx) * (y[s:e] - ay) - (ax - x[s:e]) * (cy - ay))
+        a = s + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+
+def minmax_indices(ts: np.ndarray, values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min and max point of each of n_out // 2 equal-width time buckets, in
+    time order (a bucket whose min and max are the same point gives one).
+    Keeps every spike, which LTTB may smooth over. Fully vectorized.
+    """
+    n = ts.shape[0]
+    n_buckets = max(n_out // 2, 1)
+    t0, span = int(ts[0]), int(ts[-1]) - int(ts[0]) + 1
+    bucket = (ts.astype(np.int64) - t0) * n_buckets // span
+
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    pos = np.arange(n)
+
+    lo = np.repeat(np.minimum.reduceat(values, starts), counts)
+    hi = np.repeat(np.maximum.reduceat(values, starts), counts)
+    i_min = np.minimum.reduceat(np.where(values == lo, pos, n), starts)
+    i_max = np.minimum.reduceat(np.where(values == hi, pos, n), starts)
+    return np.unique(np.concatenate([i_min, i_max]))
@@ -0,0 +1,56 @@
+# telemetry_export.py
+import csv
+import io
+import json
+from typing import Iterator, List, Optional
+
+from database_Access import DatabaseAccess
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def export_telemetry(
+    db: DatabaseAccess,
+    fmt: str = "ndjson",
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    siteids: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+    chunk_rows: int = 5000
+) -> Iterator[str]:
+    """
+    Telemetry as NDJSON (one object per line) or CSV (with header), as a
+    generator of text blocks, one block per DatabaseAccess.iter_telemetry
+    chunk. Arguments are validated before the first block is produced.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {tuple(EXPORT_FORMATS)}")
+    cols = db.export_columns(columns)
+    chunks = db.iter_telemetry(
+        since=since, until=until, siteids=siteids, columns=cols, chunk_rows=chunk_rows
+    )
+    if fmt == "ndjson":
+        return _ndjson(cols, chunks)
+    return _csv(cols, chunks)
+
+
+def _ndjson(cols: List[str], chunks) -> Iterator[str]:
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(cols, r))) + "\n" for r in rows)
+
+
+def _csv(cols: List[str], chunks) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(cols)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():      # header only (no rows)
+        yield buf.getvalue()
@@ -0,0 +1,55 @@
+# telemetry_fields.py
+import math
+import time
+from typing import Any, Dict, Optional
+
+
+def derive_telemetry(data: Dict[str, Any], default_ts: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Identity + model features from one diagnostic record (an MQTT JSON
+    payload or a Diagnostic_Data.csv row; same field names).
+    - ts: "time", else "updatetime", else default_ts, else now
+    - used_memory = totalmemory - remainingmemory
+    - used_storage = storagetotal - remainingstorage
+    Missing or unparsable values become None.
+    """
+    siteid = str(data.get("siteid") or data.get("SiteId") or "UNKNOWN")
+    gateway = str(data.get("gateway") or data.get("Gateway") or "UNKNOWN")
+    ts = to_int(data.get("time")) or to_int(data.get("updatetime")) or default_ts or int(time.time())
+
+    totalmemory = to_float(data.get("totalmemory"))
+    remainingmemory = to_float(data.get("remainingmemory"))
+    storagetotal = to_float(data.get("storagetotal"))
+    remainingstorage = to_float(data.get("remainingstorage"))
+
+    used_memory = None
+    if totalmemory is not None and remainingmemory is not None:
+        used_memory = totalmemory - remainingmemory
+
+    used_storage = None
+    if storagetotal is not None and remainingstorage is not None:
+        used_storage = storagetotal - remainingstorage
+
+    return {
+        "ts": ts,
+        "gateway": gateway,
+        "siteid": siteid,
+        "used_memory": used_memory,
+        "used_storage": used_storage,
+        "cpuusage": to_float(data.get("cpuusage")),
+        "temperature": to_float(data.get("temperature")),
+    }
+
+
+def to_float(x: Any) -> Optional[float]:
+    if x is None or x == "":
+        return None
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def to_int(x: Any) -> Optional[int]:
+    f = to_float(x)
+    return int(f) if f is not None and math.isfinite(f) else None
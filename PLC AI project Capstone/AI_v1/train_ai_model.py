@@ -1,20 +1,28 @@
 
 from __future__ import annotations
-import random
+import argparse
+import time
+
 import numpy as np
 
 from ai_Model import AIModel
+from database_Access import TRAINING_LABEL_COLUMNS, DatabaseAccess
+from feature_State import ROLLING_FEATURE_KEYS, FeatureState
+from model_Artifact import ARTIFACT_FORMATS
 
 RNG = np.random.default_rng(42)
 
-def clamp(x, lo, hi):
-    return max(lo, min(hi, x))
+FEATURE_KEYS = ["used_memory", "used_storage", "cpuusage", "temperature"]
+LABEL_KEY = "label"
 
-def maybe_nan(x, p=0.08):
-    # simulate nulls/missing
-    return np.nan if RNG.random() < p else x
+TOTAL_MEM = 1873.92
+TOTAL_STORAGE = 4249.6
 
-def generate_synthetic_training_data(n_samples: int = 3000) -> list[dict]:
+
+def generate_synthetic_training_arrays(
+    n_samples: int = 3000,
+    rng: np.random.Generator | None = None
+) -> tuple[np.ndarray, np.ndarray]:
     """
     Generates labeled training data based on your real metric patterns:
     - totalmemory ~ 1873.92
@@ -29,131 +37,261 @@ def generate_synthetic_training_data(n_samples: int = 3000) -> list[dict]:
     - sensor glitches
     - missing values
     - correlated behavior
+
+    Vectorized: every step draws one array for all samples and applies it
+    where the event fires, so millions of rows take seconds.
+    Returns (X, labels): X is float (n_samples, 4) with columns in
+    FEATURE_KEYS order (missing = NaN), labels is a str array.
     """
-    rows = []
+    rng = RNG if rng is None else rng
+    n = n_samples
+
+    def chance(p):
+        return rng.random(n) < p
 
-    TOTAL_MEM = 1873.92
-    TOTAL_STORAGE = 4249.6
+    # --- base (normal) behavior ---
+    remainingmemory = np.clip(rng.normal(750, 140, n), 200, 1200)
+    remainingstorage = np.clip(rng.normal(600, 120, n), 50, 1100)
 
-    for i in range(n_samples):
-        # --- base (normal) behavior ---
-        remainingmemory = float(clamp(RNG.normal(750, 140), 200, 1200))
-        remainingstorage = float(clamp(RNG.normal(600, 120), 50, 1100))
+    used_memory = TOTAL_MEM - remainingmemory
+    used_storage = TOTAL_STORAGE - remainingstorage
 
-        used_memory = TOTAL_MEM - remainingmemory
-        used_storage = TOTAL_STORAGE - remainingstorage
+    cpuusage = np.clip(rng.normal(40, 12, n), 0, 100)
+    temperature = np.clip(rng.normal(42, 8, n), -5, 95)
 
-        cpuusage = float(clamp(RNG.normal(40, 12), 0, 100))
-        temperature = float(clamp(RNG.normal(42, 8), -5, 95))
+    # --- correlated effects (high CPU raises temp + memory a bit) ---
+    hot_cpu = cpuusage > 70
+    temperature = np.where(hot_cpu, np.clip(temperature + rng.normal(8, 3, n), -10, 110), temperature)
+    used_memory = np.where(hot_cpu, np.clip(used_memory + rng.normal(80, 30, n), 0, TOTAL_MEM), used_memory)
 
-        # --- correlated effects (high CPU raises temp + memory a bit) ---
-        if cpuusage > 70:
-            temperature = clamp(temperature + RNG.normal(8, 3), -10, 110)
-            used_memory = clamp(used_memory + RNG.normal(80, 30), 0, TOTAL_MEM)
+    # --- EVENT: storage growth over time (some devices drift upward) ---
+    used_storage = np.where(
+        chance(0.15), np.clip(used_storage + rng.normal(250, 120, n), 0, TOTAL_STORAGE), used_storage
+    )
 
-        # --- EVENT: storage growth over time (some devices drift upward) ---
-        if RNG.random() < 0.15:
-            used_storage = clamp(used_storage + RNG.normal(250, 120), 0, TOTAL_STORAGE)
+    # --- EVENT: memory leak (slow rise) ---
+    used_memory = np.where(chance(0.12), np.clip(used_memory + rng.normal(220, 90, n), 0, TOTAL_MEM), used_memory)
 
-        # --- EVENT: memory leak (slow rise) ---
-        if RNG.random() < 0.12:
-            used_memory = clamp(used_memory + RNG.normal(220, 90), 0, TOTAL_MEM)
+    # --- EVENT: extremely LOW temperature (cold site / environment) ---
+    temperature = np.where(chance(0.05), np.clip(rng.normal(2, 4, n), -15, 12), temperature)
 
-        # --- EVENT: extremely LOW temperature (cold site / environment) ---
-        if RNG.random() < 0.05:
-            temperature = float(clamp(RNG.normal(2, 4), -15, 12))
+    # --- EVENT: extremely HIGH temperature (overheat) ---
+    overheat = chance(0.06)
+    temperature = np.where(overheat, np.clip(rng.normal(86, 6, n), 70, 110), temperature)
+    cpuusage = np.where(overheat, np.clip(cpuusage + rng.normal(20, 10, n), 0, 100), cpuusage)
 
-        # --- EVENT: extremely HIGH temperature (overheat) ---
-        if RNG.random() < 0.06:
-            temperature = float(clamp(RNG.normal(86, 6), 70, 110))
-            cpuusage = float(clamp(cpuusage + RNG.normal(20, 10), 0, 100))
+    # --- EVENT: sudden spike (transient anomaly) ---
+    spike = chance(0.08)
+    cpuusage = np.where(spike, np.clip(cpuusage + rng.normal(35, 15, n), 0, 100), cpuusage)
+    temperature = np.where(spike, np.clip(temperature + rng.normal(12, 5, n), -15, 110), temperature)
 
-        # --- EVENT: sudden spike (transient anomaly) ---
-        if RNG.random() < 0.08:
-            cpuusage = float(clamp(cpuusage + RNG.normal(35, 15), 0, 100))
-            temperature = float(clamp(temperature + RNG.normal(12, 5), -15, 110))
+    # --- EVENT: sensor glitch / impossible values ---
+    # (helps you test robustness + data cleaning)
+    temperature = np.where(chance(0.02), rng.choice([-999.0, 999.0, -50.0, 150.0], n), temperature)
+    cpuusage = np.where(chance(0.02), rng.choice([-10.0, 150.0, 999.0], n), cpuusage)
 
-        # --- EVENT: sensor glitch / impossible values ---
-        # (helps you test robustness + data cleaning)
-        if RNG.random() < 0.02:
-            temperature = float(RNG.choice([-999, 999, -50, 150]))
-        if RNG.random() < 0.02:
-            cpuusage = float(RNG.choice([-10, 150, 999]))
+    # --- EVENT: missing values / NULLs ---
+    X = np.column_stack([used_memory, used_storage, cpuusage, temperature])
+    X[rng.random((n, 4)) < np.array([0.07, 0.07, 0.05, 0.06])] = np.nan
 
-        # --- EVENT: missing values / NULLs ---
-        used_memory = maybe_nan(used_memory, p=0.07)
-        used_storage = maybe_nan(used_storage, p=0.07)
-        cpuusage = maybe_nan(cpuusage, p=0.05)
-        temperature = maybe_nan(temperature, p=0.06)
+    return X, label_synthetic(X)
 
-        # --- labeling rules (realistic + includes low temp and glitches) ---
-        label = "Healthy"
 
+def label_synthetic(X: np.ndarray) -> np.ndarray:
+    """
+    Labeling rules (realistic + includes low temp and glitches), vectorized.
+    X columns follow FEATURE_KEYS; NaN = missing (every comparison with NaN
+    is False, so missing metrics never trigger a rule).
+    """
+    um, us, c, t = X[:, 0], X[:, 1], X[:, 2], X[:, 3]
+
+    with np.errstate(invalid="ignore"):
         # Sensor out-of-range => Critical (or you can make a separate "Invalid" class later)
-        if (isinstance(temperature, float) and not np.isnan(temperature) and (temperature < -10 or temperature > 120)) \
-           or (isinstance(cpuusage, float) and not np.isnan(cpuusage) and (cpuusage < 0 or cpuusage > 100)):
-            label = "Critical"
-
-        # If missing too many key metrics, treat as Warning (data quality issue)
-        missing_count = sum([
-            1 if (isinstance(used_memory, float) and np.isnan(used_memory)) else 0,
-            1 if (isinstance(used_storage, float) and np.isnan(used_storage)) else 0,
-            1 if (isinstance(cpuusage, float) and np.isnan(cpuusage)) else 0,
-            1 if (isinstance(temperature, float) and np.isnan(temperature)) else 0,
-        ])
-        if missing_count >= 2:
-            label = "Warning"
-
-        # Normal thresholds (only apply if not NaN)
-        if label != "Critical":
-            t = temperature if (not (isinstance(temperature, float) and np.isnan(temperature))) else None
-            c = cpuusage if (not (isinstance(cpuusage, float) and np.isnan(cpuusage))) else None
-            um = used_memory if (not (isinstance(used_memory, float) and np.isnan(used_memory))) else None
-            us = used_storage if (not (isinstance(used_storage, float) and np.isnan(used_storage))) else None
-
-            # Critical
-            if (t is not None and (t > 80 or t < 5)) \
-               or (c is not None and c > 90) \
-               or (um is not None and um > 1600) \
-               or (us is not None and us > 3900):
-                label = "Critical"
-            # Warning
-            elif (t is not None and (65 <= t <= 80 or 5 <= t < 10)) \
-                 or (c is not None and 60 <= c <= 90) \
-                 or (um is not None and 1350 <= um <= 1600) \
-                 or (us is not None and 3400 <= us <= 3900):
-                label = "Warning"
-            else:
-                label = "Healthy"
-
-        rows.append({
-            "used_memory": used_memory,
-            "used_storage": used_storage,
-            "cpuusage": cpuusage,
-            "temperature": temperature,
-            "label": label
-        })
-
-    return rows
+        glitch = (t < -10) | (t > 120) | (c < 0) | (c > 100)
+
+        # If missing too many key metrics the row is a data quality issue
+        # (Warning); it then goes through the normal thresholds below, which
+        # also overrule a glitch
+        too_many_missing = np.isnan(X).sum(axis=1) >= 2
+
+        # Normal thresholds
+        critical = (t > 80) | (t < 5) | (c > 90) | (um > 1600) | (us > 3900)
+        warning = (
+            ((t >= 65) & (t <= 80)) | ((t >= 5) & (t < 10))
+            | ((c >= 60) & (c <= 90))
+            | ((um >= 1350) & (um <= 1600))
+            | ((us >= 3400) & (us <= 3900))
+        )
+
+    labels = np.where(critical, "Critical", np.where(warning, "Warning", "Healthy"))
+    return np.where(glitch & ~too_many_missing, "Critical", labels)
+
+
+def generate_synthetic_sequences(
+    n_devices: int = 400,
+    steps: int = 120,
+    interval: int = 60,
+    window: int = 60,
+    rng: np.random.Generator | None = None
+) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-device time series (one reading every `interval` seconds) for
+    training with rolling features (feature_State):
+    - every device holds a steady state drawn by
+      generate_synthetic_training_arrays (so the fleet covers the same
+      events: hot/cold sites, storage growth, a glitching or missing
+      sensor stays that way), plus per-reading noise
+    - memory leak: from a random reading on, used_memory climbs
+      60-240 MB/h (25% of devices)
+    - storage creep: used_storage climbs 30-120 MB/h (20% of devices)
+    - transient spikes and dropped values per reading
+    Labels: label_synthetic per reading, except that a Healthy reading of
+    a device that has been leaking/creeping for at least window // 2
+    readings (and reports that metric) is a Warning: its values are still
+    normal, only the trend shows the problem.
+    Returns (siteids, ts, X, labels), device by device in time order;
+    X columns follow FEATURE_KEYS (missing = NaN).
+    """
+    rng = RNG if rng is None else rng
+    shape = (n_devices, steps)
+
+    def chance(p, size=shape):
+        return rng.random(size) < p
+
+    step = np.arange(steps)[np.newaxis, :]
+    ts = 1_700_000_000 + rng.integers(0, interval, (n_devices, 1)) + step * interval
+
+    # --- steady state per device + noise ---
+    steady, _ = generate_synthetic_training_arrays(n_devices, rng=rng)
+    noise = np.array([8.0, 1.5, 6.0, 1.5])
+    X = steady[:, np.newaxis, :] + rng.normal(0, 1, (n_devices, steps, 4)) * noise
+    X[..., 2] = np.where(np.abs(steady[:, np.newaxis, 2]) <= 100, np.clip(X[..., 2], 0, 100), X[..., 2])
+
+    # --- EVENT: memory leak / storage creep (linear rise from a random reading) ---
+    def drift(share, lo, hi, col):
+        on = chance(share, (n_devices, 1)) & ~np.isnan(steady[:, [col]])
+        elapsed = np.clip(step - rng.integers(0, steps, (n_devices, 1)), 0, None)
+        per_reading = rng.uniform(lo, hi, (n_devices, 1)) * interval / 3600
+        return np.where(on, elapsed * per_reading, 0.0), on & (elapsed >= window // 2)
+
+    leak, leaking = drift(0.25, 60, 240, 0)
+    creep, creeping = drift(0.20, 30, 120, 1)
+    X[..., 0] = np.clip(X[..., 0] + leak, 0, TOTAL_MEM)
+    X[..., 1] = np.clip(X[..., 1] + creep, 0, TOTAL_STORAGE)
+
+    # --- EVENT: sudden spike (transient anomaly) ---
+    spike = chance(0.05)
+    X[..., 2] = np.where(spike, np.clip(X[..., 2] + rng.normal(35, 15, shape), 0, 100), X[..., 2])
+    X[..., 3] = np.where(spike, X[..., 3] + rng.normal(12, 5, shape), X[..., 3])
+
+    # --- EVENT: dropped values ---
+    X = X.reshape(-1, 4)
+    X[rng.random(X.shape) < 0.03] = np.nan
+
+    labels = label_synthetic(X)
+    trend = (leaking | creeping).reshape(-1)
+    labels = np.where((labels == "Healthy") & trend, "Warning", labels)
+
+    siteids = [f"SIM-{d:05d}" for d in range(n_devices) for _ in range(steps)]
+    return siteids, ts.reshape(-1).astype(float), X, labels
+
+
+def generate_synthetic_rolling_arrays(
+    state: FeatureState,
+    n_devices: int = 400,
+    steps: int = 120,
+    rng: np.random.Generator | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    generate_synthetic_sequences with each device's rolling features
+    (state's settings) appended: X columns are FEATURE_KEYS +
+    state.feature_names. Every device gets state.window extra readings of
+    history that are replayed and then dropped, so like a long-running
+    device every returned row sees a full window. Devices report every
+    state.interval seconds.
+    """
+    total = steps + state.window
+    siteids, ts, X, labels = generate_synthetic_sequences(
+        n_devices, total, interval=int(state.interval), window=state.window, rng=rng
+    )
+    X = np.hstack([X, state.replay(siteids, ts, X)])
+    keep = np.tile(np.arange(total) >= state.window, n_devices)
+    return X[keep], labels[keep]
+
+
+def generate_synthetic_training_data(n_samples: int = 3000) -> list[dict]:
+    """
+    Same data as generate_synthetic_training_arrays, as row dicts
+    ({"used_memory", "used_storage", "cpuusage", "temperature", "label"}).
+    """
+    X, labels = generate_synthetic_training_arrays(n_samples)
+    return [
+        {**dict(zip(FEATURE_KEYS, map(float, x))), LABEL_KEY: str(label)}
+        for x, label in zip(X, labels)
+    ]
 
 
 if __name__ == "__main__":
-    # 1) Generate realistic dataset
-    rows = generate_synthetic_training_data(n_samples=4000)
-
-    # 2) Train model
-    FEATURE_KEYS = ["used_memory", "used_storage", "cpuusage", "temperature"]
-    LABEL_KEY = "label"
-
-    ai = AIModel(model_path="model.pkl")
-    metrics = ai.train_from_rows(
-        rows,
-        feature_keys=FEATURE_KEYS,
-        label_key=LABEL_KEY,
-        test_size=0.3,
-        n_estimators=400,
-        max_depth=None
+    parser = argparse.ArgumentParser(description="Train model.pkl on synthetic or stored telemetry")
+    parser.add_argument("--samples", type=int, default=4000)
+    parser.add_argument("--model", default="model.pkl")
+    parser.add_argument("--from-db", default=None, metavar="DB", help="train on labeled rows of this DB instead")
+    parser.add_argument("--label-column", choices=TRAINING_LABEL_COLUMNS, default="operator_label")
+    parser.add_argument("--max-rows", type=int, default=None, help="stratified subsample size (--from-db)")
+    parser.add_argument(
+        "--format", choices=ARTIFACT_FORMATS, default="pickle",
+        help="forest = pickle-free, memory-mapped artifact (model_Artifact)"
     )
+    parser.add_argument(
+        "--rolling", action="store_true",
+        help="add per-device rolling features (feature_State); synthetic data becomes device time series"
+    )
+    args = parser.parse_args()
+
+    ai = AIModel(model_path=args.model, artifact_format=args.format)
+    t0 = time.perf_counter()
+    if args.from_db:
+        # 1+2) Stream labeled rows from the DB and train
+        db = DatabaseAccess(db_path=args.from_db)
+        db.start()
+        try:
+            metrics = ai.train_from_database(
+                db,
+                feature_keys=FEATURE_KEYS + (ROLLING_FEATURE_KEYS if args.rolling else []),
+                label_column=args.label_column,
+                max_rows=args.max_rows,
+                test_size=0.3,
+                n_estimators=400,
+                max_depth=None,
+                feature_state=FeatureState() if args.rolling else None
+            )
+        finally:
+            db.stop()
+        print(
+            f"Trained on {metrics['rows_used']:,d} of {metrics['rows_available']:,d} labeled rows "
+            f"{metrics['label_counts']} in {time.perf_counter() - t0:.1f}s"
+        )
+    else:
+        # 1) Generate realistic dataset
+        feature_keys, feature_params = FEATURE_KEYS, None
+        if args.rolling:
+            state = FeatureState()
+            X, labels = generate_synthetic_rolling_arrays(state, n_devices=max(1, args.samples // 120))
+            feature_keys, feature_params = FEATURE_KEYS + state.feature_names, state.params()
+        else:
+            X, labels = generate_synthetic_training_arrays(n_samples=args.samples)
+        print(f"Generated {len(labels):,d} samples in {time.perf_counter() - t0:.2f}s")
+
+        # 2) Train model
+        metrics = ai.train_from_arrays(
+            X,
+            labels,
+            feature_keys=feature_keys,
+            test_size=0.3,
+            n_estimators=400,
+            max_depth=None,
+            feature_params=feature_params
+        )
 
     print("\n✅ Training complete!")
     print("Accuracy:", metrics["accuracy"])
@@ -170,7 +308,16 @@ if __name__ == "__main__":
         {"used_memory": np.nan, "used_storage": np.nan, "cpuusage": 55, "temperature": 40}, # missing
     ]
 
+    inputs = tests
+    if args.rolling:
+        # each test as a device that has reported the same values for a whole window
+        state, inputs = FeatureState(), []
+        for i, t in enumerate(tests):
+            for k in range(state.window):
+                feats = state.update({"siteid": f"TEST-{i}", "ts": state.interval * k, **t})
+            inputs.append({**t, **feats})
+
     ai.start()  # loads model.pkl if saved
-    for t in tests:
-        status, reason = ai.predict_status(t)
+    for t, x in zip(tests, inputs):
+        status, reason = ai.predict_status(x)
         print(f"Test: {t} -> {status} | {reason}")
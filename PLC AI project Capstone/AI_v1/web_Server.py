@@ -1,7 +1,22 @@
 # web_server.py
-from flask import Flask, jsonify, render_template_string, request
+import json
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+from urllib.parse import urlencode
+
+from flask import Flask, Response, jsonify, render_template_string, request, stream_with_context
+from ai_Model import AIModel
 from base_Service import BaseService
-from database_Access import DatabaseAccess
+from database_Access import DEVICE_SORTS, ROLLUP_METRICS, ROLLUP_TABLES, DatabaseAccess
+from hot_Store import HotStore
+from event_Broker import EventBroker
+from fleet_Summary import FleetSummary
+from feature_State import FeatureState
+from response_Cache import ResponseCache
+from series_Downsample import DOWNSAMPLE_METHODS, downsample
+from telemetry_Export import EXPORT_FORMATS, export_telemetry
 
 # To run, python main.py, python simulate_publisher.py
 DASHBOARD_HTML = """
@@ -240,7 +255,7 @@ DASHBOARD_HTML = """
         </span>
         <div>
           <div class="brand h4 mb-0">PLC AI-Powered Edge Device Health Check</div>
-          <div class="sub">Dashboard reads latest status from DB (auto refresh every 2s)</div>
+          <div class="sub">Dashboard reads latest status from DB (live push updates, polling every 2s as fallback)</div>
         </div>
       </div>
 
@@ -259,8 +274,16 @@ DASHBOARD_HTML = """
             <div class="section-meta"><span id="deviceCount">0</span> devices</div>
           </div>
 
-          <div class="mb-2">
+          <div class="mb-2 d-flex gap-2">
             <input id="searchInput" class="form-control searchbar" placeholder="Search site or gateway (e.g., PH-NCR-01788 or 142e...)" />
+            <select id="statusFilter" class="form-select searchbar" style="max-width:160px;">
+              <option value="">All statuses</option>
+              <option value="Critical">Critical</option>
+              <option value="Warning">Warning</option>
+              <option value="Critical,Warning">Warning + Critical</option>
+              <option value="Healthy">Healthy</option>
+              <option value="Unknown">Unknown</option>
+            </select>
           </div>
 
           <div class="table-responsive" style="max-height: 560px; overflow:auto;">
@@ -278,7 +301,10 @@ DASHBOARD_HTML = """
             </table>
           </div>
 
-          <div class="tiny mt-2">Tip: click a row to view details + JSON.</div>
+          <div class="d-flex align-items-center justify-content-between mt-2">
+            <div class="tiny">Tip: click a row to view details + JSON.</div>
+            <button id="moreBtn" class="btn btn-sm btn-outline-light d-none" type="button">Load more</button>
+          </div>
         </div>
       </div>
 
@@ -344,6 +370,10 @@ DASHBOARD_HTML = """
 let selectedSite = null;
 let lastDevices = [];
 let searchTerm = "";
+let statusFilter = "";
+let totalDevices = 0;
+const PAGE_SIZE = 200;
+let rawKey = null;   // siteid + ts of the payload currently shown
 
 // Badge class helper
 function badgeClass(status){
@@ -359,59 +389,30 @@ function updateClock(){
 setInterval(updateClock, 1000);
 updateClock();
 
+// search/filter/paging run on the server; the list holds the pages loaded so far
+function devicesUrl(offset, limit){
+  const p = new URLSearchParams({ sort: "-ts", offset: offset, limit: limit });
+  if(searchTerm.trim()) p.set("q", searchTerm.trim());
+  if(statusFilter) p.set("status", statusFilter);
+  return "/api/devices?" + p.toString();
+}
+
 async function loadDevices(force=false){
   try{
-    const res = await fetch("/api/devices", { cache: "no-store" });
+    // reload everything currently shown (at least one page)
+    const limit = Math.max(PAGE_SIZE, lastDevices.length);
+    const res = await fetch(devicesUrl(0, limit), { cache: "no-cache" });
     const data = await res.json();
     lastDevices = data.devices || [];
-
-    // filter
-    const filtered = lastDevices.filter(r => {
-      const s = (r.siteid || "").toLowerCase();
-      const g = (r.gateway || "").toLowerCase();
-      const t = searchTerm.toLowerCase().trim();
-      if(!t) return true;
-      return s.includes(t) || g.includes(t);
-    });
-
-    document.getElementById("deviceCount").innerText = filtered.length;
-
-    const tbody = document.getElementById("deviceRows");
-    tbody.innerHTML = "";
-
-    filtered.forEach(row => {
-      const tr = document.createElement("tr");
-      tr.classList.add("row-hover");
-      tr.style.cursor = "pointer";
-      tr.dataset.siteid = row.siteid || "";
-
-      if(selectedSite && row.siteid === selectedSite){
-        tr.classList.add("row-active");
-      }
-
-      const status = row.health_status || "Unknown";
-      const badge = badgeClass(row.health_status);
-
-      const tsText = row.ts ? new Date(row.ts * 1000).toLocaleString() : "-";
-
-      tr.onclick = () => selectDevice(row.siteid);
-
-      tr.innerHTML = `
-        <td class="site-name">${row.siteid || "-"}</td>
-        <td class="gateway-muted">${row.gateway || "-"}</td>
-        <td><span class="badge ${badge}">${status}</span></td>
-        <td class="muted2">${row.reason || "-"}</td>
-        <td class="muted">${tsText}</td>
-      `;
-      tbody.appendChild(tr);
-    });
+    totalDevices = data.total ?? lastDevices.length;
+    renderDevices();
 
     // keep selection updated
     if(selectedSite){
       await selectDevice(selectedSite, true);
-    } else if(filtered.length){
+    } else if(lastDevices.length){
       // optional: auto-select first row on first load
-      // await selectDevice(filtered[0].siteid, true);
+      // await selectDevice(lastDevices[0].siteid, true);
     }
 
   } catch(err){
@@ -419,31 +420,63 @@ async function loadDevices(force=false){
   }
 }
 
-async function selectDevice(siteid, silent=false){
+async function loadMoreDevices(){
   try{
-    selectedSite = siteid;
-    const res = await fetch("/api/device?siteid=" + encodeURIComponent(siteid), { cache: "no-store" });
+    const res = await fetch(devicesUrl(lastDevices.length, PAGE_SIZE), { cache: "no-cache" });
     const data = await res.json();
+    const seen = new Set(lastDevices.map(d => d.siteid));
+    lastDevices = lastDevices.concat((data.devices || []).filter(d => !seen.has(d.siteid)));
+    totalDevices = data.total ?? totalDevices;
+    renderDevices();
+  } catch(err){
+    console.error("loadMoreDevices error:", err);
+  }
+}
+
+function renderDevices(){
+  const filtered = lastDevices;
 
-    const latest = data.latest || {};
-    const status = latest.health_status || "Unknown";
+  document.getElementById("deviceCount").innerText =
+    filtered.length < totalDevices ? `${filtered.length} of ${totalDevices}` : totalDevices;
+  document.getElementById("moreBtn").classList.toggle("d-none", filtered.length >= totalDevices);
 
-    document.getElementById("selectedTitle").innerText = siteid || "—";
+  const tbody = document.getElementById("deviceRows");
+  tbody.innerHTML = "";
 
-    const badge = document.getElementById("selectedBadge");
-    badge.className = "badge " + badgeClass(status);
-    badge.innerText = status;
+  filtered.forEach(row => {
+    const tr = document.createElement("tr");
+    tr.classList.add("row-hover");
+    tr.style.cursor = "pointer";
+    tr.dataset.siteid = row.siteid || "";
+
+    if(selectedSite && row.siteid === selectedSite){
+      tr.classList.add("row-active");
+    }
 
-    document.getElementById("usedMem").innerText = latest.used_memory ?? "-";
-    document.getElementById("usedSto").innerText = latest.used_storage ?? "-";
-    document.getElementById("cpu").innerText = latest.cpuusage ?? "-";
-    document.getElementById("temp").innerText = latest.temperature ?? "-";
+    const status = row.health_status || "Unknown";
+    const badge = badgeClass(row.health_status);
 
-    document.getElementById("reasonText").innerText = latest.reason || "-";
-    const ts = latest.ts ? new Date(latest.ts * 1000).toLocaleString() : "-";
-    document.getElementById("updatedText").innerText = "Updated: " + ts;
+    const tsText = row.ts ? new Date(row.ts * 1000).toLocaleString() : "-";
 
-    document.getElementById("rawJson").innerText = JSON.stringify(data.raw_json || {}, null, 2);
+    tr.onclick = () => selectDevice(row.siteid);
+
+    tr.innerHTML = `
+      <td class="site-name">${row.siteid || "-"}</td>
+      <td class="gateway-muted">${row.gateway || "-"}</td>
+      <td><span class="badge ${badge}">${status}</span></td>
+      <td class="muted2">${row.reason || "-"}</td>
+      <td class="muted">${tsText}</td>
+    `;
+    tbody.appendChild(tr);
+  });
+}
+
+async function selectDevice(siteid, silent=false){
+  try{
+    selectedSite = siteid;
+    const res = await fetch("/api/device?raw=0&siteid=" + encodeURIComponent(siteid), { cache: "no-cache" });
+    const data = await res.json();
+    await showLatest(siteid, data.latest || {});
 
     // highlight active row
     document.querySelectorAll("#deviceRows tr").forEach(tr => {
@@ -455,45 +488,271 @@ async function selectDevice(siteid, silent=false){
   }
 }
 
+async function showLatest(siteid, latest){
+  const status = latest.health_status || "Unknown";
+
+  document.getElementById("selectedTitle").innerText = siteid || "—";
+
+  const badge = document.getElementById("selectedBadge");
+  badge.className = "badge " + badgeClass(status);
+  badge.innerText = status;
+
+  document.getElementById("usedMem").innerText = latest.used_memory ?? "-";
+  document.getElementById("usedSto").innerText = latest.used_storage ?? "-";
+  document.getElementById("cpu").innerText = latest.cpuusage ?? "-";
+  document.getElementById("temp").innerText = latest.temperature ?? "-";
+
+  document.getElementById("reasonText").innerText = latest.reason || "-";
+  const ts = latest.ts ? new Date(latest.ts * 1000).toLocaleString() : "-";
+  document.getElementById("updatedText").innerText = "Updated: " + ts;
+
+  // raw payload is only fetched when a different sample is shown
+  const key = siteid + ":" + latest.ts;
+  if(key !== rawKey){
+    rawKey = key;
+    const rawRes = await fetch("/api/device/raw?siteid=" + encodeURIComponent(siteid), { cache: "no-cache" });
+    const raw = await rawRes.json();
+    document.getElementById("rawJson").innerText = JSON.stringify(raw || {}, null, 2);
+  }
+}
+
+// Push updates (SSE): merge per-device deltas, poll only while the stream is down
+let pollTimer = null;
+
+function startPolling(){
+  if(!pollTimer) pollTimer = setInterval(() => loadDevices(false), 2000);
+}
+
+function stopPolling(){
+  if(pollTimer){ clearInterval(pollTimer); pollTimer = null; }
+}
+
+let reloadTimer = null;
+
+function scheduleReload(delay){
+  clearTimeout(reloadTimer);
+  reloadTimer = setTimeout(() => loadDevices(true), delay);
+}
+
+// at most one resync per RESYNC_MS for updates of devices beyond the loaded pages
+const RESYNC_MS = 10000;
+let resyncTimer = null;
+
+function scheduleResync(){
+  if(!resyncTimer) resyncTimer = setTimeout(() => { resyncTimer = null; loadDevices(true); }, RESYNC_MS);
+}
+
+function applyDeviceUpdates(updates){
+  if(searchTerm.trim() || statusFilter){
+    // membership of a filtered list is decided by the server
+    scheduleReload(500);
+  } else {
+    const bySite = new Map(lastDevices.map(d => [d.siteid, d]));
+    updates.forEach(u => {
+      const cur = bySite.get(u.siteid);
+      if(cur){
+        Object.assign(cur, u);
+      } else if(u.new_device){
+        // first sample of a device the server didn't know: newest, so it goes on top
+        bySite.set(u.siteid, Object.assign({}, u));
+        totalDevices += 1;
+      } else {
+        // known device outside the loaded pages: order/total are the server's
+        scheduleResync();
+      }
+    });
+    lastDevices = Array.from(bySite.values()).sort((a, b) => (b.ts || 0) - (a.ts || 0));
+    renderDevices();
+  }
+
+  const sel = selectedSite && updates.find(u => u.siteid === selectedSite);
+  if(sel) showLatest(selectedSite, sel);
+}
+
+function connectStream(){
+  if(!window.EventSource){ startPolling(); return; }
+  const es = new EventSource("/api/stream");
+  es.onopen = () => {
+    stopPolling();
+    loadDevices(true);   // resync anything missed while disconnected
+  };
+  es.addEventListener("devices", (e) => applyDeviceUpdates(JSON.parse(e.data)));
+  es.onerror = () => {
+    startPolling();
+    if(es.readyState === EventSource.CLOSED){
+      setTimeout(connectStream, 5000);
+    }
+  };
+}
+
 // Refresh button FIX (explicitly wire it)
 document.getElementById("refreshBtn").addEventListener("click", () => loadDevices(true));
 
-// Search
+// Search (debounced, runs on the server) + status filter + paging
 document.getElementById("searchInput").addEventListener("input", (e) => {
   searchTerm = e.target.value || "";
+  lastDevices = [];
+  scheduleReload(300);
+});
+
+document.getElementById("statusFilter").addEventListener("change", (e) => {
+  statusFilter = e.target.value || "";
+  lastDevices = [];
   loadDevices(true);
 });
 
-// Initial load + polling
+document.getElementById("moreBtn").addEventListener("click", () => loadMoreDevices());
+
+// Initial load + live updates (polling as fallback)
 loadDevices(true);
-setInterval(() => loadDevices(false), 2000);
+startPolling();
+connectStream();
 </script>
 </body>
 </html>
 """
 
+MAX_HISTORY_PAGE = 5000
+HISTORY_RESOLUTIONS = ("raw", "auto", *ROLLUP_TABLES)
+MAX_DEVICE_PAGE = 1000
+MAX_SERIES_POINTS = 5000
+SSE_KEEPALIVE_SECONDS = 15.0
+SSE_RETRY_MS = 3000
+SERVER_MODES = ("dev", "waitress")
+
+
+def _int_arg(args, name: str):
+    v = args.get(name)
+    return int(v) if v not in (None, "") else None
+
+
 class WebServer(BaseService):
-    def __init__(self, db: DatabaseAccess, host: str = "127.0.0.1", port: int = 5000):
+    def __init__(
+        self,
+        db: DatabaseAccess,
+        host: str = "127.0.0.1",
+        port: int = 5000,
+        hot_store: Optional[HotStore] = None,
+        broker: Optional[EventBroker] = None,
+        cache: Optional[ResponseCache] = None,
+        fleet: Optional[FleetSummary] = None,
+        ai: Optional[AIModel] = None,
+        features: Optional[FeatureState] = None,
+        server: str = "dev",
+        threads: int = 16,
+        backlog: int = 1024,
+        channel_timeout: int = 120,
+        connection_limit: int = 200,
+        max_streams: Optional[int] = None
+    ):
+        """
+        server:
+        - "dev": Flask's built-in development server
+        - "waitress": production WSGI server (pip install waitress) with
+          `threads` worker threads, a listen `backlog`, idle keep-alive
+          connections closed after `channel_timeout` seconds and at most
+          `connection_limit` open connections.
+        max_streams: open /api/stream clients allowed at once (default
+        threads // 2); further clients get 503 and the dashboard polls.
+        Every open stream holds one worker thread for its lifetime, so
+        with waitress it must stay below `threads` or streams starve every
+        other endpoint.
+        """
         super().__init__("WebServer")
         self.db = db
+        # recent samples in memory; the DB is only hit for what it can't answer
+        self.hot_store = hot_store
+        # push of per-device updates (/api/stream); dashboard polls without it
+        self.broker = broker
+        # rendered JSON + ETag per endpoint/args, invalidated on ingest
+        self.cache = cache
+        # incrementally maintained status counters (/api/fleet/summary)
+        self.fleet = fleet
+        # active model info + hot reload (/api/model)
+        self.ai = ai
+        # per-device rolling statistics (/api/device/features)
+        self.features = features
         self.host = host
         self.port = port
+        if server not in SERVER_MODES:
+            raise ValueError(f"server must be one of {SERVER_MODES}")
+        self.server = server
+        self.threads = threads
+        self.backlog = backlog
+        self.channel_timeout = channel_timeout
+        self.connection_limit = connection_limit
+        self.max_streams = threads // 2 if max_streams is None else max_streams
+        if server == "waitress" and self.max_streams >= threads:
+            raise ValueError("max_streams must be below threads (each stream holds a worker thread)")
+        self._streams = 0
+        self._streams_lock = threading.Lock()
+        self._wsgi_server = None
         self.app = Flask(__name__)
         self._wire_routes()
 
     def start(self) -> None:
         super().start()
-        import threading
-        t = threading.Thread(
-            target=self.app.run,
-            kwargs={"host": self.host, "port": self.port, "debug": False},
-            daemon=True
-        )
+        if self.server == "waitress":
+            try:
+                from waitress import create_server
+            except ImportError:
+                print("[Web] waitress is not installed (pip install waitress); using the dev server")
+                self.server = "dev"
+
+        if self.server == "waitress":
+            # bind now so port errors surface here, serve on a daemon thread
+            self._wsgi_server = create_server(
+                self.app,
+                host=self.host,
+                port=self.port,
+                threads=self.threads,
+                backlog=self.backlog,
+                channel_timeout=self.channel_timeout,
+                connection_limit=self.connection_limit,
+                asyncore_use_poll=True     # select() fails above 1024 fds
+            )
+            target, kwargs = self._serve_waitress, {}
+        else:
+            target = self.app.run
+            kwargs = {"host": self.host, "port": self.port, "debug": False, "threaded": True}
+
+        t = threading.Thread(target=target, kwargs=kwargs, name="web", daemon=True)
         t.start()
-        print(f"[Web] Dashboard running at http://{self.host}:{self.port}")
+        print(f"[Web] Dashboard running at http://{self.host}:{self.port} ({self.server} server)")
 
     def stop(self) -> None:
+        server, self._wsgi_server = self._wsgi_server, None
         super().stop()
+        if server is not None:
+            # let worker threads finish in-flight responses, then drop the socket
+            server.task_dispatcher.shutdown()
+            server.close()
+
+    def _serve_waitress(self) -> None:
+        try:
+            self._wsgi_server.run()
+        except (OSError, ValueError):
+            # stop() closed the listening socket under the poll loop
+            if self.running:
+                raise
+
+    def _cached_json(self, render: Callable[[], str]) -> Response:
+        """
+        Serve render()'s JSON through the response cache with an ETag;
+        304 when the client's If-None-Match still matches.
+        """
+        if self.cache is None:
+            return Response(render(), mimetype="application/json")
+        key = request.path + "?" + urlencode(sorted(request.args.items(multi=True)))
+        body, etag = self.cache.get_or_render(key, render)
+        if etag in request.if_none_match:
+            self.cache.count_not_modified()
+            resp = Response(status=304)
+        else:
+            resp = Response(body, mimetype="application/json")
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
 
     def _wire_routes(self):
         @self.app.get("/")
@@ -502,34 +761,312 @@ class WebServer(BaseService):
 
         @self.app.get("/api/devices")
         def api_devices():
-            devices = self.db.get_latest_per_device(limit=500)
-            out = []
-            for d in devices:
-                out.append({
-                    "ts": d.get("ts"),
-                    "gateway": d.get("gateway"),
-                    "siteid": d.get("siteid"),
-                    "health_status": d.get("health_status"),
-                    "reason": d.get("reason")
-                })
-            return jsonify({"devices": out})
+            """
+            ?q=<siteid/gateway substring>&status=Warning,Critical,Unknown
+            &sort=[-]ts|siteid|gateway|status&limit=&offset=
+            """
+            args = request.args
+            try:
+                q = args.get("q", "").strip() or None
+                statuses = [
+                    None if st == "Unknown" else st
+                    for st in args.get("status", "").split(",") if st
+                ] or None
+                sort = args.get("sort", "-ts")
+                descending = sort.startswith("-")
+                sort = sort.lstrip("-")
+                if sort not in DEVICE_SORTS:
+                    raise ValueError(f"sort must be one of {tuple(DEVICE_SORTS)}")
+                limit = min(max(_int_arg(args, "limit") or 500, 1), MAX_DEVICE_PAGE)
+                offset = max(_int_arg(args, "offset") or 0, 0)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return self._cached_json(
+                lambda: self._render_devices(q, statuses, sort, descending, limit, offset)
+            )
+
+        @self.app.get("/api/stream")
+        def api_stream():
+            """
+            Server-Sent Events: `event: devices` with a list of devices that
+            got a newer sample (same fields as /api/devices + metrics).
+            503 while max_streams streams are open.
+            """
+            if self.broker is None:
+                return jsonify({"error": "streaming disabled"}), 404
+            with self._streams_lock:
+                if self._streams >= self.max_streams:
+                    return jsonify({"error": "too many open streams"}), 503, {"Retry-After": "5"}
+                self._streams += 1
+            sub = self.broker.subscribe()
+            closed = [False]
+
+            def close():
+                # runs when the response is closed, even if never iterated
+                with self._streams_lock:
+                    if closed[0]:
+                        return
+                    closed[0] = True
+                    self._streams -= 1
+                self.broker.unsubscribe(sub)
+
+            def events():
+                try:
+                    yield f"retry: {SSE_RETRY_MS}\n\n"
+                    while True:
+                        try:
+                            item = sub.get(timeout=SSE_KEEPALIVE_SECONDS)
+                        except queue.Empty:
+                            yield ": keepalive\n\n"
+                            continue
+                        if item is None:
+                            return
+                        event_id, name, data = item
+                        yield f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+                finally:
+                    close()
+
+            resp = Response(
+                stream_with_context(events()),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+            resp.call_on_close(close)
+            return resp
 
         @self.app.get("/api/device")
         def api_device():
             siteid = request.args.get("siteid", "")
-            hist = self.db.get_history(siteid, limit=2000)
-            latest = hist[0] if hist else {}
-            raw = self.db.get_latest_raw(siteid)
-            return jsonify({
-                "latest": {
-                    "ts": latest.get("ts"),
-                    "used_memory": latest.get("used_memory"),
-                    "used_storage": latest.get("used_storage"),
-                    "cpuusage": latest.get("cpuusage"),
-                    "temperature": latest.get("temperature"),
-                    "health_status": latest.get("health_status"),
-                    "reason": latest.get("reason"),
-                },
-                "raw_json": raw,
-                "history_count": len(hist)
+            include_raw = request.args.get("raw", "1") != "0"
+            return self._cached_json(lambda: self._render_device(siteid, include_raw))
+
+        @self.app.get("/api/device/raw")
+        def api_device_raw():
+            # raw payload only (stored compressed; decompressed on demand)
+            siteid = request.args.get("siteid", "")
+            return self._cached_json(lambda: self.db.get_latest_raw_text(siteid) or "null")
+
+        @self.app.get("/api/device/series")
+        def api_device_series():
+            """
+            ?siteid=...&metric=cpuusage&since=&until=&points=500&method=lttb|minmax
+            Chart series: at most `points` [ts, value] pairs (default: last 24h),
+            from raw rows or, for long ranges, the 1m/1h rollup averages
+            ("resolution" in the response, see choose_resolution).
+            """
+            args = request.args
+            siteid = args.get("siteid", "")
+            try:
+                metric = args.get("metric", "cpuusage")
+                if metric not in ROLLUP_METRICS:
+                    raise ValueError(f"metric must be one of {ROLLUP_METRICS}")
+                method = args.get("method", "lttb")
+                if method not in DOWNSAMPLE_METHODS:
+                    raise ValueError(f"method must be one of {DOWNSAMPLE_METHODS}")
+                until = _int_arg(args, "until")
+                until = until if until is not None else int(time.time()) + 1
+                since = _int_arg(args, "since")
+                since = since if since is not None else until - 24 * 3600
+                points = min(max(_int_arg(args, "points") or 500, 3), MAX_SERIES_POINTS)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return self._cached_json(
+                lambda: self._render_series(siteid, metric, since, until, points, method)
+            )
+
+        @self.app.get("/api/export")
+        def api_export():
+            """
+            ?format=ndjson|csv&since=&until=&siteid=a,b&columns=a,b
+            Streams the rows; memory stays constant whatever the range.
+            """
+            args = request.args
+            try:
+                fmt = args.get("format", "ndjson")
+                siteids = [x for v in args.getlist("siteid") for x in v.split(",") if x] or None
+                columns = [c for c in args.get("columns", "").split(",") if c] or None
+                chunks = export_telemetry(
+                    self.db,
+                    fmt=fmt,
+                    since=_int_arg(args, "since"),
+                    until=_int_arg(args, "until"),
+                    siteids=siteids,
+                    columns=columns
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            mimetype, ext = EXPORT_FORMATS[fmt]
+            return Response(
+                stream_with_context(chunks),
+                mimetype=mimetype,
+                headers={"Content-Disposition": f"attachment; filename=telemetry.{ext}"}
+            )
+
+        @self.app.get("/api/fleet/summary")
+        def api_fleet_summary():
+            """
+            Device counts by status, fleet-wide and per site prefix (PH-NCR, ...).
+            """
+            if self.fleet is None:
+                return jsonify({"error": "fleet summary disabled"}), 404
+            return jsonify(self.fleet.summary())
+
+        @self.app.get("/api/model")
+        def api_model():
+            """
+            Active model: version (bumped on every swap), sha256, format,
+            loaded_at, load_seconds, engine, reload counters.
+            """
+            if self.ai is None:
+                return jsonify({"error": "model info disabled"}), 404
+            return jsonify(self.ai.model_info())
+
+        @self.app.post("/api/model/reload")
+        def api_model_reload():
+            """
+            Reload model_path now (validated + warmed up before the swap;
+            ingest keeps scoring with the current model meanwhile).
+            """
+            if self.ai is None:
+                return jsonify({"error": "model info disabled"}), 404
+            try:
+                return jsonify(self.ai.reload())
+            except Exception as e:
+                return jsonify({"error": f"{type(e).__name__}: {e}", "model": self.ai.model_info()}), 422
+
+        @self.app.get("/api/device/features")
+        def api_device_features():
+            """
+            Current rolling statistics of one device (EWMA, mean, std and
+            slope per metric over its last window of messages).
+            """
+            if self.features is None:
+                return jsonify({"error": "rolling features disabled"}), 404
+            siteid = request.args.get("siteid", "")
+            feats = self.features.features(siteid)
+            if feats is None:
+                return jsonify({"error": "unknown siteid"}), 404
+            return jsonify({"siteid": siteid, **self.features.params(), "features": feats})
+
+        @self.app.get("/api/cache/stats")
+        def api_cache_stats():
+            if self.cache is None:
+                return jsonify({"enabled": False})
+            return jsonify({"enabled": True, **self.cache.stats()})
+
+        @self.app.get("/api/device/history")
+        def api_device_history():
+            """
+            ?siteid=...&since=&until=&limit=&columns=a,b&cursor=<ts>:<id>
+            &resolution=raw|1m|1h|auto (rollups need since+until, no cursor)
+            resolution defaults to auto when since and until are given (long
+            ranges come from the rollups; raw rows there may be purged) and
+            to raw otherwise / with a cursor. "auto" that picks raw pages
+            like raw.
+            """
+            args = request.args
+            siteid = args.get("siteid", "")
+            try:
+                since = _int_arg(args, "since")
+                until = _int_arg(args, "until")
+                limit = min(max(_int_arg(args, "limit") or 500, 1), MAX_HISTORY_PAGE)
+                columns = [c for c in args.get("columns", "").split(",") if c] or None
+                cursor = args.get("cursor")
+                before = tuple(int(x) for x in cursor.split(":")) if cursor else None
+                resolution = args.get("resolution") or (
+                    "auto" if since is not None and until is not None and before is None else "raw"
+                )
+                if resolution not in HISTORY_RESOLUTIONS:
+                    raise ValueError(f"resolution must be one of {HISTORY_RESOLUTIONS}")
+
+                if resolution != "raw":
+                    if since is None or until is None:
+                        raise ValueError("since and until are required for rollup history")
+                    if resolution == "auto":
+                        resolution = self.db.choose_resolution(since, until)
+                if resolution != "raw":
+                    if before is not None:
+                        raise ValueError("rollup history has no cursor paging")
+                    rows = self.db.get_metric_history(siteid, since, until, resolution=resolution)
+                    return jsonify({"rows": rows, "next_cursor": None, "resolution": resolution})
+
+                rows = None
+                if self.hot_store is not None:
+                    rows = self.hot_store.history(
+                        siteid, limit=limit, since=since, until=until, columns=columns, before=before
+                    )
+                if rows is None:
+                    rows = self.db.get_history(
+                        siteid, limit=limit, since=since, until=until, columns=columns, before=before
+                    )
+            except (ValueError, KeyError, IndexError) as e:
+                return jsonify({"error": str(e)}), 400
+
+            next_cursor = f"{rows[-1]['ts']}:{rows[-1]['id']}" if len(rows) == limit else None
+            return jsonify({"rows": rows, "next_cursor": next_cursor, "resolution": "raw"})
+
+    # ----------------------------
+    # JSON bodies (cached by _cached_json)
+    # ----------------------------
+    def _render_devices(
+        self,
+        q: Optional[str],
+        statuses: Optional[List[Optional[str]]],
+        sort: str,
+        descending: bool,
+        limit: int,
+        offset: int
+    ) -> str:
+        search = self.hot_store.search_latest if self.hot_store is not None else self.db.search_devices
+        devices, total = search(
+            q=q, statuses=statuses, sort=sort, descending=descending, limit=limit, offset=offset
+        )
+        out = []
+        for d in devices:
+            out.append({
+                "ts": d.get("ts"),
+                "gateway": d.get("gateway"),
+                "siteid": d.get("siteid"),
+                "health_status": d.get("health_status"),
+                "reason": d.get("reason")
             })
+        return json.dumps({"devices": out, "total": total, "offset": offset, "limit": limit})
+
+    def _render_device(self, siteid: str, include_raw: bool) -> str:
+        latest = self.hot_store.latest(siteid) if self.hot_store is not None else None
+        if latest is None:
+            latest = self.db.get_device_latest(siteid) or {}
+        body = json.dumps({
+            "latest": {
+                "ts": latest.get("ts"),
+                "used_memory": latest.get("used_memory"),
+                "used_storage": latest.get("used_storage"),
+                "cpuusage": latest.get("cpuusage"),
+                "temperature": latest.get("temperature"),
+                "health_status": latest.get("health_status"),
+                "reason": latest.get("reason"),
+            },
+            "history_count": self.db.count_history(siteid)
+        })
+        if include_raw:
+            # splice the stored payload in as-is instead of json.loads + re-dump
+            raw_text = self.db.get_latest_raw_text(siteid)
+            body = body[:-1] + ', "raw_json": ' + (raw_text or "null") + "}"
+        return body
+
+    def _render_series(self, siteid: str, metric: str, since: int, until: int, points: int, method: str) -> str:
+        # long ranges read the rollups: raw rows there may already be purged
+        resolution = self.db.choose_resolution(since, until)
+        ts, values = self.db.get_metric_series(siteid, metric, since, until, resolution=resolution)
+        n_raw = int(ts.shape[0])
+        ts, values = downsample(ts, values, points, method=method)
+        return json.dumps({
+            "siteid": siteid,
+            "metric": metric,
+            "method": method,
+            "resolution": resolution,
+            "since": since,
+            "until": until,
+            "raw_points": n_raw,
+            "points": list(zip(ts.tolist(), values.tolist())),
+        })